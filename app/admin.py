@@ -1,21 +1,34 @@
 import os
-import uuid
+from datetime import datetime
 from flask import Flask, redirect, url_for, request, render_template
-from flask_admin import Admin, expose, AdminIndexView
+from flask_admin import Admin, BaseView, expose, AdminIndexView
 from flask_admin.contrib.sqla import ModelView
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, FileField
+from wtforms import StringField, PasswordField, SubmitField, FileField, IntegerField
+from wtforms.validators import Optional
 from wtforms.validators import DataRequired
 from flask_admin.form.upload import FileUploadField
-from app.models import db, Flower, Order, AdminUser
+from flask_admin.actions import action
+from flask_admin.contrib.sqla.filters import FilterEqual, DateTimeBetweenFilter, DateTimeGreaterFilter
+from wtforms.validators import ValidationError
+from sqlalchemy import inspect
+from sqlalchemy.orm import configure_mappers
+from app.models import db, Flower, Order, OrderItem, AdminUser, OutboxJob
+from app.cache import catalog_cache
+from app.page_cache import page_cache
+from app.slugs import assign_slug
+from app.images import save_original, process_async
+from app.orders import STATUSES, InvalidTransition, change_status
+from app.money import from_minor, to_minor
+from app import jobs, reports, inventory
+from app.identity import identities, identity_for
+from app.passwords import login_guard, passwords
 
 
 UPLOAD_FOLDER = 'app/static/images/catalog'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 class LoginForm(FlaskForm):
     username = StringField("Имя пользователя", validators=[DataRequired()])
@@ -25,7 +38,7 @@ class LoginForm(FlaskForm):
 # Класс для защиты админки
 class SecureModelView(ModelView):
     def is_accessible(self):
-        return current_user.is_authenticated
+        return current_user.is_admin
 
     def inaccessible_callback(self, name, **kwargs):
         return redirect(url_for("admin.login"))
@@ -34,7 +47,7 @@ class SecureModelView(ModelView):
 class MyAdminIndexView(AdminIndexView):
     @expose('/')
     def index(self):
-        if not current_user.is_authenticated:
+        if not current_user.is_admin:
             return redirect(url_for("admin.login"))
         return super().index()
 
@@ -42,10 +55,16 @@ class MyAdminIndexView(AdminIndexView):
     def login(self):
         form = LoginForm()
         if form.validate_on_submit():
+            account = f'a:{form.username.data}'
+            login_guard.check(account)
             user = AdminUser.query.filter_by(username=form.username.data).first()
-            if user and check_password_hash(user.password, form.password.data):
-                login_user(user)
+            if passwords.verify(user.password if user else None, form.password.data):
+                if passwords.needs_rehash(user.password):
+                    user.password = passwords.hash(form.password.data)
+                    db.session.commit()
+                login_user(identity_for(user))
                 return redirect(url_for("admin.index"))
+            login_guard.failed(account)
         return render_template("admin/login.html", form=form)
 
     @expose('/logout')
@@ -54,30 +73,147 @@ class MyAdminIndexView(AdminIndexView):
         logout_user()
         return redirect(url_for("admin.login"))
 
-def generate_unique_filename(filename):
-    """Генерирует уникальное имя файла, сохраняя его расширение."""
-    ext = os.path.splitext(filename)[1]  # Получаем расширение файла
-    unique_name = f"{uuid.uuid4().hex}{ext}"  # Генерируем уникальный идентификатор
-    return unique_name
-
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 # Форма для загрузки изображений
 class FlowerAdmin(SecureModelView):
+    # Остаток не редактируется напрямую: форма, открытая до чужого заказа,
+    # вернула бы при сохранении старое число. Вместо него — приход/списание
+    form_excluded_columns = ['slug', 'stock']
     form_extra_fields = {
-        'image': FileField('Загрузить изображение')
+        'image': FileField('Загрузить изображение'),
+        'stock_delta': IntegerField('Приход (+) или списание (−) со склада', validators=[Optional()]),
     }
 
     def on_model_change(self, form, model, is_created):
+        assign_slug(model)
+        delta = form.stock_delta.data
+        if delta and is_created:
+            if delta < 0:
+                raise ValidationError('Новый букет нельзя списать в минус')
+            model.stock = delta
+        elif delta and not inventory.adjust(model.id, delta):
+            raise ValidationError('Списание больше, чем осталось на складе')
         file = request.files.get('image')
         if file and allowed_file(file.filename):
-            filename = secure_filename(generate_unique_filename(file.filename))
-            file.save(os.path.join(UPLOAD_FOLDER, filename))
+            # Имя файла — хэш содержимого; уменьшенные копии готовятся в фоне
+            filename = secure_filename(save_original(file, UPLOAD_FOLDER))
             model.image_url = f'static/images/catalog/{filename}'
+            process_async(os.path.abspath(os.path.join(UPLOAD_FOLDER, filename)))
+
+    def after_model_change(self, form, model, is_created):
+        catalog_cache.invalidate_flower(model.id, {model.name}, {model.slug})
+
+    def after_model_delete(self, model):
+        catalog_cache.invalidate_flower(model.id, {model.name}, {model.slug})
+
+# Счётчики кэшей: по ним подбираем CATALOG_CACHE_SIZE, PAGE_CACHE_SIZE и TTL
+class CacheStatsView(BaseView):
+    def is_accessible(self):
+        return current_user.is_admin
+
+    def inaccessible_callback(self, name, **kwargs):
+        return redirect(url_for("admin.login"))
+
+    @expose('/')
+    def index(self):
+        return self.render("admin/cache.html", caches={
+            'Кэш каталога': catalog_cache.stats(),
+            'Кэш страниц': page_cache.stats(),
+            'Кэш пользователей': identities.stats(),
+        })
+
+    @expose('/clear', methods=['POST'])
+    def clear(self):
+        catalog_cache.clear()
+        page_cache.clear()
+        identities.clear()
+        return redirect(url_for(".index"))
+
+# Продажи из сводок app/reports.py: запросы идут по дням периода, а не по заказам
+class AnalyticsView(BaseView):
+    def is_accessible(self):
+        return current_user.is_admin
+
+    def inaccessible_callback(self, name, **kwargs):
+        return redirect(url_for("admin.login"))
+
+    @expose('/')
+    def index(self):
+        days = request.args.get('days', 30, type=int)
+        return self.render("admin/analytics.html", report=reports.dashboard(days), periods=reports.PERIODS)
+
+# Позиции заказа редактируются прямо в карточке заказа
+class OrderAdmin(SecureModelView):
+    inline_models = (OrderItem,)
+    form_choices = {'status': [(status, status) for status in STATUSES]}
+    # Список без позиций и без COUNT(*) по всей таблице; фильтры — только по индексам
+    column_list = ['id', 'created_at', 'status', 'customer_name', 'customer_phone', 'total_price']
+    column_default_sort = ('created_at', True)
+    column_sortable_list = ['id', 'created_at', 'total_price']
+    column_filters = [
+        FilterEqual(Order.status, 'Статус', options=[(status, status) for status in STATUSES]),
+        DateTimeBetweenFilter(Order.created_at, 'Дата'),
+        DateTimeGreaterFilter(Order.created_at, 'Дата'),
+    ]
+    simple_list_pager = True
+    # Сумма считается по позициям, а отметку о сводках ведёт app/reports.py
+    form_excluded_columns = ['total_price', 'rollup_status']
+
+    def on_model_change(self, form, model, is_created):
+        status_changed = False
+        if not is_created:
+            # Старые позиции, сумма и дата уходят из сводок до flush правки
+            reports.unroll_order(model.id)
+            status_changed = self._change_status(model)
+        # Удалённые в форме позиции до flush ещё лежат в model.items
+        items = [item for item in model.items if item not in db.session.deleted]
+        model.total_price = from_minor(sum(to_minor(item.price) * item.quantity for item in items))
+        db.session.flush()  # id нового заказа для задания
+        if not status_changed:  # change_status уже поставил analytics.sync
+            jobs.enqueue('analytics.sync', order_id=model.id)
+
+    def _change_status(self, model):
+        # Смена статуса — только по допустимым переходам; письмо покупателю отправит воркер.
+        # True — статус сменился (и задание analytics.sync уже в очереди)
+        history = inspect(model).attrs.status.history
+        if not history.deleted or history.deleted[0] == model.status:
+            return False
+        new_status, model.status = model.status, history.deleted[0]
+        try:
+            change_status(model, new_status)
+        except InvalidTransition as error:
+            raise ValidationError(str(error))
+        return True
+
+    def on_model_delete(self, model):
+        reports.unroll_order(model.id)
+
+# Очередь фоновых заданий: что застряло и почему
+class JobAdmin(SecureModelView):
+    can_create = False
+    can_edit = False
+    column_default_sort = ('id', True)
+    column_filters = ['status', 'kind']
+    column_list = ['id', 'kind', 'status', 'attempts', 'run_after', 'last_error', 'created_at']
+
+    @action('retry', 'Повторить', 'Вернуть выбранные задания в очередь?')
+    def action_retry(self, ids):
+        db.session.execute(
+            db.update(OutboxJob).where(OutboxJob.id.in_(ids))
+            .values(status=jobs.PENDING, attempts=0, run_after=datetime.utcnow(), locked_until=None)
+        )
+        db.session.commit()
 
 def setup_admin(app: Flask):
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    # inline_models ищет обратные связи — мапперы должны быть уже собраны
+    configure_mappers()
     admin = Admin(app, name="Админ-панель", template_mode="bootstrap4", index_view=MyAdminIndexView())
 
     admin.add_view(FlowerAdmin(Flower, db.session, name="Цветы"))
-    admin.add_view(SecureModelView(Order, db.session, name="Заказы"))
+    admin.add_view(OrderAdmin(Order, db.session, name="Заказы"))
+    admin.add_view(AnalyticsView(name="Аналитика", endpoint="analytics"))
+    admin.add_view(JobAdmin(OutboxJob, db.session, name="Задания"))
+    admin.add_view(CacheStatsView(name="Кэш", endpoint="cache"))
@@ -0,0 +1,252 @@
+import gzip
+import hashlib
+import json
+
+from flask import Blueprint, current_app, request, Response, url_for
+from flask_login import current_user
+from werkzeug.exceptions import HTTPException
+
+from app import cart as cart_service, inventory
+from app.cache import catalog_cache
+from app.catalog import MAX_PAGE_SIZE, valid_id
+from app.images import image_src, image_srcset
+from app.money import from_minor
+from app.orders import MAX_LINE_QUANTITY, OrderRejected, create_order_from_cart, order_json, parse_intake
+
+try:
+    import orjson
+except ImportError:  # необязательная зависимость: без неё — стандартный json
+    orjson = None
+
+
+# JSON-API витрины для мобильного приложения и SPA: каталог, букет, корзина,
+# оформление. Обработчики — тонкие обёртки над теми же сервисами, что и HTML
+# (кэш каталога, корзина, остатки, заказы), только без рендера шаблонов.
+# Ответы — компактный JSON с ETag (повторный GET получает 304) и gzip
+# для тел больше API_GZIP_MIN_SIZE. Версия — в префиксе: /api/v1/...
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def _dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)  # shortages: {id: остаток}
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def _accepts_gzip():
+    return 'gzip' in request.headers.get('Accept-Encoding', '')
+
+
+def respond(payload, status=200, max_age=None, private=False):
+    """JSON-ответ: ETag по телу, 304 на If-None-Match, gzip для больших тел."""
+    body = _dumps(payload)
+    config = current_app.config
+    compress = (config.get('API_GZIP_LEVEL', 6) and len(body) >= config.get('API_GZIP_MIN_SIZE', 1024)
+                and _accepts_gzip())
+    response = Response(body, status=status, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if private:
+        response.vary.add('Cookie')
+        response.cache_control.private = True
+    if request.method not in ('GET', 'HEAD') or status != 200:
+        response.cache_control.no_store = True
+    else:
+        # Сжатое и несжатое тела — разные представления, у них разные ETag
+        etag = hashlib.sha1(body).hexdigest()[:20]
+        response.set_etag(f'{etag}-gz' if compress else etag)
+        if max_age:
+            response.cache_control.max_age = max_age
+        else:
+            response.cache_control.no_cache = True
+        response = response.make_conditional(request)
+    if compress and response.status_code != 304:
+        response.set_data(gzip.compress(body, compresslevel=config['API_GZIP_LEVEL']))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def error(message, status, **extra):
+    return respond({'error': message, **extra}, status)
+
+
+@api_bp.errorhandler(HTTPException)
+def http_error(exc):
+    response = error(exc.description, exc.code)
+    # Retry-After от лимитов и перегрузки (HasherBusy, RateLimited) не теряем
+    for name, value in exc.get_headers():
+        if name.lower() == 'retry-after':
+            response.headers[name] = value
+    return response
+
+
+@api_bp.app_errorhandler(404)
+@api_bp.app_errorhandler(405)
+def routing_error(exc):
+    # Ошибки маршрутизации до обработчиков блюпринта не доходят — JSON только внутри /api
+    if request.path.startswith(f'{api_bp.url_prefix}/'):
+        return http_error(exc)
+    return exc
+
+
+# --- сериализация ---
+
+def _flower_summary(flower):
+    return {
+        'id': flower.id,
+        'name': flower.name,
+        'slug': flower.slug,
+        'price': flower.price,
+        'image': image_src(flower.image_url, 320),
+        'summary': flower.summary,
+    }
+
+
+def _flower_detail(flower, stock):
+    return {
+        'id': flower.id,
+        'name': flower.name,
+        'slug': flower.slug,
+        'price': flower.price,
+        'description': flower.description,
+        'image': image_src(flower.image_url, 640),
+        'srcset': image_srcset(flower.image_url),
+        'stock': stock,  # null — остаток не ведётся
+    }
+
+
+def _cart_json(cart):
+    stock = inventory.available(line.flower.id for line in cart)
+    return {
+        'items': [{
+            'flower_id': line.flower.id,
+            'name': line.flower.name,
+            'slug': line.flower.slug,
+            'price': line.flower.price,
+            'quantity': line.quantity,
+            'subtotal': from_minor(line.subtotal_minor),
+            'stock': stock.get(line.flower.id),
+        } for line in cart],
+        'count': cart.count,
+        'total': from_minor(cart.total_minor),
+    }
+
+
+def _body():
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
+
+
+# --- каталог ---
+
+@api_bp.route('/flowers')
+def flowers():
+    """?sort=&cursor=&limit=&min_price=&max_price= — keyset-пагинация, как у /catalog."""
+    limit = request.args.get('limit', current_app.config.get('CATALOG_PAGE_SIZE', 24), type=int)
+    page = catalog_cache.page_from_args(request.args, limit=max(1, min(limit, MAX_PAGE_SIZE)))
+    return respond({
+        'items': [_flower_summary(flower) for flower in page.items],
+        'sort': page.sort,
+        'next_cursor': page.next_cursor,
+    }, max_age=current_app.config.get('API_CATALOG_MAX_AGE', 60))
+
+
+@api_bp.route('/flowers/<string:slug>')
+def flower_detail(slug):
+    flower_id = catalog_cache.flower_id_by_slug(slug)
+    flower = catalog_cache.flower(flower_id) if flower_id is not None else None
+    if not flower:
+        canonical_slug = catalog_cache.slug_by_name(slug)
+        if canonical_slug and canonical_slug != slug:
+            response = error('Букет переехал', 301)
+            response.location = url_for('api.flower_detail', slug=canonical_slug)
+            return response
+        return error('Такой букет не найден', 404)
+    # Остаток меняется с каждым заказом — клиент перепроверяет по ETag
+    return respond(_flower_detail(flower, inventory.available([flower.id]).get(flower.id)))
+
+
+# --- корзина ---
+
+@api_bp.route('/cart')
+def cart():
+    return respond(_cart_json(cart_service.current_cart()), private=True)
+
+
+@api_bp.route('/cart/items', methods=['POST'])
+def add_to_cart():
+    """{flower_id, quantity=1} — добавляет к тому, что уже лежит в корзине."""
+    data = _body()
+    flower_id, quantity = data.get('flower_id'), data.get('quantity', 1)
+    if not valid_id(flower_id) or not isinstance(quantity, int) or isinstance(quantity, bool):
+        return error('Нужны flower_id и quantity — целые числа', 400)
+    if not 1 <= quantity <= MAX_LINE_QUANTITY:
+        return error(f'quantity: от 1 до {MAX_LINE_QUANTITY}', 400)
+    if catalog_cache.flower(flower_id) is None:
+        return error('Такой букет не найден', 404)
+    left = inventory.available([flower_id]).get(flower_id)
+    if left is not None and left < quantity:
+        return error('Недостаточно на складе', 409, shortages={flower_id: left})
+    if current_user.is_customer:
+        cart_service.add_item(current_user.id, flower_id, quantity)
+    else:
+        cart_service.add_guest_item(flower_id, quantity)
+    return respond(_cart_json(cart_service.current_cart()), private=True)
+
+
+@api_bp.route('/cart/batch', methods=['POST'])
+def update_cart():
+    """[{flower_id, quantity}] — новые количества одной транзакцией; quantity 0 убирает букет."""
+    try:
+        changes = cart_service.parse_changes(request.get_json(silent=True))
+    except cart_service.CartRejected as exc:
+        return error(str(exc), 400)
+    cart_service.update_quantities(changes)
+    return respond(_cart_json(cart_service.current_cart()), private=True)
+
+
+@api_bp.route('/cart/items/<int:flower_id>', methods=['DELETE'])
+def remove_from_cart(flower_id):
+    if current_user.is_customer:
+        cart_service.remove_item(current_user.id, flower_id)
+    else:
+        cart_service.remove_guest_item(flower_id)
+    return respond(_cart_json(cart_service.current_cart()), private=True)
+
+
+@api_bp.route('/cart/hold', methods=['POST'])
+def hold_cart():
+    """Откладывает корзину на INVENTORY_HOLD_TTL секунд — как POST /checkout/hold со страницы оформления."""
+    cart_data = cart_service.current_cart()
+    if not cart_data:
+        return error('Корзина пуста', 400)
+    try:
+        expires_at = inventory.reserve(inventory.current_holder(),
+                                       [(line.flower.id, line.quantity) for line in cart_data])
+    except inventory.OutOfStock as exc:
+        return error(str(exc), 409, shortages=exc.shortages)
+    except inventory.HoldRejected as exc:
+        return error(str(exc), 400)
+    return respond({'expires_at': expires_at.isoformat(timespec='seconds') + 'Z'}, private=True)
+
+
+@api_bp.route('/checkout', methods=['POST'])
+def checkout():
+    """{name, phone, address} — заказ из текущей корзины; цены из каталога."""
+    cart_data = cart_service.current_cart()
+    if not cart_data:
+        return error('Корзина пуста', 400)
+    try:
+        # Те же проверки полей и количеств, что у POST /order
+        intake = parse_intake({**_body(), 'items': [
+            {'flower_id': line.flower.id, 'quantity': line.quantity} for line in cart_data]})
+        user_id = current_user.id if current_user.is_customer else None
+        order = create_order_from_cart(cart_data, intake.name, intake.phone, intake.address, user_id=user_id,
+                                       holder=inventory.current_holder())
+    except inventory.OutOfStock as exc:
+        return error(str(exc), 409, shortages=exc.shortages)
+    except OrderRejected as exc:
+        return error(str(exc), 400)
+    if user_id is None:
+        cart_service.clear_guest()
+    return respond(order_json(order), 201, private=True)
@@ -0,0 +1,174 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+import click
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # необязательная зависимость: без неё собираем только .gz
+    brotli = None
+
+
+# Статика с отпечатками: `flask assets-build` копирует файлы из app/static
+# в app/static/dist/ под именами с хэшем содержимого и пишет manifest.json.
+# url_for('static', filename='css/main.css') сам подставляет версию из манифеста,
+# а такие файлы отдаются с Cache-Control: immutable.
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Загрузки админки и так имеют уникальные имена (uuid / хэш содержимого)
+SKIP_DIRS = {DIST_DIR, os.path.join('images', 'catalog')}
+IMMUTABLE_PREFIXES = (f'{DIST_DIR}/', 'images/catalog/')
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html'}
+BUNDLE_NAME = 'css/bundle.css'
+ONE_YEAR = 365 * 24 * 3600
+
+
+def file_hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def hashed_name(relative, data):
+    stem, ext = os.path.splitext(relative)
+    return f'{stem}.{file_hash(data)}{ext}'
+
+
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+
+def bundle_css(sources):
+    """Склеивает CSS в один файл; @import переносит в начало, иначе браузер их проигнорирует."""
+    imports, bodies = [], []
+    for css in sources:
+        for line in css.splitlines():
+            if line.strip().startswith('@import'):
+                imports.append(line.strip())
+            else:
+                bodies.append(line)
+    return '\n'.join(dict.fromkeys(imports)) + '\n' + '\n'.join(bodies)
+
+
+def _iter_static(static_folder):
+    for root, dirs, files in os.walk(static_folder):
+        relative_root = os.path.relpath(root, static_folder)
+        dirs[:] = sorted(d for d in dirs if os.path.normpath(os.path.join(relative_root, d)) not in SKIP_DIRS)
+        for name in sorted(files):
+            yield os.path.normpath(os.path.join(relative_root, name)).replace(os.sep, '/')
+
+
+def _write(dist, relative, data):
+    path = os.path.join(dist, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as out:
+        out.write(data)
+    # Предсжатые копии рядом с файлом — отдаются без сжатия на лету
+    if os.path.splitext(relative)[1] in COMPRESSIBLE:
+        with open(f'{path}.gz', 'wb') as out:
+            out.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(f'{path}.br', 'wb') as out:
+                out.write(brotli.compress(data))
+
+
+def build(static_folder, bundle=False, minify=True):
+    """Собирает dist/ и манифест {исходное имя: имя с отпечатком}."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    manifest, stylesheets = {}, []
+
+    for relative in _iter_static(static_folder):
+        with open(os.path.join(static_folder, relative), 'rb') as source:
+            data = source.read()
+        if relative.endswith('.css'):
+            css = data.decode('utf-8')
+            stylesheets.append((relative, css))
+            if minify:
+                data = minify_css(css).encode('utf-8')
+        target = hashed_name(relative, data)
+        _write(dist, target, data)
+        manifest[relative] = f'{DIST_DIR}/{target}'
+
+    if bundle and stylesheets:
+        # main.css первым — остальные страницы его переопределяют
+        stylesheets.sort(key=lambda item: (item[0] != 'css/main.css', item[0]))
+        css = bundle_css(css for _, css in stylesheets)
+        data = (minify_css(css) if minify else css).encode('utf-8')
+        target = hashed_name(BUNDLE_NAME, data)
+        _write(dist, target, data)
+        # Все <link> на отдельные CSS указывают на один бандл — браузер скачает его один раз
+        for relative, _ in stylesheets:
+            manifest[relative] = f'{DIST_DIR}/{target}'
+
+    with open(os.path.join(dist, MANIFEST_NAME), 'w', encoding='utf-8') as out:
+        json.dump(manifest, out, indent=2, ensure_ascii=False, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding='utf-8') as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return {}
+
+
+def _accepted_encoding(filename, folder):
+    if not filename.startswith(f'{DIST_DIR}/'):
+        return None, None
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(folder, filename + suffix)):
+            return encoding, filename + suffix
+    return None, None
+
+
+def init_app(app):
+    manifest = load_manifest(app.static_folder) if app.config.get('ASSETS_FINGERPRINT', True) else {}
+    app.extensions['assets_manifest'] = manifest
+
+    if manifest:
+        @app.url_defaults
+        def fingerprint_static(endpoint, values):
+            if endpoint == 'static' and 'filename' in values:
+                values['filename'] = manifest.get(values['filename'], values['filename'])
+
+    def static(filename):
+        encoding, compressed = _accepted_encoding(filename, app.static_folder)
+        if encoding:
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response = send_from_directory(app.static_folder, compressed, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+        else:
+            response = app.send_static_file(filename)
+        if filename.startswith(f'{DIST_DIR}/'):
+            response.vary.add('Accept-Encoding')
+        if filename.startswith(IMMUTABLE_PREFIXES):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = ONE_YEAR
+            response.cache_control.immutable = True
+        return response
+
+    if 'static' in app.view_functions:
+        app.view_functions['static'] = static
+
+    @app.cli.command('assets-build')
+    @click.option('--bundle/--no-bundle', default=None, help='Склеить все CSS в один файл.')
+    @click.option('--minify/--no-minify', default=True, help='Минифицировать CSS.')
+    def assets_build(bundle, minify):
+        """Копирует статику в dist/ с отпечатками и пишет manifest.json."""
+        if bundle is None:
+            bundle = app.config.get('ASSETS_BUNDLE_CSS', False)
+        manifest = build(app.static_folder, bundle=bundle, minify=minify)
+        click.echo(f'Файлов в манифесте: {len(manifest)}')
@@ -0,0 +1,292 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.models import db, Flower
+from app import catalog
+from app import search as catalog_search
+
+
+# Отличаем «в кэше нет ключа» от закэшированного None (букет не найден)
+MISSING = object()
+
+
+class LocalBackend:
+    """Кэш в памяти процесса: LRU-вытеснение по размеру плюс TTL на запись."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    # Счётчики (поколения) живут отдельно от данных: LRU их не вытесняет
+    def counter(self, key):
+        return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._counters.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._data)
+        return {
+            'backend': 'local',
+            'size': size,
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class RedisBackend:
+    """Общий кэш для нескольких воркеров. Нужен пакет redis (необязательная зависимость)."""
+
+    def __init__(self, url, ttl=300, prefix='floweelyy:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        if raw is None:
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.client.set(self._key(key), pickle.dumps(value), ex=ttl or None)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self._key(key) for key in keys))
+
+    def counter(self, key):
+        return int(self.client.get(self._key(key)) or 0)
+
+    def incr(self, key):
+        return self.client.incr(self._key(key))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self._key('*')))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        info = self.client.info('stats')
+        return {
+            'backend': 'redis',
+            'size': self.client.dbsize(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': info.get('evicted_keys', 0),
+            'expirations': info.get('expired_keys', 0),
+        }
+
+
+class CatalogCache:
+    """Read-through кэш букетов и страниц каталога.
+
+    Ключи: flower:id:<id>, flower:name:<name> и страницы каталога.
+    Страницы каталога содержат поколение (catalog:gen): любое изменение
+    букета увеличивает его, и старые страницы просто перестают читаться.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or LocalBackend()
+        self.enabled = True
+
+    def init_app(self, app):
+        ttl = app.config.get('CATALOG_CACHE_TTL', 300)
+        if app.config.get('CATALOG_CACHE_BACKEND') == 'redis':
+            self.backend = RedisBackend(app.config['CATALOG_CACHE_URL'], ttl=ttl)
+        else:
+            self.backend = LocalBackend(maxsize=app.config.get('CATALOG_CACHE_SIZE', 1024), ttl=ttl)
+        self.enabled = app.config.get('CATALOG_CACHE_ENABLED', True)
+        app.extensions['catalog_cache'] = self
+
+    def get_or_load(self, key, loader, ttl=None):
+        if not self.enabled:
+            return loader()
+        value = self.backend.get(key)
+        if value is MISSING:
+            value = loader()
+            self.backend.set(key, value, ttl)
+        return value
+
+    # --- чтение ---
+
+    def flower(self, flower_id):
+        return self.get_or_load(f'flower:id:{flower_id}', lambda: _load_flower(Flower.id == flower_id))
+
+    def flower_id_by_slug(self, slug):
+        return self.get_or_load(f'flower:slug:{slug}', lambda: _load_column(Flower.id, Flower.slug == slug))
+
+    def slug_by_name(self, name):
+        # Карта редиректов для старых адресов /flower/<название>
+        return self.get_or_load(f'flower:name:{name}', lambda: _load_column(Flower.slug, Flower.name == name))
+
+    def flowers(self, ids):
+        """{id: FlowerView} для набора id; промахи догружаются одним IN-запросом."""
+        ids = list(dict.fromkeys(ids))
+        result, missing = {}, []
+        for flower_id in ids:
+            value = self.backend.get(f'flower:id:{flower_id}') if self.enabled else MISSING
+            if value is MISSING:
+                missing.append(flower_id)
+            elif value is not None:
+                result[flower_id] = value
+        if missing:
+            for flower in Flower.query.filter(Flower.id.in_(missing)).all():
+                view = catalog.to_view(flower)
+                result[flower.id] = view
+                if self.enabled:
+                    self.backend.set(f'flower:id:{flower.id}', view)
+        return result
+
+    def catalog_page(self, sort=catalog.DEFAULT_SORT, cursor=None, limit=catalog.DEFAULT_PAGE_SIZE,
+                     min_price=None, max_price=None):
+        generation = self.backend.counter('catalog:gen')
+        key = f'catalog:{generation}:{sort}:{cursor}:{limit}:{min_price}:{max_price}'
+        return self.get_or_load(key, lambda: catalog.catalog_page(
+            sort=sort, cursor=cursor, limit=limit, min_price=min_price, max_price=max_price))
+
+    def page_from_args(self, args, limit=catalog.DEFAULT_PAGE_SIZE):
+        return self.catalog_page(
+            sort=args.get('sort', catalog.DEFAULT_SORT),
+            cursor=args.get('cursor'),
+            limit=limit,
+            min_price=catalog.parse_price(args.get('min_price')),
+            max_price=catalog.parse_price(args.get('max_price')),
+        )
+
+    def search(self, query, limit=catalog_search.SEARCH_LIMIT):
+        generation = self.backend.counter('catalog:gen')
+        key = f'search:{generation}:{limit}:{" ".join(catalog_search.normalize(query))}'
+        return self.get_or_load(key, lambda: catalog_search.search_flowers(query, limit))
+
+    def suggest(self, query, limit=catalog_search.SUGGEST_LIMIT):
+        generation = self.backend.counter('catalog:gen')
+        key = f'suggest:{generation}:{limit}:{" ".join(catalog_search.normalize(query))}'
+        return self.get_or_load(key, lambda: catalog_search.suggest(query, limit))
+
+    # --- инвалидация ---
+
+    def invalidate_flower(self, flower_id=None, names=(), slugs=()):
+        self.invalidate_flowers([flower_id] if flower_id is not None else (), names, slugs)
+
+    def invalidate_flowers(self, ids=(), names=(), slugs=()):
+        keys = [f'flower:name:{name}' for name in names if name]
+        keys += [f'flower:slug:{slug}' for slug in slugs if slug]
+        keys += [f'flower:id:{flower_id}' for flower_id in ids]
+        self.backend.delete(*keys)
+        self.invalidate_listings()
+
+    def invalidate_listings(self):
+        self.backend.incr('catalog:gen')
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return self.backend.stats()
+
+
+def _load_flower(condition):
+    flower = Flower.query.filter(condition).first()
+    return catalog.to_view(flower) if flower else None
+
+
+def _load_column(column, condition):
+    return db.session.query(column).filter(condition).limit(1).scalar()
+
+
+def _changed_values(flower, attr):
+    # Текущее и прежнее (до изменения) значение — оба ключа надо сбросить
+    history = getattr(inspect(flower).attrs, attr).history
+    return {getattr(flower, attr), *history.deleted}
+
+
+catalog_cache = CatalogCache()
+
+
+# Инвалидация по событиям сессии: ловит любые изменения Flower через ORM,
+# не только из админки. Массовые query.update()/delete() сюда не попадают.
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_flowers(session, flush_context):
+    changed = session.info.setdefault('changed_flowers', {})
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Flower):
+            names, slugs = changed.setdefault(obj.id, (set(), set()))
+            names.update(_changed_values(obj, 'name'))
+            slugs.update(_changed_values(obj, 'slug'))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_flowers(session):
+    changed = session.info.pop('changed_flowers', None)
+    for flower_id, (names, slugs) in (changed or {}).items():
+        catalog_cache.invalidate_flower(flower_id, names, slugs)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_flowers(session):
+    session.info.pop('changed_flowers', None)
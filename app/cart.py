@@ -0,0 +1,235 @@
+from dataclasses import dataclass, field
+
+from flask import g, session
+from flask_login import current_user
+from sqlalchemy import case, func
+
+from app.models import db, Cart
+from app.database import insert_for_dialect, on_duplicate_key, retry_on_locked
+from app.cache import catalog_cache
+from app.catalog import valid_id
+from app.money import to_minor
+from app.orders import MAX_LINE_QUANTITY
+
+
+# Корзина собирается один раз за запрос и запоминается в flask.g;
+# любое изменение корзины сбрасывает запомненное значение.
+
+MAX_BATCH_CHANGES = 50
+
+
+class CartRejected(ValueError):
+    pass
+
+
+@dataclass
+class CartLine:
+    flower: object  # FlowerView из кэша каталога
+    quantity: int
+
+    @property
+    def price_minor(self):
+        return to_minor(self.flower.price)
+
+    @property
+    def subtotal_minor(self):
+        return self.price_minor * self.quantity
+
+
+@dataclass
+class ResolvedCart:
+    lines: list = field(default_factory=list)
+
+    @property
+    def total_minor(self):
+        return sum(line.subtotal_minor for line in self.lines)
+
+    @property
+    def count(self):
+        return sum(line.quantity for line in self.lines)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+
+def _guest_cart():
+    # Корзина гостя: {"<flower_id>": количество}. Старый формат — список словарей
+    cart = session.get('cart') or {}
+    if isinstance(cart, list):
+        cart = {str(item['flower_id']): item['quantity'] for item in cart}
+    return cart
+
+
+def _guest_items():
+    return [(int(flower_id), quantity) for flower_id, quantity in _guest_cart().items()]
+
+
+def _user_items(user_id):
+    return db.session.query(Cart.flower_id, Cart.quantity).filter(Cart.user_id == user_id).all()
+
+
+def current_cart():
+    """Корзина текущего посетителя: [(букет, количество)] с ценами из кэша каталога."""
+    if 'cart' not in g:
+        if current_user.is_customer:
+            items = _user_items(current_user.id)
+        else:
+            items = _guest_items()
+        flowers = catalog_cache.flowers(flower_id for flower_id, _ in items)
+        g.cart = ResolvedCart([
+            CartLine(flowers[flower_id], quantity)
+            for flower_id, quantity in items if flower_id in flowers
+        ])
+        g.cart_count = g.cart.count
+    return g.cart
+
+
+def badge_count():
+    """Число товаров для значка корзины в навбаре — без загрузки букетов."""
+    if 'cart_count' not in g:
+        if current_user.is_customer:
+            count = (db.session.query(func.coalesce(func.sum(Cart.quantity), 0))
+                     .filter(Cart.user_id == current_user.id).scalar())
+        else:
+            count = sum(quantity for _, quantity in _guest_items())
+        g.cart_count = count
+    return g.cart_count
+
+
+def _forget():
+    g.pop('cart', None)
+    g.pop('cart_count', None)
+
+
+def _upsert_cart(rows, replace=False):
+    # INSERT ... VALUES (...), (...) ON CONFLICT (user_id, flower_id) DO UPDATE quantity += excluded
+    # (replace=True — quantity = excluded: новое количество вместо прибавки)
+    # Строка корзины не растёт больше MAX_LINE_QUANTITY — ни одним запросом, ни повторами
+    rows = [{**row, 'quantity': min(row['quantity'], MAX_LINE_QUANTITY)} for row in rows]
+    insert = insert_for_dialect()
+    statement = insert(Cart).values(rows)
+    new = statement.inserted if on_duplicate_key(statement) else statement.excluded
+    total = Cart.quantity + new.quantity
+    quantity = new.quantity if replace else case((total > MAX_LINE_QUANTITY, MAX_LINE_QUANTITY), else_=total)
+    if on_duplicate_key(statement):
+        return statement.on_duplicate_key_update(quantity=quantity)
+    return statement.on_conflict_do_update(
+        index_elements=[Cart.user_id, Cart.flower_id],
+        set_={'quantity': quantity},
+    )
+
+
+@retry_on_locked
+def add_item(user_id, flower_id, quantity=1):
+    """Добавляет букет в корзину пользователя одним INSERT ... ON CONFLICT.
+
+    Уникальный индекс (user_id, flower_id) гарантирует одну строку на букет
+    даже при двойном клике: второй запрос просто увеличит количество, но не
+    больше MAX_LINE_QUANTITY. Что букет есть в каталоге, проверяет вызывающий.
+    """
+    db.session.execute(_upsert_cart([{'user_id': user_id, 'flower_id': flower_id, 'quantity': quantity}]))
+    db.session.commit()
+    _forget()
+
+
+@retry_on_locked
+def remove_item(user_id, flower_id):
+    db.session.execute(db.delete(Cart).where(Cart.user_id == user_id, Cart.flower_id == flower_id))
+    db.session.commit()
+    _forget()
+
+
+def parse_changes(items):
+    """[{flower_id, quantity}] -> {flower_id: новое количество}; 0 и меньше — убрать букет."""
+    if not isinstance(items, list) or not items:
+        raise CartRejected('Нужен непустой список {flower_id, quantity}')
+    if len(items) > MAX_BATCH_CHANGES:
+        raise CartRejected(f'Не больше {MAX_BATCH_CHANGES} изменений за раз')
+    changes = {}
+    for item in items:
+        flower_id = item.get('flower_id') if isinstance(item, dict) else None
+        quantity = item.get('quantity') if isinstance(item, dict) else None
+        if not valid_id(flower_id) or not isinstance(quantity, int) or isinstance(quantity, bool):
+            raise CartRejected('Каждое изменение — {flower_id, quantity} с целыми числами')
+        if quantity > MAX_LINE_QUANTITY:
+            raise CartRejected(f'Не больше {MAX_LINE_QUANTITY} штук одного букета')
+        changes[flower_id] = quantity
+    return changes
+
+
+@retry_on_locked
+def _set_user_items(user_id, quantities, removed):
+    if quantities:
+        db.session.execute(_upsert_cart(
+            [{'user_id': user_id, 'flower_id': flower_id, 'quantity': quantity}
+             for flower_id, quantity in quantities.items()], replace=True))
+    if removed:
+        db.session.execute(db.delete(Cart).where(Cart.user_id == user_id, Cart.flower_id.in_(removed)))
+    db.session.commit()
+
+
+def update_quantities(changes):
+    """Применяет {flower_id: количество} к корзине текущего посетителя.
+
+    У покупателя — одна транзакция: многострочный upsert и один DELETE.
+    Букеты, которых нет в каталоге, не добавляются.
+    """
+    existing = catalog_cache.flowers(flower_id for flower_id, quantity in changes.items() if quantity > 0)
+    quantities = {flower_id: quantity for flower_id, quantity in changes.items() if flower_id in existing}
+    removed = [flower_id for flower_id, quantity in changes.items() if quantity <= 0]
+    if current_user.is_customer:
+        _set_user_items(current_user.id, quantities, removed)
+    else:
+        cart = _guest_cart()
+        for flower_id in removed:
+            cart.pop(str(flower_id), None)
+        cart.update((str(flower_id), quantity) for flower_id, quantity in quantities.items())
+        session['cart'] = cart
+        session.modified = True
+    _forget()
+
+
+# --- корзина гостя в session ---
+
+def add_guest_item(flower_id, quantity=1):
+    cart = _guest_cart()
+    key = str(flower_id)
+    cart[key] = min(cart.get(key, 0) + quantity, MAX_LINE_QUANTITY)
+    session['cart'] = cart
+    session.modified = True  # Обновляем сессию
+    _forget()
+
+
+def remove_guest_item(flower_id):
+    cart = _guest_cart()
+    if cart.pop(str(flower_id), None) is not None:
+        session['cart'] = cart
+        session.modified = True
+    _forget()
+
+
+def clear_guest():
+    session.pop('cart', None)
+    _forget()
+
+
+def merge_guest_cart(user_id):
+    """Переносит корзину гостя в Cart после входа — одним многострочным upsert."""
+    items = _guest_items()
+    if items:
+        # Букеты, удалённые из каталога, пока лежали в корзине, не переносим
+        existing = catalog_cache.flowers(flower_id for flower_id, _ in items)
+        rows = [{'user_id': user_id, 'flower_id': flower_id, 'quantity': quantity}
+                for flower_id, quantity in items if flower_id in existing]
+        if rows:
+            _save_rows(rows)
+    clear_guest()
+
+
+@retry_on_locked
+def _save_rows(rows):
+    db.session.execute(_upsert_cart(rows))
+    db.session.commit()
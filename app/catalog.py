@@ -0,0 +1,164 @@
+import base64
+import json
+import math
+from collections import namedtuple
+from dataclasses import dataclass, field
+
+from sqlalchemy import and_, func, or_
+
+from app.models import db, Flower
+
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+SUMMARY_LENGTH = 160
+
+# Сортировки каталога: ключ сортировки -> (колонка, по убыванию?).
+# Вторым ключом всегда идёт id, чтобы порядок был однозначным
+# и курсор (значение, id) указывал на конкретную строку.
+SORTS = {
+    'newest': (Flower.id, True),
+    'price': (Flower.price, False),
+    'price_desc': (Flower.price, True),
+    'name': (Flower.name, False),
+}
+DEFAULT_SORT = 'newest'
+MAX_ID = 2 ** 63 - 1  # BIGINT: больше драйвер не свяжет
+
+# Лёгкие снимки букета без привязки к сессии — их можно кэшировать
+# и отдавать в шаблоны вместо ORM-объектов
+FlowerSummary = namedtuple('FlowerSummary', 'id name slug price image_url summary')
+FlowerView = namedtuple('FlowerView', 'id name slug description price image_url')
+
+
+def to_view(flower):
+    return FlowerView(flower.id, flower.name, flower.slug, flower.description, flower.price, flower.image_url)
+
+
+@dataclass
+class CatalogPage:
+    items: list
+    sort: str
+    next_cursor: str = None
+    filters: dict = field(default_factory=dict)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def valid_id(value):
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= MAX_ID
+
+
+def decode_cursor(cursor):
+    """Возвращает [значение, id] из курсора или None, если курсор битый.
+
+    Курсор приходит от клиента: id проверяется здесь, тип значения — по колонке сортировки.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != 2 or not valid_id(values[1]):
+        return None
+    return values
+
+
+def _valid_seek_value(column, value):
+    if column is Flower.id:
+        return valid_id(value)
+    if column is Flower.price:
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+    return isinstance(value, str)
+
+
+def list_columns():
+    # Проекция для списков: без полного description, только короткая выжимка
+    return (
+        Flower.id,
+        Flower.name,
+        Flower.slug,
+        Flower.price,
+        Flower.image_url,
+        func.substr(Flower.description, 1, SUMMARY_LENGTH).label('summary'),
+    )
+
+
+def _seek_condition(column, descending, value, last_id):
+    # (column, id) > (value, last_id) в развёрнутом виде — так индекс
+    # (column, id) используется и в SQLite, и в серверных СУБД
+    if column is Flower.id:
+        return Flower.id < last_id if descending else Flower.id > last_id
+    if descending:
+        return or_(column < value, and_(column == value, Flower.id < last_id))
+    return or_(column > value, and_(column == value, Flower.id > last_id))
+
+
+def catalog_page(sort=DEFAULT_SORT, cursor=None, limit=DEFAULT_PAGE_SIZE,
+                 min_price=None, max_price=None):
+    """Страница каталога с keyset-пагинацией (без OFFSET)."""
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    column, descending = SORTS[sort]
+
+    query = db.session.query(*list_columns())
+    filters = {}
+    if min_price is not None:
+        query = query.filter(Flower.price >= min_price)
+        filters['min_price'] = min_price
+    if max_price is not None:
+        query = query.filter(Flower.price <= max_price)
+        filters['max_price'] = max_price
+
+    position = decode_cursor(cursor)
+    # Подделанный курсор — просто первая страница, а не 500
+    if position is not None and _valid_seek_value(column, position[0]):
+        query = query.filter(_seek_condition(column, descending, *position))
+
+    if column is Flower.id:
+        order_by = [Flower.id.desc() if descending else Flower.id.asc()]
+    elif descending:
+        order_by = [column.desc(), Flower.id.desc()]
+    else:
+        order_by = [column.asc(), Flower.id.asc()]
+
+    # Берём на одну строку больше, чтобы узнать, есть ли следующая страница
+    rows = [FlowerSummary(*row) for row in query.order_by(*order_by).limit(limit + 1)]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key), last.id])
+
+    return CatalogPage(items=rows, sort=sort, next_cursor=next_cursor, filters=filters)
+
+
+def parse_price(value):
+    if value in (None, ''):
+        return None
+    try:
+        price = float(value)
+    except ValueError:
+        return None
+    return price if price >= 0 else None
+
+
+def page_from_args(args, limit=DEFAULT_PAGE_SIZE):
+    """Собирает страницу каталога из параметров запроса (?sort=&cursor=&min_price=&max_price=)."""
+    return catalog_page(
+        sort=args.get('sort', DEFAULT_SORT),
+        cursor=args.get('cursor'),
+        limit=limit,
+        min_price=parse_price(args.get('min_price')),
+        max_price=parse_price(args.get('max_price')),
+    )
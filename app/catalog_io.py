@@ -0,0 +1,345 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import click
+from sqlalchemy import func
+
+from app.cache import catalog_cache
+from app.database import insert_for_dialect, on_duplicate_key, retry_on_locked
+from app.images import ingest_file
+from app.models import db, Flower
+from app.slugs import MAX_SLUG_LENGTH, slugify
+
+
+# Массовый импорт и выгрузка каталога: `flask catalog import|export`.
+# Файл читается генератором построчно, в памяти одна пачка строк;
+# каждая пачка — одна транзакция INSERT ... ON CONFLICT (slug) DO UPDATE.
+# После коммита пачки номер последней записи пишется в файл-чекпоинт,
+# и прерванный импорт продолжается с `--resume`.
+
+FIELDS = ('slug', 'name', 'description', 'price', 'image_url')
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif'}
+IMAGE_PREFIX = 'static/images/catalog/'
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if ext == '.csv':
+        return 'csv'
+    raise click.BadParameter(f'не удалось определить формат по расширению {ext!r}, укажите --format')
+
+
+def read_rows(source, fmt):
+    """Пары (номер записи, dict) — номер с 1, стабилен между запусками."""
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(source), 1):
+            yield number, row
+        return
+    number = 0
+    for line in source:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            row = RowError(f'некорректный JSON: {error}')
+        yield number, row
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _text(row, field, limit=None, required=True):
+    value = row.get(field)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f'{field}: обязательное поле')
+    if limit and len(value) > limit:
+        raise RowError(f'{field}: длиннее {limit} символов')
+    return value or None
+
+
+def validate(row, images_dir=None):
+    """Нормализованная строка для upsert или RowError.
+
+    Ключ — slug: если не задан, берётся из названия, как в админке
+    (slug_from_name=True — такая строка не должна перезаписать чужой букет).
+    image — путь к локальному файлу относительно images_dir; image_url
+    переносится как есть (например, из выгрузки).
+    """
+    if isinstance(row, Exception):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError('запись должна быть объектом')
+    name = _text(row, 'name', Flower.name.type.length)
+    description = _text(row, 'description')
+    try:
+        price = round(float(str(row.get('price')).replace(',', '.')), 2)
+    except ValueError:
+        raise RowError(f'price: не число ({row.get("price")!r})') from None
+    if not 0 <= price < 10 ** 7:
+        raise RowError(f'price: вне допустимого диапазона ({price})')
+    given_slug = _text(row, 'slug', MAX_SLUG_LENGTH, required=False)
+    clean = {'slug': slugify(given_slug or name), 'name': name, 'description': description, 'price': price,
+             'image_url': _text(row, 'image_url', Flower.image_url.type.length, required=False),
+             'slug_from_name': not given_slug}
+
+    image = _text(row, 'image', required=False)
+    if image:
+        if images_dir is None:
+            raise RowError('image: не задан --images-dir')
+        path = os.path.realpath(os.path.join(images_dir, image))
+        if not path.startswith(os.path.realpath(images_dir) + os.sep):
+            raise RowError(f'image: путь вне --images-dir ({image})')
+        if os.path.splitext(path)[1].lower() not in IMAGE_EXTENSIONS:
+            raise RowError(f'image: неподдерживаемый формат ({image})')
+        if not os.path.isfile(path):
+            raise RowError(f'image: файл не найден ({image})')
+        clean['image_path'] = path
+    return clean
+
+
+def _upsert_flowers(rows):
+    # Пустой image_url не затирает уже загруженную картинку
+    insert = insert_for_dialect()
+    statement = insert(Flower).values(rows)
+    if on_duplicate_key(statement):
+        excluded = statement.inserted
+        return statement.on_duplicate_key_update(
+            name=excluded.name, description=excluded.description, price=excluded.price,
+            image_url=func.coalesce(excluded.image_url, Flower.image_url))
+    excluded = statement.excluded
+    return statement.on_conflict_do_update(
+        index_elements=[Flower.slug],
+        set_={'name': excluded.name, 'description': excluded.description, 'price': excluded.price,
+              'image_url': func.coalesce(excluded.image_url, Flower.image_url)},
+    )
+
+
+@retry_on_locked
+def upsert_batch(rows):
+    """Одна транзакция на пачку; возвращает (новых, обновлённых, отклонённых).
+
+    Строка без явного slug не обновляет существующий букет — одноимённые букеты
+    разрешены, и молча слить их было бы ошибкой. Такие строки возвращаются
+    в отклонённых, остальные записываются.
+    """
+    slugs = [row['slug'] for row in rows]
+    existing = db.session.execute(
+        db.select(Flower.id, Flower.name, Flower.slug).where(Flower.slug.in_(slugs))).all()
+    taken = {slug for _, _, slug in existing}
+    conflicts, kept = [], []
+    for row in rows:
+        row = dict(row)
+        (conflicts if row.pop('slug_from_name') and row['slug'] in taken else kept).append(row)
+    rows = kept
+    existing = [flower for flower in existing if flower.slug in {row['slug'] for row in rows}]
+    if rows:
+        db.session.execute(_upsert_flowers(rows))
+        db.session.commit()
+    # Массовый INSERT идёт мимо событий сессии — кэш каталога сбрасываем сами, один раз на пачку
+    catalog_cache.invalidate_flowers(
+        ids=[flower_id for flower_id, _, _ in existing],
+        names={name for _, name, _ in existing} | {row['name'] for row in rows},
+        slugs=[row['slug'] for row in rows],
+    )
+    return len(rows) - len(existing), len(existing), conflicts
+
+
+def load_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as source:
+            return json.load(source)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, state):
+    # Атомарно: после обрыва в файле либо старый, либо новый номер
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as out:
+        json.dump(state, out)
+    os.replace(tmp, path)
+
+
+def _attach_images(rows, pool, folder, reject):
+    """Нарезает картинки пачки в пуле процессов; строки с битыми файлами отклоняются."""
+    pending = [(number, row) for number, row in rows if 'image_path' in row]
+    if not pending:
+        return rows
+    failed = set()
+    futures = [(number, row, pool.submit(ingest_file, row.pop('image_path'), folder)) for number, row in pending]
+    for number, row, future in futures:
+        try:
+            row['image_url'] = IMAGE_PREFIX + future.result()
+        except Exception as error:
+            reject(number, row, f'image: {error}')
+            failed.add(number)
+    return [(number, row) for number, row in rows if number not in failed]
+
+
+def import_catalog(source, fmt, batch_size, images_dir=None, image_folder=None, workers=1,
+                   checkpoint=None, resume_from=None, reject=None, progress=None):
+    """Импортирует записи из открытого файла; возвращает сводку.
+
+    resume_from — состояние из чекпоинта: записи до его номера пропускаются,
+    счётчики продолжаются.
+    """
+    start_after = resume_from['line'] if resume_from else 0
+    stats = {'created': 0, 'updated': 0, 'rejected': 0, 'skipped': 0, 'last': start_after}
+    if resume_from:
+        stats.update(_totals(resume_from))
+
+    def rejected(number, row, message):
+        stats['rejected'] += 1
+        if reject:
+            reject(number, row, message)
+
+    def valid_rows():
+        for number, row in read_rows(source, fmt):
+            if number <= start_after:
+                stats['skipped'] += 1
+                continue
+            try:
+                yield number, validate(row, images_dir)
+            except RowError as error:
+                rejected(number, row, str(error))
+                stats['last'] = number
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch in batched(valid_rows(), batch_size):
+            last = batch[-1][0]
+            batch = _attach_images(batch, pool, image_folder, rejected)
+            # Повтор явного slug внутри пачки: ON CONFLICT не обновляет строку дважды — побеждает
+            # последняя, как и между пачками. Slug из названия, совпавший с уже встреченным, — в ошибки
+            unique, numbers = {}, {}
+            for number, row in batch:
+                if row['slug_from_name'] and row['slug'] in unique:
+                    del row['slug_from_name']
+                    rejected(number, row, f'slug: {row["slug"]} уже занят букетом из этого файла, задайте slug явно')
+                    continue
+                unique[row['slug']], numbers[row['slug']] = row, number
+            if unique:
+                created, updated, conflicts = upsert_batch(list(unique.values()))
+                stats['created'] += created
+                stats['updated'] += updated
+                for row in conflicts:
+                    rejected(numbers[row['slug']], row,
+                             f'slug: {row["slug"]} уже занят другим букетом, задайте slug явно')
+            stats['last'] = max(stats['last'], last)
+            if checkpoint:
+                save_checkpoint(checkpoint, {'line': stats['last'], **_totals(stats)})
+            if progress:
+                progress(stats)
+    return stats
+
+
+def _totals(stats):
+    return {key: stats[key] for key in ('created', 'updated', 'rejected')}
+
+
+def iter_flowers(batch_size):
+    """Все букеты по возрастанию id, keyset-пачками: память не зависит от размера каталога."""
+    last_id = 0
+    columns = [Flower.id, *(getattr(Flower, field) for field in FIELDS)]
+    while True:
+        rows = db.session.execute(
+            db.select(*columns).where(Flower.id > last_id).order_by(Flower.id).limit(batch_size)).all()
+        if not rows:
+            return
+        for row in rows:
+            yield dict(row._mapping)
+        last_id = rows[-1].id
+
+
+def export_catalog(out, fmt, batch_size):
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=('id', *FIELDS), lineterminator='\n')
+        writer.writeheader()
+        for count, row in enumerate(iter_flowers(batch_size), 1):
+            writer.writerow(row)
+    else:
+        for count, row in enumerate(iter_flowers(batch_size), 1):
+            out.write(json.dumps(row, ensure_ascii=False) + '\n')
+    return count
+
+
+def init_app(app):
+    @app.cli.group('catalog')
+    def catalog():
+        """Импорт и выгрузка каталога (CSV или JSONL)."""
+
+    @catalog.command('import')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(('csv', 'jsonl')), help='По умолчанию — по расширению.')
+    @click.option('--batch-size', type=int, default=None, help='Строк в транзакции (CATALOG_IMPORT_BATCH).')
+    @click.option('--images-dir', type=click.Path(exists=True, file_okay=False),
+                  help='Откуда брать файлы из колонки image.')
+    @click.option('--workers', type=int, default=None, help='Процессов для картинок.')
+    @click.option('--checkpoint', type=click.Path(dir_okay=False), help='По умолчанию <файл>.checkpoint.')
+    @click.option('--resume', is_flag=True, help='Продолжить с записи после чекпоинта.')
+    @click.option('--errors', 'errors_path', type=click.Path(dir_okay=False),
+                  help='JSONL с отклонёнными строками (по умолчанию <файл>.errors.jsonl).')
+    def import_command(path, fmt, batch_size, images_dir, workers, checkpoint, resume, errors_path):
+        """Загружает букеты из файла; существующие (по slug) обновляет."""
+        fmt = detect_format(path, fmt)
+        checkpoint = checkpoint or f'{path}.checkpoint'
+        errors_path = errors_path or f'{path}.errors.jsonl'
+        state = load_checkpoint(checkpoint) if resume else None
+        if resume and state is None:
+            click.echo(f'Чекпоинт {checkpoint} не найден — импорт с начала', err=True)
+
+        image_folder = os.path.join(app.static_folder, 'images', 'catalog')
+        os.makedirs(image_folder, exist_ok=True)
+
+        with open(path, encoding='utf-8-sig', newline='') as source, \
+                open(errors_path, 'a' if state else 'w', encoding='utf-8') as errors:
+            def reject(number, row, message):
+                errors.write(json.dumps({'line': number, 'error': message,
+                                         'row': row if isinstance(row, dict) else None},
+                                        ensure_ascii=False, default=str) + '\n')
+
+            def progress(stats):
+                click.echo(f'\r{stats["last"]} записей: новых {stats["created"]}, '
+                           f'обновлено {stats["updated"]}, отклонено {stats["rejected"]}', nl=False, err=True)
+
+            stats = import_catalog(
+                source, fmt, batch_size or app.config['CATALOG_IMPORT_BATCH'],
+                images_dir=images_dir, image_folder=image_folder,
+                workers=workers or app.config['CATALOG_IMPORT_IMAGE_WORKERS'],
+                checkpoint=checkpoint, resume_from=state, reject=reject, progress=progress)
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        if not stats['rejected'] and os.path.exists(errors_path):
+            os.remove(errors_path)
+        click.echo(err=True)
+        click.echo(f'Готово: новых {stats["created"]}, обновлено {stats["updated"]}, '
+                   f'отклонено {stats["rejected"]}' + (f' (см. {errors_path})' if stats['rejected'] else ''))
+
+    @catalog.command('export')
+    @click.argument('path', default='-')
+    @click.option('--format', 'fmt', type=click.Choice(('csv', 'jsonl')), help='По умолчанию — по расширению.')
+    @click.option('--batch-size', type=int, default=1000)
+    def export_command(path, fmt, batch_size):
+        """Выгружает каталог в файл или в stdout ('-')."""
+        fmt = detect_format(path, fmt) if path != '-' or fmt else 'jsonl'
+        with click.open_file(path, 'w', encoding='utf-8', atomic=path != '-') as out:
+            count = export_catalog(out, fmt, batch_size)
+        click.echo(f'Выгружено букетов: {count}', err=True)
@@ -0,0 +1,25 @@
+import click
+
+from app.models import db, AdminUser
+from app.passwords import passwords
+
+
+# Служебные команды `flask ...` вместо разовых скриптов, которые импортировали
+# всё приложение ради одной строки в БД.
+
+
+def init_app(app):
+    @app.cli.command('create-admin')
+    @click.argument('username')
+    @click.password_option('--password', prompt='Пароль', confirmation_prompt='Повторите пароль')
+    def create_admin(username, password):
+        """Создаёт администратора; если он уже есть — меняет ему пароль."""
+        admin = AdminUser.query.filter_by(username=username).first()
+        if admin is None:
+            db.session.add(AdminUser(username=username, password=passwords.hash(password)))
+            message = f'Администратор {username} создан'
+        else:
+            admin.password = passwords.hash(password)
+            message = f'Пароль администратора {username} обновлён'
+        db.session.commit()
+        click.echo(message)
@@ -0,0 +1,192 @@
+import os
+import random
+import time
+import weakref
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql.dml import UpdateBase
+
+
+# Настройка движков БД: PRAGMA для SQLite, размеры пула из окружения,
+# отдельный read-only движок для GET-запросов и повтор записи при блокировке.
+
+READONLY_BIND = 'readonly'
+
+
+class RoutingSession(Session):
+    """Сессия, которая в GET-запросах читает через read-only движок.
+
+    Всё, что пишет (flush, INSERT/UPDATE/DELETE), и запросы вне GET
+    идут в основной движок.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _reads_from_replica(clause):
+            engines = self._db.engines
+            if READONLY_BIND in engines:
+                return engines[READONLY_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _reads_from_replica(clause):
+    if isinstance(clause, UpdateBase):
+        return False
+    return (has_request_context() and request.method in ('GET', 'HEAD')
+            and not g.get('use_primary_db', False))
+
+
+def use_primary():
+    """Остаток запроса читает из основной БД (например, сразу после записи в GET)."""
+    g.use_primary_db = True
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def insert_for_dialect():
+    """insert() диалекта текущей БД — с on_conflict_do_update (SQLite, PostgreSQL) или on_duplicate_key_update (MySQL)."""
+    # Диалекты PostgreSQL/MySQL импортируются, только когда БД на них (SQLite — всегда)
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects import postgresql
+        return postgresql.insert
+    if dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects import mysql
+        return mysql.insert
+    return sqlite.insert
+
+
+def on_duplicate_key(statement):
+    """MySQL-вставка: ON DUPLICATE KEY UPDATE и statement.inserted вместо ON CONFLICT и excluded."""
+    return hasattr(statement, 'on_duplicate_key_update')
+
+
+def _is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def _is_memory_sqlite(uri):
+    url = make_url(uri)
+    return _is_sqlite(uri) and url.database in (None, '', ':memory:')
+
+
+def _readonly_uri(uri):
+    # SQLite открываем тем же файлом в режиме mode=ro
+    url = make_url(uri)
+    return f'sqlite:///file:{url.database}?mode=ro&uri=true'
+
+
+def engine_options(config, uri):
+    options = {'pool_pre_ping': not _is_sqlite(uri)}
+    if not _is_memory_sqlite(uri):
+        options.update(
+            pool_size=config.get('DB_POOL_SIZE', 5),
+            max_overflow=config.get('DB_MAX_OVERFLOW', 10),
+            pool_timeout=config.get('DB_POOL_TIMEOUT', 30),
+            pool_recycle=config.get('DB_POOL_RECYCLE', 1800),
+        )
+    if _is_sqlite(uri):
+        # Таймаут драйвера (секунды) дублирует PRAGMA busy_timeout
+        options['connect_args'] = {
+            'timeout': config.get('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000,
+            'check_same_thread': False,
+        }
+    return options
+
+
+def configure(app):
+    """Заполняет SQLALCHEMY_ENGINE_OPTIONS и SQLALCHEMY_BINDS — вызывать до db.init_app."""
+    config = app.config
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(config, uri))
+
+    readonly_uri = config.get('DATABASE_READONLY_URL')
+    if not readonly_uri and config.get('DB_READONLY_ENGINE') and _is_sqlite(uri) and not _is_memory_sqlite(uri):
+        readonly_uri = _readonly_uri(uri)
+    if readonly_uri:
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds[READONLY_BIND] = {'url': readonly_uri, **engine_options(config, readonly_uri)}
+        config['SQLALCHEMY_BINDS'] = binds
+
+
+def _sqlite_pragmas(config, readonly):
+    pragmas = [
+        f"busy_timeout = {int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}",
+        # Отрицательное значение — размер в КиБ, а не в страницах
+        f"cache_size = {-int(config.get('SQLITE_CACHE_SIZE_KB', 65536))}",
+        f"mmap_size = {int(config.get('SQLITE_MMAP_SIZE', 268435456))}",
+        'temp_store = MEMORY',
+    ]
+    if not readonly:
+        # WAL: читатели не блокируются записью, запись — одна за раз
+        pragmas += ['journal_mode = WAL', 'synchronous = NORMAL']
+    if config.get('SQLITE_FOREIGN_KEYS'):
+        pragmas.append('foreign_keys = ON')
+    return pragmas
+
+
+# gunicorn --preload: после fork воркер открывает свои соединения, а не делит пул мастера.
+# Хук один на процесс; движки приложений собираются в WeakSet и уходят вместе с приложением
+_engines = weakref.WeakSet()
+
+
+def _forget_pools():
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_forget_pools)
+
+
+def init_app(app):
+    """Вешает PRAGMA на подключения SQLite — вызывать после db.init_app."""
+    with app.app_context():
+        engines = dict(db.engines)
+    for name, engine in engines.items():
+        if engine.dialect.name != 'sqlite':
+            continue
+        pragmas = _sqlite_pragmas(app.config, readonly=name == READONLY_BIND)
+
+        @event.listens_for(engine, 'connect')
+        def set_pragmas(dbapi_connection, connection_record, pragmas=pragmas):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(f'PRAGMA {pragma}')
+            cursor.close()
+
+    _engines.update(engines.values())
+    app.extensions['db_write_retries'] = app.config.get('DB_WRITE_RETRIES', 5)
+
+
+def _is_locked(error):
+    message = str(getattr(error, 'orig', error)).lower()
+    return 'database is locked' in message or 'database is busy' in message or 'deadlock' in message
+
+
+def retry_on_locked(func):
+    """Повторяет единицу работы (запросы + commit), если БД занята другим писателем.
+
+    Функция должна сама делать commit и быть безопасной для повторного вызова:
+    при ошибке сессия откатывается и всё выполняется заново.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        attempts = current_app.extensions.get('db_write_retries', 5)
+        for attempt in range(attempts):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as error:
+                db.session.rollback()
+                if not _is_locked(error) or attempt == attempts - 1:
+                    raise
+                # Экспоненциальная задержка с джиттером: 50, 100, 200 мс ...
+                time.sleep(0.05 * 2 ** attempt * (1 + random.random()))
+
+    return wrapper
@@ -0,0 +1,86 @@
+import click
+from flask import Flask
+
+from config import Config
+
+
+# Сборка приложения. Модули сайта импортируются здесь, а не на уровне main:
+# процесс, которому не нужна админка (ADMIN_ENABLED=0 — витрина и API за
+# автомасштабированием), не загружает Flask-Admin и WTForms-формы админки,
+# а Flask-Migrate с alembic, импорт каталога и create-admin подключаются только
+# для команд `flask ...`. Pillow и диалекты PostgreSQL/MySQL импортируются при
+# первом использовании.
+# Ничего не открывает соединений и не запускает потоков при сборке, так что
+# приложение можно собрать в мастере gunicorn --preload и разделить между
+# воркерами после fork (см. gunicorn.conf.py).
+
+
+def _from_cli():
+    # Приложение загружает команда `flask ...` (а не gunicorn или бенчмарк)
+    return click.get_current_context(silent=True) is not None
+
+
+def create_app(config=Config, migrations=None):
+    """Собирает приложение. config — класс/объект настроек или dict поверх Config.
+
+    migrations — подключать ли Flask-Migrate; по умолчанию только под `flask` CLI.
+    """
+    from app.models import db
+    from app import database
+    from app.routes import main_bp, auth_bp, login_manager
+    from app.api import api_bp
+    from app.cache import catalog_cache
+    from app.page_cache import page_cache
+    from app.metrics import metrics
+    from app.identity import identities
+    from app import sessions, images, assets, jobs, search, inventory, passwords, reports
+
+    app = Flask(__name__, static_folder="static", template_folder="templates")
+    if isinstance(config, dict):
+        app.config.from_object(Config)
+        app.config.update(config)
+    else:
+        app.config.from_object(config)
+
+    proxies = app.config.get('TRUSTED_PROXY_COUNT', 0)
+    if proxies:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
+
+    database.configure(app)
+    db.init_app(app)
+    database.init_app(app)
+    from_cli = _from_cli()
+    if migrations if migrations is not None else from_cli:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    metrics.init_app(app)
+    catalog_cache.init_app(app)
+    page_cache.init_app(app)
+    identities.init_app(app)
+    passwords.init_app(app)
+    sessions.init_app(app)
+    images.init_app(app)
+    assets.init_app(app)
+    jobs.init_app(app)
+    search.init_app(app)
+    inventory.init_app(app)
+    reports.init_app(app)
+    if from_cli:
+        # Модули, в которых только команды `flask ...`, воркеру gunicorn не нужны
+        from app import catalog_io, cli
+        catalog_io.init_app(app)
+        cli.init_app(app)
+
+    login_manager.login_view = "auth.login"  # Указываем, что для пользователей логин здесь
+    login_manager.init_app(app)
+
+    # Не лениво при первом /admin: после первого запроса Flask не принимает новые маршруты
+    if app.config.get('ADMIN_ENABLED', True):
+        from app.admin import setup_admin
+        setup_admin(app)
+
+    app.register_blueprint(main_bp)
+    app.register_blueprint(auth_bp, url_prefix="/auth")
+    app.register_blueprint(api_bp)
+    return app
@@ -0,0 +1,147 @@
+from dataclasses import dataclass
+from functools import wraps
+
+from flask import current_app
+from flask_login import AnonymousUserMixin, UserMixin, current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models import db, User, AdminUser
+from app.cache import LocalBackend, RedisBackend, MISSING
+
+
+# Кто вошёл: в сессии хранится id с префиксом типа учётной записи ('u:5', 'a:1'),
+# поэтому покупатель и администратор с одинаковым id больше не путаются.
+# Flask-Login получает не строку из БД, а снимок (Identity) из кэша с коротким TTL;
+# правка или удаление User/AdminUser сбрасывает снимок после commit.
+
+CUSTOMER = 'user'
+ADMIN = 'admin'
+PREFIXES = {'u': CUSTOMER, 'a': ADMIN}
+MODELS = {CUSTOMER: User, ADMIN: AdminUser}
+
+
+@dataclass(frozen=True)
+class Identity(UserMixin):
+    id: int
+    role: str
+    name: str
+    email: str = None
+    phone: str = None
+
+    def get_id(self):
+        return session_id(self.role, self.id)
+
+    @property
+    def is_customer(self):
+        return self.role == CUSTOMER
+
+    @property
+    def is_admin(self):
+        return self.role == ADMIN
+
+
+class AnonymousIdentity(AnonymousUserMixin):
+    is_customer = False
+    is_admin = False
+
+
+def session_id(role, account_id):
+    prefix = next(prefix for prefix, value in PREFIXES.items() if value == role)
+    return f'{prefix}:{account_id}'
+
+
+def parse_session_id(value):
+    """'u:5' -> ('user', 5). Старые сессии без префикса считаем покупательскими."""
+    prefix, _, raw_id = str(value).rpartition(':')
+    role = PREFIXES.get(prefix or 'u')
+    try:
+        return role, int(raw_id)
+    except ValueError:
+        return None, None
+
+
+def identity_for(account):
+    """Снимок для login_user() из строки User или AdminUser."""
+    if isinstance(account, AdminUser):
+        return Identity(id=account.id, role=ADMIN, name=account.username)
+    return Identity(id=account.id, role=CUSTOMER, name=account.name, email=account.email, phone=account.phone)
+
+
+def _load(role, account_id):
+    if role == ADMIN:
+        row = db.session.query(AdminUser.id, AdminUser.username).filter(AdminUser.id == account_id).first()
+        return row and Identity(id=row.id, role=ADMIN, name=row.username)
+    row = (db.session.query(User.id, User.name, User.email, User.phone)
+           .filter(User.id == account_id).first())
+    return row and Identity(id=row.id, role=CUSTOMER, name=row.name, email=row.email, phone=row.phone)
+
+
+class IdentityStore:
+    def __init__(self):
+        self.backend = LocalBackend(maxsize=4096, ttl=60)
+
+    def init_app(self, app):
+        ttl = app.config.get('IDENTITY_CACHE_TTL', 60)
+        if app.config.get('CATALOG_CACHE_BACKEND') == 'redis':
+            self.backend = RedisBackend(app.config['CATALOG_CACHE_URL'], ttl=ttl, prefix='floweelyy:identity:')
+        else:
+            self.backend = LocalBackend(maxsize=app.config.get('IDENTITY_CACHE_SIZE', 4096), ttl=ttl)
+        app.extensions['identity_store'] = self
+
+    def load(self, value):
+        """user_loader для Flask-Login: снимок из кэша, запрос в БД только при промахе."""
+        role, account_id = parse_session_id(value)
+        if role is None:
+            return None
+        key = session_id(role, account_id)
+        identity = self.backend.get(key)
+        if identity is MISSING:
+            identity = _load(role, account_id)
+            self.backend.set(key, identity)
+        return identity
+
+    def invalidate(self, role, account_id):
+        self.backend.delete(session_id(role, account_id))
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return self.backend.stats()
+
+
+identities = IdentityStore()
+
+
+def customer_required(view):
+    """Как login_required, но только для покупателей: у администратора нет корзины и заказов."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_customer:
+            return current_app.login_manager.unauthorized()
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+# --- сброс снимков после commit ---
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_accounts(session, flush_context):
+    changed = session.info.setdefault('changed_accounts', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        for role, model in MODELS.items():
+            if isinstance(obj, model) and obj.id is not None:
+                changed.add((role, obj.id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_accounts(session):
+    for role, account_id in session.info.pop('changed_accounts', ()):
+        identities.invalidate(role, account_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_accounts(session):
+    session.info.pop('changed_accounts', None)
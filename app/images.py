@@ -0,0 +1,188 @@
+import hashlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import click
+from flask import current_app, url_for
+
+
+# Pillow импортируется в функциях обработки: витрине нужны только имена
+# вариантов (image_src, image_srcset), и воркер стартует без него.
+
+# Ширины производных изображений: карточка каталога, деталка, ретина
+WIDTHS = (320, 640, 1024)
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+NEGATIVE_TTL = 30  # секунд до повторной проверки ещё не готовых вариантов
+
+_executor = None
+_variants_cache = {}
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def save_original(file_storage, folder):
+    """Сохраняет загруженный файл под именем по хэшу содержимого; возвращает имя файла."""
+    data = file_storage.read()
+    ext = os.path.splitext(file_storage.filename)[1].lower()
+    filename = f'{content_hash(data)}{ext}'
+    path = os.path.join(folder, filename)
+    if not os.path.exists(path):  # одинаковые картинки не дублируем
+        with open(path, 'wb') as out:
+            out.write(data)
+    return filename
+
+
+def ingest_file(source, folder):
+    """Копирует локальный файл в папку каталога под именем по хэшу и готовит варианты.
+
+    Как и make_variants, не зависит от Flask — для пула процессов при импорте.
+    """
+    from PIL import Image
+
+    with open(source, 'rb') as original:
+        data = original.read()
+    with Image.open(io.BytesIO(data)) as image:  # битый файл не должен попасть в каталог
+        image.verify()
+    filename = f'{content_hash(data)}{os.path.splitext(source)[1].lower()}'
+    path = os.path.join(folder, filename)
+    if not os.path.exists(path):
+        tmp = f'{path}.tmp'
+        with open(tmp, 'wb') as out:
+            out.write(data)
+        os.replace(tmp, path)
+    make_variants(path)
+    return filename
+
+
+def variant_name(filename, width, fmt):
+    return f'{os.path.splitext(filename)[0]}-{width}.{fmt}'
+
+
+def make_variants(path):
+    """Создаёт уменьшенные копии в JPEG и WebP рядом с оригиналом, без EXIF и прочих метаданных.
+
+    Возвращает список имён созданных файлов. Функция не зависит от Flask —
+    её можно вызывать в отдельном процессе.
+    """
+    from PIL import Image, ImageOps
+
+    folder, filename = os.path.split(path)
+    created = []
+    with Image.open(path) as source:
+        image = ImageOps.exif_transpose(source)  # поворот по EXIF до того, как метаданные уйдут
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        # Не увеличиваем: ширины больше оригинала пропускаем (минимум один вариант есть всегда)
+        widths = [width for width in WIDTHS if width < image.width] or [WIDTHS[0]]
+        for width in widths:
+            target_width = min(width, image.width)
+            height = round(image.height * target_width / image.width)
+            resized = image.resize((target_width, height), Image.LANCZOS) if target_width != image.width else image
+            for fmt, options in FORMATS.items():
+                name = variant_name(filename, width, fmt)
+                target = os.path.join(folder, name)
+                if os.path.exists(target):
+                    continue
+                # Пишем во временный файл и переименовываем: шаблон не увидит недописанный файл
+                tmp = f'{target}.tmp'
+                resized.save(tmp, **options)
+                os.replace(tmp, target)
+                created.append(name)
+    return created
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        workers = current_app.config.get('IMAGE_WORKERS', 2)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='images')
+    return _executor
+
+
+def process_async(path):
+    """Ставит генерацию вариантов в фоновый пул — запрос админки не ждёт ресайза."""
+    logger = current_app.logger
+
+    def run():
+        try:
+            make_variants(path)
+            _variants_cache.pop(os.path.basename(path), None)
+        except Exception:
+            logger.exception('Не удалось обработать изображение %s', path)
+
+    return _pool().submit(run)
+
+
+def _static_path(image_url):
+    # image_url в БД хранится как 'static/images/catalog/<файл>'
+    relative = image_url.split('static/', 1)[-1]
+    return os.path.join(current_app.static_folder, relative), relative
+
+
+def available_widths(image_url):
+    """Ширины, для которых варианты уже готовы (результат кэшируется)."""
+    path, _ = _static_path(image_url)
+    filename = os.path.basename(path)
+    cached = _variants_cache.get(filename)
+    if cached is not None and (cached[0] or cached[1] > time.monotonic()):
+        return cached[0]
+    folder = os.path.dirname(path)
+    widths = tuple(width for width in WIDTHS
+                   if all(os.path.exists(os.path.join(folder, variant_name(filename, width, fmt))) for fmt in FORMATS))
+    _variants_cache[filename] = (widths, time.monotonic() + NEGATIVE_TTL)
+    return widths
+
+
+def image_src(image_url, width=None):
+    """URL картинки: вариант нужной ширины, если он уже готов, иначе оригинал."""
+    if not image_url:
+        return url_for('static', filename='images/flower.png')
+    _, relative = _static_path(image_url)
+    widths = available_widths(image_url)
+    if widths:
+        width = min((w for w in widths if width is None or w >= width), default=widths[-1])
+        return url_for('static', filename=variant_name(relative, width, 'jpg'))
+    return url_for('static', filename=relative)
+
+
+def image_srcset(image_url, fmt='jpg'):
+    """Значение атрибута srcset ('... 320w, ... 640w'); пустая строка, если вариантов нет."""
+    if not image_url:
+        return ''
+    _, relative = _static_path(image_url)
+    return ', '.join(f"{url_for('static', filename=variant_name(relative, width, fmt))} {width}w"
+                     for width in available_widths(image_url))
+
+
+def _originals(folder):
+    for name in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(name)
+        # Пропускаем сами варианты (<хэш>-<ширина>.<формат>) и временные файлы
+        if ext.lower() in ('.png', '.jpg', '.jpeg', '.gif') and not stem.rsplit('-', 1)[-1].isdigit():
+            yield os.path.join(folder, name)
+
+
+def init_app(app):
+    app.jinja_env.globals.update(image_src=image_src, image_srcset=image_srcset)
+
+    @app.cli.command('images-backfill')
+    @click.option('--workers', type=int, default=None, help='Число процессов (по умолчанию — все ядра).')
+    def images_backfill(workers):
+        """Создаёт варианты для уже загруженных изображений каталога."""
+        folder = os.path.join(app.static_folder, 'images', 'catalog')
+        paths = list(_originals(folder))
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = {pool.submit(make_variants, path): path for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    click.echo(f'{os.path.basename(path)}: {len(future.result())} файлов')
+                except Exception as error:
+                    click.echo(f'{os.path.basename(path)}: ошибка {error}', err=True)
@@ -0,0 +1,262 @@
+import secrets
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, session
+from flask_login import current_user
+from sqlalchemy import case, event, func, or_
+from sqlalchemy.orm import Session
+
+from app.models import db, Flower, StockReservation
+from app.cache import MISSING, catalog_cache
+from app.database import retry_on_locked
+from app import jobs
+
+
+# Остатки букетов. Flower.stock — сколько ещё можно продать: резерв и заказ
+# сразу уменьшают его условным UPDATE ... WHERE stock >= n, поэтому два
+# воркера не продадут один и тот же последний букет. Резерв под оформление
+# живёт INVENTORY_HOLD_TTL секунд, просроченные возвращает на склад
+# периодическая задача `flask jobs-worker` (или `flask inventory-sweep`).
+# Витрина читает остатки из кэша (stock:<id>) и в таблицу не ходит.
+
+
+# Пределы одного резерва: сколько разных букетов и сколько штук каждого
+# (те же, что у заказа, — см. app/orders.py). Держатель — не больше одного резерва
+MAX_HOLD_LINES = 50
+MAX_LINE_QUANTITY = 99
+
+# Поколение остатков: растёт при каждом изменении stock, входит в ключ кэша страницы букета
+STOCK_GENERATION = 'stock:gen'
+
+
+class HoldRejected(ValueError):
+    pass
+
+
+class OutOfStock(ValueError):
+    def __init__(self, shortages):
+        self.shortages = shortages  # {flower_id: сколько осталось}
+        details = ', '.join(f'№{flower_id} (осталось {left})' for flower_id, left in shortages.items())
+        super().__init__(f'Недостаточно на складе: {details}' if details else 'Недостаточно на складе')
+
+
+def current_holder():
+    """Кто держит резерв: покупатель или гость (случайный токен в сессии)."""
+    if current_user.is_customer:
+        return f'u:{current_user.id}'
+    if 'stock_holder' not in session:
+        session['stock_holder'] = secrets.token_urlsafe(16)
+    return f'g:{session["stock_holder"]}'
+
+
+def _quantities(lines):
+    quantities = {}
+    for flower_id, quantity in lines:
+        quantities[flower_id] = quantities.get(flower_id, 0) + quantity
+    return quantities
+
+
+def _touch(flower_ids):
+    # Ключи stock:<id> сбрасываются после commit (см. события сессии ниже)
+    db.session.info.setdefault('stock_changed', set()).update(flower_ids)
+
+
+def take(lines):
+    """Списывает остатки под всю корзину одним условным UPDATE. Без commit.
+
+    lines — [(flower_id, количество)]. Если хоть одного букета не хватает,
+    откатывает транзакцию целиком и бросает OutOfStock. Букеты без учёта
+    остатка (stock IS NULL) проходят всегда.
+    """
+    quantities = _quantities(lines)
+    if not quantities:
+        return
+    need = case(quantities, value=Flower.id)
+    updated = db.session.execute(
+        db.update(Flower)
+        .where(Flower.id.in_(list(quantities)), or_(Flower.stock.is_(None), Flower.stock >= need))
+        .values(stock=Flower.stock - need)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if updated == len(quantities):
+        _touch(quantities)
+        return
+    db.session.rollback()
+    stock = dict(db.session.execute(
+        db.select(Flower.id, Flower.stock).where(Flower.id.in_(list(quantities)))).all())
+    shortages = {
+        flower_id: max(stock.get(flower_id) or 0, 0)
+        for flower_id, quantity in quantities.items()
+        if flower_id not in stock or (stock[flower_id] is not None and stock[flower_id] < quantity)
+    }
+    # Витрина могла показывать устаревший остаток — пусть перечитает
+    _forget(shortages)
+    raise OutOfStock(shortages)
+
+
+def _restore(quantities):
+    if not quantities:
+        return
+    back = case(quantities, value=Flower.id)
+    db.session.execute(
+        db.update(Flower)
+        .where(Flower.id.in_(list(quantities)))
+        .values(stock=Flower.stock + back)
+        .execution_options(synchronize_session=False)
+    )
+    _touch(quantities)
+
+
+def adjust(flower_id, delta):
+    """Приход или списание со склада относительным UPDATE stock = stock + delta. Без commit.
+
+    Заказы, идущие параллельно, не теряются: значение не перезаписывается целиком.
+    Букет без учёта остатка начинает учитываться с delta. False — остаток ушёл бы в минус.
+    """
+    new_stock = func.coalesce(Flower.stock, 0) + delta
+    updated = db.session.execute(
+        db.update(Flower)
+        .where(Flower.id == flower_id, new_stock >= 0)
+        .values(stock=new_stock)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if updated:
+        _touch([flower_id])
+    return bool(updated)
+
+
+def _held(condition, limit=None):
+    # FOR UPDATE SKIP LOCKED: резерв, который сейчас забирает чужая транзакция, не трогаем
+    query = (db.select(StockReservation.id, StockReservation.flower_id, StockReservation.quantity)
+             .where(condition).with_for_update(skip_locked=True))
+    if limit:
+        query = query.order_by(StockReservation.expires_at).limit(limit)
+    return db.session.execute(query).all()
+
+
+def _release(rows):
+    if not rows:
+        return
+    db.session.execute(db.delete(StockReservation).where(StockReservation.id.in_([row.id for row in rows])))
+    _restore(_quantities((row.flower_id, row.quantity) for row in rows))
+
+
+@retry_on_locked
+def reserve(holder, lines, ttl=None):
+    """Откладывает корзину на ttl секунд; прежний резерв держателя заменяется. Делает commit.
+
+    Возвращает срок резерва. При нехватке бросает OutOfStock, прежний резерв остаётся;
+    сверх MAX_HOLD_LINES / MAX_LINE_QUANTITY — HoldRejected.
+    """
+    lines = list(lines)
+    quantities = _quantities(lines)
+    if len(quantities) > MAX_HOLD_LINES:
+        raise HoldRejected(f'Отложить можно не больше {MAX_HOLD_LINES} разных букетов')
+    if any(not 1 <= quantity <= MAX_LINE_QUANTITY for quantity in quantities.values()):
+        raise HoldRejected(f'Отложить можно от 1 до {MAX_LINE_QUANTITY} штук одного букета')
+    ttl = ttl or current_app.config.get('INVENTORY_HOLD_TTL', 900)
+    _release(_held(StockReservation.holder == holder))
+    take(lines)
+    expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+    if lines:
+        db.session.execute(db.insert(StockReservation), [
+            {'holder': holder, 'flower_id': flower_id, 'quantity': quantity, 'expires_at': expires_at}
+            for flower_id, quantity in quantities.items()
+        ])
+    db.session.commit()
+    return expires_at
+
+
+def allocate(lines, holder=None):
+    """Списывает остатки под заказ в его транзакции. Без commit.
+
+    Резерв держателя сначала возвращается на склад в той же транзакции —
+    отложенное им не успеет уйти другому покупателю.
+    """
+    if holder is not None:
+        _release(_held(StockReservation.holder == holder))
+    take(lines)
+
+
+@retry_on_locked
+def release_expired(limit=500):
+    """Возвращает на склад до limit просроченных резервов; commit. Возвращает их число."""
+    rows = _held(StockReservation.expires_at <= datetime.utcnow(), limit)
+    _release(rows)
+    db.session.commit()
+    return len(rows)
+
+
+@jobs.periodic('inventory.sweep', 'INVENTORY_SWEEP_INTERVAL')
+def sweep():
+    batch = current_app.config.get('INVENTORY_SWEEP_BATCH', 500)
+    total = 0
+    while True:
+        released = release_expired(batch)
+        total += released
+        if released < batch:
+            return total
+
+
+def _load_stock(flower_ids):
+    return dict(db.session.execute(
+        db.select(Flower.id, Flower.stock).where(Flower.id.in_(flower_ids))).all())
+
+
+def available(flower_ids):
+    """{flower_id: остаток} для витрины; None — остаток не ведётся.
+
+    Значения кэшируются на INVENTORY_CACHE_TTL секунд — страницы каталога
+    не читают горячие строки, которые сейчас обновляет оформление заказов.
+    """
+    flower_ids = list(dict.fromkeys(flower_ids))
+    if not catalog_cache.enabled:
+        return _load_stock(flower_ids) if flower_ids else {}
+    result, missing = {}, []
+    for flower_id in flower_ids:
+        value = catalog_cache.backend.get(f'stock:{flower_id}')
+        if value is MISSING:
+            missing.append(flower_id)
+        else:
+            result[flower_id] = value
+    if missing:
+        loaded = _load_stock(missing)
+        ttl = current_app.config.get('INVENTORY_CACHE_TTL', 5)
+        for flower_id in missing:
+            if flower_id in loaded:
+                result[flower_id] = loaded[flower_id]
+                catalog_cache.backend.set(f'stock:{flower_id}', loaded[flower_id], ttl)
+    return result
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_stock_edits(session, flush_context):
+    # Правка остатка через ORM (админка) тоже должна сбросить счётчик
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Flower) and obj.id is not None:
+            session.info.setdefault('stock_changed', set()).add(obj.id)
+
+
+def _forget(flower_ids):
+    catalog_cache.backend.delete(*(f'stock:{flower_id}' for flower_id in flower_ids))
+    catalog_cache.backend.incr(STOCK_GENERATION)
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_stock(session):
+    changed = session.info.pop('stock_changed', None)
+    if changed:
+        _forget(changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _keep_stock(session):
+    session.info.pop('stock_changed', None)
+
+
+def init_app(app):
+    @app.cli.command('inventory-sweep')
+    def inventory_sweep():
+        """Возвращает на склад просроченные резервы."""
+        click.echo(f'Возвращено резервов: {sweep()}')
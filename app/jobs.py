@@ -0,0 +1,172 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from app.models import db, OutboxJob
+from app.database import retry_on_locked
+
+
+# Очередь фоновых заданий в БД (outbox): enqueue() только добавляет строку в текущую
+# транзакцию — задание появится ровно тогда, когда закоммитится заказ.
+# `flask jobs-worker` забирает задания и выполняет их в пуле потоков;
+# при ошибке задание откладывается с экспоненциальной задержкой.
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+HANDLERS = {}
+PERIODIC = {}  # имя -> (функция, ключ конфига с интервалом в секундах, интервал по умолчанию)
+
+
+def handler(kind):
+    """Регистрирует обработчик задания: @handler('order.placed')."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def periodic(name, interval_setting, default=60):
+    """Регистрирует периодическую задачу воркера: @periodic('inventory.sweep', 'INVENTORY_SWEEP_INTERVAL')."""
+    def decorator(func):
+        PERIODIC[name] = (func, interval_setting, default)
+        return func
+    return decorator
+
+
+def enqueue(kind, **payload):
+    """Добавляет задание в сессию без commit — его закоммитит вызывающий код."""
+    job = OutboxJob(kind=kind, payload=json.dumps(payload, ensure_ascii=False),
+                    status=PENDING, attempts=0, run_after=datetime.utcnow())
+    db.session.add(job)
+    return job
+
+
+def _ready(now):
+    # Подошедшие pending-задания и running, чей воркер пропал (истекла аренда)
+    return or_(
+        and_(OutboxJob.status == PENDING, OutboxJob.run_after <= now),
+        and_(OutboxJob.status == RUNNING, OutboxJob.locked_until < now),
+    )
+
+
+@retry_on_locked
+def claim(limit):
+    """Забирает до limit заданий: условный UPDATE не даст двум воркерам взять одно и то же."""
+    config = current_app.config
+    now = datetime.utcnow()
+    lease = now + timedelta(seconds=config.get('JOBS_LEASE', 300))
+    candidates = db.session.scalars(
+        db.select(OutboxJob.id).where(_ready(now)).order_by(OutboxJob.run_after).limit(limit)
+    ).all()
+    claimed = []
+    for job_id in candidates:
+        result = db.session.execute(
+            db.update(OutboxJob)
+            .where(OutboxJob.id == job_id, _ready(now))
+            .values(status=RUNNING, locked_until=lease, attempts=OutboxJob.attempts + 1)
+        )
+        if result.rowcount:
+            claimed.append(job_id)
+    db.session.commit()
+    return claimed
+
+
+def retry_delay(attempts, base):
+    # 30 с, 1 мин, 2 мин ... но не больше часа
+    return min(base * 2 ** (attempts - 1), 3600)
+
+
+@retry_on_locked
+def _finish(job_id, error=None):
+    config = current_app.config
+    job = db.session.get(OutboxJob, job_id)
+    job.locked_until = None
+    if error is None:
+        job.status = DONE
+        job.last_error = None
+    else:
+        job.last_error = f'{type(error).__name__}: {error}'
+        if job.attempts >= config.get('JOBS_MAX_ATTEMPTS', 5):
+            job.status = FAILED
+        else:
+            job.status = PENDING
+            job.run_after = datetime.utcnow() + timedelta(
+                seconds=retry_delay(job.attempts, config.get('JOBS_RETRY_BASE', 30)))
+    db.session.commit()
+
+
+def execute(job_id):
+    """Выполняет одно задание. Доставка «хотя бы раз» — обработчики должны переживать повтор."""
+    job = db.session.get(OutboxJob, job_id)
+    func = HANDLERS.get(job.kind)
+    try:
+        if func is None:
+            raise LookupError(f'нет обработчика для {job.kind}')
+        func(**json.loads(job.payload))
+    except Exception as error:
+        db.session.rollback()
+        current_app.logger.warning('Задание %s (%s) не выполнено: %s', job_id, job.kind, error)
+        _finish(job_id, error)
+    else:
+        _finish(job_id)
+
+
+def _run_in_context(app, job_id):
+    with app.app_context():
+        try:
+            execute(job_id)
+        except Exception:
+            app.logger.exception('Сбой воркера на задании %s', job_id)
+
+
+def _run_periodic(app, due):
+    # Периодические задачи — между пачками заданий, в потоке цикла воркера
+    now = time.monotonic()
+    for name, (func, setting, default) in PERIODIC.items():
+        if due.get(name, 0) > now:
+            continue
+        due[name] = now + app.config.get(setting, default)
+        with app.app_context():
+            try:
+                func()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Сбой периодической задачи %s', name)
+
+
+def run_worker(app, threads, poll_interval, once=False):
+    """Цикл воркера: забрать пачку, выполнить в пуле, повторить. once — до пустой очереди."""
+    due = {}
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='jobs') as pool:
+        while True:
+            _run_periodic(app, due)
+            with app.app_context():
+                job_ids = claim(threads)
+            if job_ids:
+                wait([pool.submit(_run_in_context, app, job_id) for job_id in job_ids])
+                continue
+            if once:
+                return
+            time.sleep(poll_interval)
+
+
+def init_app(app):
+    @app.cli.command('jobs-worker')
+    @click.option('--threads', type=int, default=None, help='Потоков в пуле (по умолчанию JOBS_WORKER_THREADS).')
+    @click.option('--once', is_flag=True, help='Выполнить накопившиеся задания и выйти.')
+    def jobs_worker(threads, once):
+        """Выполняет фоновые задания (письма о заказах, смену статусов) и периодические задачи."""
+        threads = threads or app.config.get('JOBS_WORKER_THREADS', 4)
+        click.echo(f'Воркер заданий: {threads} потоков')
+        try:
+            run_worker(app, threads, app.config.get('JOBS_POLL_INTERVAL', 2), once=once)
+        except KeyboardInterrupt:
+            click.echo('Остановлен')
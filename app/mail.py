@@ -0,0 +1,30 @@
+import smtplib
+from email.message import EmailMessage
+
+from flask import current_app
+
+
+# Отправка писем. Вызывается только из воркера заданий, не из запроса.
+# MAIL_BACKEND=smtp — реальный SMTP (для разработки хватит
+# `python -m aiosmtpd -n -l localhost:1025`), console — письмо в лог.
+
+
+def send_mail(to, subject, body):
+    config = current_app.config
+    message = EmailMessage()
+    message['From'] = config.get('MAIL_SENDER', 'floweelyy@localhost')
+    message['To'] = to
+    message['Subject'] = subject
+    message.set_content(body)
+
+    if config.get('MAIL_BACKEND', 'smtp') == 'console':
+        current_app.logger.info('Письмо для %s: %s\n%s', to, subject, body)
+        return
+
+    with smtplib.SMTP(config.get('MAIL_SERVER', 'localhost'), config.get('MAIL_PORT', 1025),
+                      timeout=config.get('MAIL_TIMEOUT', 10)) as smtp:
+        if config.get('MAIL_USE_TLS'):
+            smtp.starttls()
+        if config.get('MAIL_USERNAME'):
+            smtp.login(config['MAIL_USERNAME'], config.get('MAIL_PASSWORD') or '')
+        smtp.send_message(message)
@@ -0,0 +1,266 @@
+import cProfile
+import hmac
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from flask import Response, abort, before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+from app.database import db
+
+
+# Инструментирование запросов: время ответа, число и время SQL-запросов,
+# подозрения на N+1, время рендера шаблонов и выборочный профайлер.
+# Всё вешается в init_app только при METRICS_ENABLED — выключенные метрики
+# не добавляют ни хуков, ни маршрута /metrics.
+# Счётчики живут в памяти процесса: у каждого воркера gunicorn свой /metrics.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+log = logging.getLogger('floweelyy.metrics')
+
+
+class Registry:
+    """Минимальный реестр метрик в формате Prometheus: счётчики и гистограммы с метками."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._types = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._types[name] = kind
+        self._help[name] = help_text
+        if kind == 'histogram':
+            self._histograms.setdefault(name, {'buckets': buckets or BUCKETS, 'series': {}})
+        else:
+            self._counters.setdefault(name, {})
+
+    def inc(self, name, labels, value=1):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = tuple(sorted(labels.items()))
+        histogram = self._histograms[name]
+        with self._lock:
+            series = histogram['series'].get(key)
+            if series is None:
+                series = histogram['series'][key] = {'buckets': [0] * len(histogram['buckets']), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(histogram['buckets']):
+                if value <= bound:
+                    series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def values(self, name):
+        """Значения счётчика: {(('метка', значение), ...): число} — для бенчмарков."""
+        with self._lock:
+            return dict(self._counters.get(name, {}))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, series in self._counters.items():
+                lines += [f'# HELP {name} {self._help[name]}', f'# TYPE {name} counter']
+                lines += [f'{name}{_labels(key)} {_number(value)}' for key, value in series.items()]
+            for name, histogram in self._histograms.items():
+                lines += [f'# HELP {name} {self._help[name]}', f'# TYPE {name} histogram']
+                for key, series in histogram['series'].items():
+                    for bound, count in zip(histogram['buckets'], series['buckets']):
+                        lines.append(f'{name}_bucket{_labels(key, le=_number(bound))} {count}')
+                    lines.append(f'{name}_bucket{_labels(key, le="+Inf")} {series["count"]}')
+                    lines.append(f'{name}_sum{_labels(key)} {_number(series["sum"])}')
+                    lines.append(f'{name}_count{_labels(key)} {series["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(key, **extra):
+    items = list(key) + list(extra.items())
+    if not items:
+        return ''
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in items)
+    return '{' + ','.join(escaped) + '}'
+
+
+@dataclass
+class RequestStats:
+    started: float
+    queries: int = 0
+    sql_time: float = 0.0
+    template_time: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+    templates: list = field(default_factory=list)
+    profiler: object = None
+
+
+class Metrics:
+    def __init__(self):
+        self.registry = Registry()
+        self.enabled = False
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', False)
+        app.extensions['metrics'] = self
+        if not self.enabled:
+            return
+
+        self.n_plus_one_threshold = app.config.get('METRICS_N_PLUS_ONE_THRESHOLD', 10)
+        self.log_requests = app.config.get('METRICS_LOG_REQUESTS', True)
+        self.slow_request = app.config.get('METRICS_SLOW_REQUEST_MS', 500) / 1000
+        self.profile_rate = app.config.get('METRICS_PROFILE_RATE', 0.0)
+        self.profile_dir = app.config.get('METRICS_PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+        self.token = app.config.get('METRICS_TOKEN')
+        self._describe()
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(engine, 'handle_error', self._handle_error)
+        app.add_url_rule('/metrics', 'metrics', self._metrics_view)
+
+    def _describe(self):
+        registry = self.registry
+        registry.describe('floweelyy_http_requests_total', 'counter', 'Запросы по маршруту, методу и статусу')
+        registry.describe('floweelyy_http_request_duration_seconds', 'histogram', 'Время ответа')
+        registry.describe('floweelyy_db_queries_total', 'counter', 'SQL-запросы по маршруту')
+        registry.describe('floweelyy_db_query_seconds_total', 'counter', 'Суммарное время SQL по маршруту')
+        registry.describe('floweelyy_db_queries_per_request', 'histogram', 'SQL-запросов на один HTTP-запрос',
+                          buckets=QUERY_COUNT_BUCKETS)
+        registry.describe('floweelyy_n_plus_one_total', 'counter', 'Запросы с повторяющимся SQL (подозрение на N+1)')
+        registry.describe('floweelyy_template_render_seconds', 'histogram', 'Время рендера шаблона')
+
+    # --- запрос ---
+
+    def _before_request(self):
+        stats = g._request_stats = RequestStats(started=time.perf_counter())
+        if self.profile_rate and _sampled(self.profile_rate):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # в этом потоке уже работает другой профайлер
+                return
+            stats.profiler = profiler
+
+    def _after_request(self, response):
+        g._response_status = response.status_code
+        return response
+
+    def _teardown_request(self, error=None):
+        stats = g.pop('_request_stats', None)
+        if stats is None:
+            return
+        duration = time.perf_counter() - stats.started
+        endpoint = request.endpoint or 'unknown'
+        status = getattr(g, '_response_status', 500 if error else 200)
+        registry = self.registry
+        registry.inc('floweelyy_http_requests_total', {'endpoint': endpoint, 'method': request.method, 'status': status})
+        registry.observe('floweelyy_http_request_duration_seconds', {'endpoint': endpoint}, duration)
+        registry.inc('floweelyy_db_queries_total', {'endpoint': endpoint}, stats.queries)
+        registry.inc('floweelyy_db_query_seconds_total', {'endpoint': endpoint}, stats.sql_time)
+        registry.observe('floweelyy_db_queries_per_request', {'endpoint': endpoint}, stats.queries)
+
+        repeated = [(statement, count) for statement, count in stats.statements.most_common(3)
+                    if count >= self.n_plus_one_threshold]
+        if repeated:
+            registry.inc('floweelyy_n_plus_one_total', {'endpoint': endpoint})
+            log.warning(json.dumps({
+                'event': 'n_plus_one', 'endpoint': endpoint, 'path': request.path,
+                'statements': [{'sql': statement[:200], 'count': count} for statement, count in repeated],
+            }, ensure_ascii=False))
+
+        if stats.profiler is not None:
+            stats.profiler.disable()
+            self._dump_profile(stats.profiler, endpoint)
+
+        if self.log_requests:
+            line = json.dumps({
+                'event': 'request', 'endpoint': endpoint, 'method': request.method, 'path': request.path,
+                'status': status, 'duration_ms': round(duration * 1000, 2), 'queries': stats.queries,
+                'sql_ms': round(stats.sql_time * 1000, 2), 'template_ms': round(stats.template_time * 1000, 2),
+            }, ensure_ascii=False)
+            log.warning(line) if duration >= self.slow_request else log.info(line)
+
+    def _dump_profile(self, profiler, endpoint):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f'{endpoint}-{int(time.time() * 1000)}.prof')
+        profiler.dump_stats(path)
+        log.info(json.dumps({'event': 'profile', 'endpoint': endpoint, 'file': path}, ensure_ascii=False))
+
+    # --- SQL ---
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        if not has_request_context():
+            return
+        stats = g.get('_request_stats')
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_time += time.perf_counter() - started
+            # Один и тот же текст SQL с разными параметрами много раз за запрос — типичный N+1
+            stats.statements[statement] += 1
+
+    def _handle_error(self, exception_context):
+        # Упавший запрос до after_cursor_execute не дойдёт — снимаем его отметку,
+        # иначе следующие запросы этого соединения получат чужое время начала
+        conn = exception_context.connection
+        if conn is not None and exception_context.statement is not None and conn.info.get('query_started'):
+            conn.info['query_started'].pop()
+
+    # --- шаблоны ---
+
+    def _before_render(self, sender, template, context, **extra):
+        stats = g.get('_request_stats')
+        if stats is not None:
+            stats.templates.append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        stats = g.get('_request_stats')
+        if stats is None or not stats.templates:
+            return
+        elapsed = time.perf_counter() - stats.templates.pop()
+        if not stats.templates:  # вложенный render_template не считаем дважды
+            stats.template_time += elapsed
+        self.registry.observe('floweelyy_template_render_seconds', {'template': template.name or 'string'}, elapsed)
+
+    # --- экспорт ---
+
+    def _metrics_view(self):
+        # Без METRICS_TOKEN /metrics закрыт: маршруты, тайминги и SQL наружу не отдаём
+        expected = f'Bearer {self.token}' if self.token else None
+        if expected is None or not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            abort(403)
+        return Response(self.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def _sampled(rate):
+    return random.random() < rate
+
+
+metrics = Metrics()
@@ -1,15 +1,24 @@
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import UserMixin
+from datetime import datetime
 
+from flask_login import UserMixin
 
-db = SQLAlchemy()
+from app.database import db
 
 class Flower(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
+    slug = db.Column(db.String(120), unique=True, index=True, nullable=False)
     description = db.Column(db.Text, nullable=False)
     price = db.Column(db.Float, nullable=False)
     image_url = db.Column(db.String(200), nullable=True)
+    # Остаток на складе; NULL — остаток не ведётся (букет собирают под заказ)
+    stock = db.Column(db.Integer, nullable=True)
+
+    # Составные индексы под keyset-пагинацию каталога (сортировка + id)
+    __table_args__ = (
+        db.Index('ix_flower_price_id', 'price', 'id'),
+        db.Index('ix_flower_name_id', 'name', 'id'),
+    )
 
     def __repr__(self):
         return f'<Flower {self.name}>'
@@ -21,20 +30,53 @@ class Order(db.Model):
     customer_name = db.Column(db.String(100), nullable=False)
     customer_phone = db.Column(db.String(20), nullable=False)
     customer_address = db.Column(db.Text, nullable=False)
-    items = db.Column(db.Text, nullable=False)  # JSON с товарами
     total_price = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), default='в ожидании')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Статус, с которым заказ уже учтён в сводках аналитики (app/reports.py); NULL — ещё не учтён
+    rollup_status = db.Column(db.String(20), nullable=True)
+    items = db.relationship('OrderItem', back_populates='order', lazy=True, cascade='all, delete-orphan')
+
+    # История заказов в профиле и фильтр по статусу в админке, оба с сортировкой по дате
+    __table_args__ = (
+        db.Index('ix_order_user_created', 'user_id', 'created_at'),
+        db.Index('ix_order_status_created', 'status', 'created_at'),
+    )
 
     def __repr__(self):
         return f'<Order {self.id} - {self.customer_name}>'
 
 
+class OrderItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Букет могут удалить из каталога — позиция заказа остаётся со снимком названия и цены
+    flower_id = db.Column(db.Integer, db.ForeignKey('flower.id', ondelete='SET NULL'), nullable=True)
+    name = db.Column(db.String(100), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    order = db.relationship('Order', back_populates='items')
+
+    # (flower_id, quantity) покрывает подсчёт продаж по букетам без чтения таблицы
+    __table_args__ = (
+        db.Index('ix_order_item_flower_quantity', 'flower_id', 'quantity'),
+    )
+
+    def __repr__(self):
+        return f'<OrderItem {self.name} x{self.quantity}>'
+
+
 class Cart(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     flower_id = db.Column(db.Integer, db.ForeignKey('flower.id'), nullable=False)
     quantity = db.Column(db.Integer, default=1)
 
+    # Одна строка на букет в корзине — на этом индексе держится upsert в add_to_cart
+    __table_args__ = (
+        db.Index('uq_cart_user_flower', 'user_id', 'flower_id', unique=True),
+    )
+
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -55,4 +97,86 @@ class AdminUser(UserMixin, db.Model):
     password = db.Column(db.String(256), nullable=False)  # Хранить хэш пароля!
 
     def __repr__(self):
-        return f'<Admin {self.username}>'
\ No newline at end of file
+        return f'<Admin {self.username}>'
+
+
+class SessionRecord(db.Model):
+    """Серверная сессия: в cookie только sid, данные — здесь."""
+    __tablename__ = 'server_session'
+
+    sid = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class StockReservation(db.Model):
+    """Букеты, отложенные под оформление заказа; по истечении expires_at возвращаются на склад."""
+    __tablename__ = 'stock_reservation'
+
+    id = db.Column(db.Integer, primary_key=True)
+    holder = db.Column(db.String(64), nullable=False, index=True)  # 'u:<id>' или 'g:<токен гостя>'
+    flower_id = db.Column(db.Integer, db.ForeignKey('flower.id', ondelete='CASCADE'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<StockReservation {self.holder} {self.flower_id}x{self.quantity}>'
+
+
+class DailySales(db.Model):
+    """Сводка заказов за день в разрезе статуса: пополняется воркером, пересчитывается `flask analytics-rebuild`."""
+    __tablename__ = 'daily_sales'
+
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue_minor = db.Column(db.BigInteger, nullable=False, default=0)  # в банях, см. app/money.py
+
+
+class DailyFlowerSales(db.Model):
+    """Продажи букета за день (без отменённых заказов). Без внешнего ключа — удалённые букеты остаются в отчётах."""
+    __tablename__ = 'daily_flower_sales'
+
+    day = db.Column(db.Date, primary_key=True)
+    flower_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue_minor = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class OrderRequest(db.Model):
+    """Ключ идемпотентности заказа: повтор POST с тем же ключом вернёт уже созданный заказ."""
+    __tablename__ = 'order_request'
+
+    key = db.Column(db.String(64), primary_key=True)  # sha256(покупатель/гость + Idempotency-Key)
+    request_hash = db.Column(db.String(64), nullable=False)  # sha256 тела — тот же ключ с другим заказом отклоняем
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id', ondelete='CASCADE'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<OrderRequest {self.key} -> {self.order_id}>'
+
+
+class OutboxJob(db.Model):
+    """Фоновое задание (outbox): пишется в одной транзакции с заказом, выполняется воркером."""
+    __tablename__ = 'outbox_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Воркер выбирает pending-задания, срок которых подошёл, в порядке run_after
+    __table_args__ = (
+        db.Index('ix_outbox_job_status_run_after', 'status', 'run_after'),
+    )
+
+    def __repr__(self):
+        return f'<OutboxJob {self.id} {self.kind} {self.status}>'
@@ -0,0 +1,24 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+
+# Суммы считаем в целых бани (1 лей = 100 бань), а не складываем Float-цены
+MINOR_UNITS = 100
+
+
+def to_minor(price):
+    """Цена в леях (Float из БД) -> целое число бань."""
+    if price is None:
+        return 0
+    return int((Decimal(str(price)) * MINOR_UNITS).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_minor(amount):
+    """Целые бани -> леи для записи в Float-колонки (Order.total_price и т.п.)."""
+    return amount / MINOR_UNITS
+
+
+def format_minor(amount):
+    # divmod по отрицательному числу даёт -2 и 50 вместо -1.50 — делим модуль, знак ставим сами
+    sign = '-' if amount < 0 else ''
+    lei, bani = divmod(abs(amount), MINOR_UNITS)
+    return f'{sign}{lei}' if not bani else f'{sign}{lei}.{bani:02d}'
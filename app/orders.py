@@ -0,0 +1,365 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from flask import current_app, render_template
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+
+from app.models import db, Order, OrderItem, OrderRequest, Cart, Flower
+from app.catalog import encode_cursor, decode_cursor, valid_id
+from app.database import retry_on_locked
+from app.money import from_minor, to_minor
+from app import jobs, inventory
+from app.mail import send_mail
+
+
+# Статусы заказа и допустимые переходы между ними
+PENDING = 'в ожидании'
+CONFIRMED = 'подтверждён'
+DELIVERED = 'доставлен'
+CANCELLED = 'отменён'
+
+STATUSES = (PENDING, CONFIRMED, DELIVERED, CANCELLED)
+TRANSITIONS = {
+    PENDING: {CONFIRMED, CANCELLED},
+    CONFIRMED: {DELIVERED, CANCELLED},
+    DELIVERED: set(),
+    CANCELLED: set(),
+}
+
+
+# Сортировки истории заказов: ключ -> по убыванию (created_at, id)?
+HISTORY_SORTS = {'newest': True, 'oldest': False}
+HISTORY_PAGE_SIZE = 10
+MAX_HISTORY_PAGE_SIZE = 50
+
+# Приём заказа через POST /order: от клиента только id букетов и количества.
+# Пределы те же, что у резерва со страницы оформления
+MAX_ORDER_LINES = inventory.MAX_HOLD_LINES
+MAX_LINE_QUANTITY = inventory.MAX_LINE_QUANTITY
+MAX_IDEMPOTENCY_KEY = 64
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+class OrderRejected(ValueError):
+    pass
+
+
+class IdempotencyConflict(OrderRejected):
+    pass
+
+
+def change_status(order, status, notify=True):
+    """Меняет статус по таблице переходов; письмо и пересчёт сводок — через очередь. Без commit."""
+    current = order.status or PENDING
+    if status == current:
+        return
+    if status not in TRANSITIONS.get(current, ()):
+        raise InvalidTransition(f'Нельзя перевести заказ из «{current}» в «{status}»')
+    order.status = status
+    jobs.enqueue('analytics.sync', order_id=order.id)
+    if notify:
+        jobs.enqueue('order.status_changed', order_id=order.id, status=status)
+
+
+def _write_order(user_id, name, phone, address, lines):
+    """Заказ, позиции и задание воркеру в текущей транзакции. Без commit.
+
+    lines — [{'flower_id', 'name', 'price', 'quantity'}]: снимок названия и цены.
+    """
+    total_minor = sum(to_minor(line['price']) * line['quantity'] for line in lines)
+    order = Order(
+        user_id=user_id,
+        customer_name=name,
+        customer_phone=phone,
+        customer_address=address,
+        total_price=from_minor(total_minor),
+        status=PENDING,
+    )
+    db.session.add(order)
+    db.session.flush()  # нужен id заказа для позиций
+
+    # Позиции заказа одним executemany
+    db.session.execute(db.insert(OrderItem), [{'order_id': order.id, **line} for line in lines])
+    # Подтверждение, письмо и сводки аналитики — в воркере; ответ покупателю не ждёт SMTP
+    jobs.enqueue('order.placed', order_id=order.id)
+    jobs.enqueue('analytics.sync', order_id=order.id)
+    return order
+
+
+def _priced_lines(items):
+    """[(flower_id, количество)] -> позиции заказа с названием и ценой из БД, а не из кэша каталога.
+
+    Цены читаются одним IN-запросом в транзакции заказа (на PostgreSQL/MySQL
+    строки букетов под FOR SHARE, SQLite и так сериализует запись): кэш другого
+    воркера gunicorn после правки цены в админке ещё помнит старую.
+    """
+    flower_ids = [flower_id for flower_id, _ in items]
+    flowers = {row.id: row for row in db.session.execute(
+        db.select(Flower.id, Flower.name, Flower.price)
+        .where(Flower.id.in_(flower_ids))
+        .with_for_update(read=True))}
+    missing = [flower_id for flower_id in flower_ids if flower_id not in flowers]
+    if missing:
+        db.session.rollback()
+        raise OrderRejected(f'Букеты не найдены: {", ".join(map(str, missing))}')
+    return [{'flower_id': flower_id, 'name': flowers[flower_id].name, 'price': flowers[flower_id].price,
+             'quantity': quantity}
+            for flower_id, quantity in items]
+
+
+@retry_on_locked
+def create_order_from_cart(cart, name, phone, address, user_id=None, holder=None):
+    """Заказ из корзины одной транзакцией: остатки, строка заказа, позиции, очистка корзины и задание воркеру.
+
+    Из корзины берутся только id и количества, цены — из БД. holder — чей резерв
+    со страницы оформления превращается в заказ. При нехватке — OutOfStock,
+    если букет успели удалить — OrderRejected.
+    """
+    items = [(line.flower.id, line.quantity) for line in cart]
+    lines = _priced_lines(items)
+    inventory.allocate(items, holder=holder)
+    new_order = _write_order(user_id, name, phone, address, lines)
+    # Очищаем корзину — в той же транзакции, что и заказ
+    if user_id is not None:
+        db.session.execute(db.delete(Cart).where(Cart.user_id == user_id))
+    db.session.commit()
+    return new_order
+
+
+def order_json(order):
+    """Заказ для JSON-ответов (POST /order, /api/v1/checkout)."""
+    return {
+        'id': order.id,
+        'status': order.status,
+        'total_price': order.total_price,
+        'items': [{'flower_id': item.flower_id, 'name': item.name, 'price': item.price, 'quantity': item.quantity}
+                  for item in order.items],
+    }
+
+
+@dataclass(frozen=True)
+class OrderIntake:
+    name: str
+    phone: str
+    address: str
+    items: tuple  # ((flower_id, quantity), ...) по возрастанию id, без повторов
+
+    @property
+    def request_hash(self):
+        body = json.dumps([self.name, self.phone, self.address, self.items], ensure_ascii=False)
+        return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _field(data, key, column, min_length=1):
+    value = data.get(key)
+    value = value.strip() if isinstance(value, str) else ''
+    limit = column.type.length
+    if len(value) < min_length or (limit and len(value) > limit):
+        raise OrderRejected(f'{key}: ожидается строка длиной от {min_length}' + (f' до {limit}' if limit else ''))
+    return value
+
+
+def parse_intake(data):
+    """Проверяет тело запроса {name, phone, address, items: [{flower_id, quantity}]}.
+
+    Цены и суммы от клиента не принимаются; одинаковые букеты складываются.
+    """
+    if not isinstance(data, dict):
+        raise OrderRejected('Ожидается JSON-объект')
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        raise OrderRejected('items: нужен непустой список')
+    if len(items) > MAX_ORDER_LINES:
+        raise OrderRejected(f'items: не больше {MAX_ORDER_LINES} позиций')
+    quantities = {}
+    for item in items:
+        flower_id = item.get('flower_id') if isinstance(item, dict) else None
+        quantity = item.get('quantity', 1) if isinstance(item, dict) else None
+        # Только настоящие целые: 1.9 не округляем, "3" и true не принимаем, id не больше BIGINT
+        if not valid_id(flower_id) or flower_id < 1 or not isinstance(quantity, int) or isinstance(quantity, bool):
+            raise OrderRejected('items: каждая позиция — {flower_id, quantity} с целыми числами')
+        if quantity < 1:
+            raise OrderRejected('items: количество должно быть положительным')
+        quantities[flower_id] = quantities.get(flower_id, 0) + quantity
+        if quantities[flower_id] > MAX_LINE_QUANTITY:
+            raise OrderRejected(f'items: не больше {MAX_LINE_QUANTITY} штук одного букета')
+    return OrderIntake(
+        name=_field(data, 'name', Order.customer_name, min_length=2),
+        phone=_field(data, 'phone', Order.customer_phone, min_length=9),
+        address=_field(data, 'address', Order.customer_address),
+        items=tuple(sorted(quantities.items())),
+    )
+
+
+def _scoped_key(scope, idempotency_key):
+    # Ключ действует только для своего покупателя или гостя: чужой клиент
+    # с тем же Idempotency-Key и телом получит новый заказ, а не чужой
+    return hashlib.sha256(f'{scope}\n{idempotency_key}'.encode()).hexdigest()
+
+
+def _replay(key, request_hash):
+    existing = db.session.get(OrderRequest, key)
+    if existing is None:
+        return None
+    if existing.request_hash != request_hash:
+        raise IdempotencyConflict('Ключ идемпотентности уже использован для другого заказа')
+    order = db.session.get(Order, existing.order_id)
+    if order is None:
+        # Заказ удалили в админке (внешние ключи SQLite выключены — каскада не было):
+        # ключ больше ничего не защищает, освобождаем его под новый заказ
+        db.session.delete(existing)
+        db.session.flush()
+    return order
+
+
+@retry_on_locked
+def accept_order(intake, user_id=None, idempotency_key=None, scope=''):
+    """Заказ по проверенному запросу; возвращает (заказ, создан ли сейчас).
+
+    Цены берутся из БД в той же транзакции, что и запись заказа (_priced_lines).
+    Повтор с тем же Idempotency-Key от того же scope (inventory.current_holder())
+    отдаёт прежний заказ. Остатки списываются там же; при нехватке — inventory.OutOfStock.
+    """
+    if idempotency_key and len(idempotency_key) > MAX_IDEMPOTENCY_KEY:
+        raise OrderRejected(f'Idempotency-Key: не длиннее {MAX_IDEMPOTENCY_KEY} символов')
+    if idempotency_key:
+        idempotency_key = _scoped_key(scope, idempotency_key)
+        order = _replay(idempotency_key, intake.request_hash)
+        if order is not None:
+            return order, False
+
+    lines = _priced_lines(intake.items)
+    inventory.allocate(intake.items)
+    order = _write_order(user_id, intake.name, intake.phone, intake.address, lines)
+    if idempotency_key:
+        db.session.add(OrderRequest(key=idempotency_key, request_hash=intake.request_hash, order_id=order.id))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Параллельный повтор с тем же ключом записался первым — отдаём его заказ
+        db.session.rollback()
+        order = _replay(idempotency_key, intake.request_hash) if idempotency_key else None
+        if order is None:
+            raise
+        return order, False
+    return order, True
+
+
+@retry_on_locked
+def purge_order_requests(limit=500):
+    """Удаляет до limit ключей идемпотентности старше ORDER_REQUEST_TTL; commit. Возвращает их число."""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config.get('ORDER_REQUEST_TTL', 86400))
+    keys = db.session.scalars(
+        db.select(OrderRequest.key).where(OrderRequest.created_at < cutoff).limit(limit)).all()
+    if keys:
+        db.session.execute(db.delete(OrderRequest).where(OrderRequest.key.in_(keys)))
+    db.session.commit()
+    return len(keys)
+
+
+@jobs.periodic('orders.purge_requests', 'ORDER_REQUEST_PURGE_INTERVAL')
+def purge_requests():
+    batch = current_app.config.get('ORDER_REQUEST_PURGE_BATCH', 500)
+    total = 0
+    while True:
+        purged = purge_order_requests(batch)
+        total += purged
+        if purged < batch:
+            return total
+
+
+def _notify(order, template, subject):
+    if order.user is None:
+        return  # гость оставляет только телефон
+    total_minor = to_minor(order.total_price)
+    send_mail(order.user.email, subject, render_template(template, order=order, total_minor=total_minor))
+
+
+@jobs.handler('order.placed')
+def process_placed_order(order_id):
+    order = db.session.get(Order, order_id)
+    if order is None or order.status == CANCELLED:
+        return
+    if order.status == PENDING:
+        change_status(order, CONFIRMED, notify=False)
+        db.session.commit()
+    # Повтор после сбоя SMTP сюда и попадёт: статус уже сменён, остаётся письмо
+    _notify(order, 'email/order_placed.txt', f'Заказ №{order.id} подтверждён')
+
+
+@jobs.handler('order.status_changed')
+def notify_status_changed(order_id, status):
+    order = db.session.get(Order, order_id)
+    if order is None or order.status != status:
+        return  # статус успели сменить ещё раз — письмо о нём уйдёт отдельным заданием
+    _notify(order, 'email/order_status.txt', f'Заказ №{order.id}: {status}')
+
+
+@dataclass
+class OrderHistoryPage:
+    orders: list
+    sort: str
+    status: str = None
+    next_cursor: str = None
+    filters: dict = field(default_factory=dict)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def _history_seek(descending, created_at, last_id):
+    if descending:
+        return or_(Order.created_at < created_at, and_(Order.created_at == created_at, Order.id < last_id))
+    return or_(Order.created_at > created_at, and_(Order.created_at == created_at, Order.id > last_id))
+
+
+def _decode_history_cursor(cursor):
+    position = decode_cursor(cursor)
+    if position is None or not isinstance(position[0], str):
+        return None
+    try:
+        return datetime.fromisoformat(position[0]), position[1]
+    except ValueError:
+        return None
+
+
+def order_history(user_id, status=None, sort='newest', cursor=None, limit=HISTORY_PAGE_SIZE):
+    """Страница заказов пользователя: keyset по (created_at, id) на индексе (user_id, created_at).
+
+    Позиции подгружаются одним IN-запросом только для заказов этой страницы.
+    """
+    if sort not in HISTORY_SORTS:
+        sort = 'newest'
+    if status not in STATUSES:
+        status = None
+    limit = max(1, min(int(limit), MAX_HISTORY_PAGE_SIZE))
+    descending = HISTORY_SORTS[sort]
+
+    query = Order.query.filter(Order.user_id == user_id).options(selectinload(Order.items))
+    filters = {}
+    if status:
+        query = query.filter(Order.status == status)
+        filters['status'] = status
+    position = _decode_history_cursor(cursor)
+    if position is not None:
+        query = query.filter(_history_seek(descending, *position))
+    if descending:
+        query = query.order_by(Order.created_at.desc(), Order.id.desc())
+    else:
+        query = query.order_by(Order.created_at.asc(), Order.id.asc())
+
+    orders = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        last = orders[-1]
+        next_cursor = encode_cursor([last.created_at.isoformat(), last.id])
+    return OrderHistoryPage(orders=orders, sort=sort, status=status, next_cursor=next_cursor, filters=filters)
@@ -0,0 +1,118 @@
+import hashlib
+import time
+from functools import wraps
+
+from flask import Response, make_response, request, session
+from flask_login import current_user
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+from app.cache import LocalBackend, RedisBackend, MISSING, catalog_cache
+
+
+# Кэш целых страниц для анонимных GET-запросов (/, /catalog, /flower/<slug>)
+# и фрагментов шаблонов ({% cache 'footer' %}...{% endcache %}).
+# Ключ страницы включает поколение каталога: правка букета в админке
+# делает все закэшированные страницы устаревшими. Страница букета ещё
+# и с поколением остатков — «Осталось N» не переживает заказ.
+
+
+class PageCache:
+    def __init__(self):
+        self.backend = LocalBackend(maxsize=256, ttl=60)
+        self.enabled = True
+
+    def init_app(self, app):
+        ttl = app.config.get('PAGE_CACHE_TTL', 60)
+        if app.config.get('CATALOG_CACHE_BACKEND') == 'redis':
+            self.backend = RedisBackend(app.config['CATALOG_CACHE_URL'], ttl=ttl, prefix='floweelyy:page:')
+        else:
+            self.backend = LocalBackend(maxsize=app.config.get('PAGE_CACHE_SIZE', 256), ttl=ttl)
+        self.enabled = app.config.get('PAGE_CACHE_ENABLED', True)
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self
+        app.extensions['page_cache'] = self
+
+    def _cacheable_request(self):
+        # Только анонимный посетитель с пустой сессией (без корзины и flash-сообщений)
+        return (self.enabled and request.method in ('GET', 'HEAD')
+                and not session and not current_user.is_authenticated)
+
+    def cached(self, view=None, generations=('catalog:gen',)):
+        """@cached или @cached(generations=(...)) — страница устаревает при смене любого из поколений."""
+        if view is None:
+            return lambda view: self.cached(view, generations)
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not self._cacheable_request():
+                return view(*args, **kwargs)
+
+            generation = ':'.join(str(catalog_cache.backend.counter(name)) for name in generations)
+            key = f'page:{generation}:{request.full_path}'
+            entry = self.backend.get(key)
+            if entry is MISSING:
+                response = make_response(view(*args, **kwargs))
+                # Редиректы, ошибки и ответы, поменявшие сессию, не кэшируем
+                if response.status_code != 200 or session.modified or response.direct_passthrough:
+                    return response
+                body = response.get_data()
+                entry = {
+                    'body': body,
+                    'mimetype': response.mimetype,
+                    'etag': hashlib.sha1(body).hexdigest()[:20],
+                    'last_modified': int(time.time()),
+                }
+                self.backend.set(key, entry)
+            return self._respond(entry)
+
+        return wrapper
+
+    def _respond(self, entry):
+        response = Response(entry['body'], mimetype=entry['mimetype'])
+        response.set_etag(entry['etag'])
+        response.last_modified = entry['last_modified']
+        # Браузер хранит страницу, но каждый раз сверяется (ETag / If-Modified-Since -> 304)
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+
+    def fragment(self, key, render):
+        if not self.enabled:
+            return render()
+        value = self.backend.get(key)
+        if value is MISSING:
+            value = render()
+            self.backend.set(key, value)
+        return value
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return self.backend.stats()
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache 'navbar', cart_count() %}...{% endcache %} — кэш куска шаблона по ключу."""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.List(parts)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        cache = getattr(self.environment, 'fragment_cache', None)
+        if cache is None:
+            return caller()
+        return cache.fragment('fragment:' + ':'.join(map(str, parts)), caller)
+
+
+page_cache = PageCache()
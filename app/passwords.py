@@ -0,0 +1,183 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import request
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+# Хэширование паролей вынесено из потоков запросов: PBKDF2/scrypt нарочно
+# медленные и грузят CPU, и пачка входов занимала бы все воркеры, пока
+# каталог ждёт в очереди. Хэши считает ограниченный пул процессов; когда
+# очередь полна, вход сразу получает 503, а не копит потоки.
+# Отдельно — лимиты попыток входа на IP и на аккаунт (token bucket в памяти).
+
+
+class HasherBusy(ServiceUnavailable):
+    description = 'Сервис входа перегружен, попробуйте через пару секунд.'
+
+
+class RateLimited(TooManyRequests):
+    description = 'Слишком много попыток входа. Попробуйте позже.'
+
+
+def normalize_method(method):
+    """'pbkdf2:sha256' -> 'pbkdf2:sha256:<итерации>' — как префикс хэша werkzeug."""
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2':
+        return ':'.join((*parts[:2], *(parts[2:] or [str(DEFAULT_PBKDF2_ITERATIONS)])))
+    if parts[0] == 'scrypt' and len(parts) == 1:
+        return 'scrypt:32768:8:1'
+    return method
+
+
+def _pool_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class PasswordHasher:
+    def __init__(self):
+        self.method = 'pbkdf2:sha256'
+        self.workers = 1
+        self.timeout = 10
+        self._pool = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._dummy = None
+
+    def init_app(self, app):
+        config = app.config
+        self.method = normalize_method(config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256'))
+        self.workers = config.get('PASSWORD_HASH_WORKERS', 1)
+        self.timeout = config.get('PASSWORD_HASH_TIMEOUT', 10)
+        # Одновременно: считаются workers хэшей и ждут в очереди ещё PASSWORD_HASH_QUEUE
+        self._slots = threading.BoundedSemaphore(self.workers + config.get('PASSWORD_HASH_QUEUE', 32))
+        app.extensions['passwords'] = self
+
+    def _executor(self):
+        # Пул создаётся лениво и заново после fork (gunicorn --preload). Процессы пула
+        # запускает forkserver, а не fork: воркер gthread многопоточный, и fork посреди
+        # чужого запроса унёс бы в дочерний процесс занятую кем-то блокировку
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+                self._pid = os.getpid()
+            return self._pool
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)  # PASSWORD_HASH_WORKERS=0 — в потоке запроса (тесты, отладка)
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy(retry_after=1)
+        try:
+            return self._executor().submit(func, *args).result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherBusy(retry_after=self.timeout) from None
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Проверка пароля; без хэша (нет такого аккаунта) тратит столько же времени и возвращает False."""
+        if not password_hash:
+            if self._dummy is None:
+                self._dummy = self.hash('')
+            self._run(check_password_hash, self._dummy, password or '')
+            return False
+        return self._run(check_password_hash, password_hash, password or '')
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.method
+
+
+class TokenBucket:
+    """Лимит попыток: capacity штук, восстанавливаются равномерно за period секунд.
+
+    Ключей не больше maxsize — самые старые вытесняются (их корзины и так почти полные).
+    """
+
+    def __init__(self, capacity, period, maxsize=10000):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tokens(self, key, now):
+        tokens, updated = self._buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def _retry_after(self, tokens):
+        return max(1, int((1 - tokens) / self.rate + 0.999))
+
+    def peek(self, key):
+        """0, если попытка есть; иначе через сколько секунд появится."""
+        with self._lock:
+            tokens = self._tokens(key, time.monotonic())
+        return 0 if tokens >= 1 else self._retry_after(tokens)
+
+    def take(self, key):
+        """Списывает попытку; возвращает 0 или через сколько секунд повторить."""
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._tokens(key, now)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return self._retry_after(tokens)
+            self._buckets[key] = (tokens - 1, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return 0
+
+
+def _parse_rate(value):
+    # '10/60' — 10 попыток за 60 секунд
+    count, period = value.split('/')
+    return int(count), float(period)
+
+
+class LoginGuard:
+    """Лимиты входа: каждая попытка с IP и неудачные попытки на аккаунт."""
+
+    def __init__(self):
+        self.by_ip = TokenBucket(20, 60)
+        self.by_account = TokenBucket(5, 300)
+        self.enabled = True
+
+    def init_app(self, app):
+        self.enabled = app.config.get('LOGIN_RATE_LIMIT_ENABLED', True)
+        self.by_ip = TokenBucket(*_parse_rate(app.config.get('LOGIN_RATE_PER_IP', '20/60')))
+        self.by_account = TokenBucket(*_parse_rate(app.config.get('LOGIN_RATE_PER_ACCOUNT', '5/300')))
+        app.extensions['login_guard'] = self
+
+    def check(self, account=None):
+        """Перед проверкой пароля: бросает RateLimited, если с этого IP или на этот аккаунт хватит."""
+        if not self.enabled:
+            return
+        retry_after = self.by_ip.take(request.remote_addr or '-')
+        if not retry_after and account is not None:
+            retry_after = self.by_account.peek(account.lower())
+        if retry_after:
+            raise RateLimited(retry_after=retry_after)
+
+    def failed(self, account):
+        if self.enabled:
+            self.by_account.take(account.lower())
+
+
+passwords = PasswordHasher()
+login_guard = LoginGuard()
+
+
+def init_app(app):
+    passwords.init_app(app)
+    login_guard.init_app(app)
@@ -0,0 +1,266 @@
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+import click
+from sqlalchemy import func
+
+from app.models import db, Order, OrderItem, DailySales, DailyFlowerSales
+from app.database import insert_for_dialect, on_duplicate_key, retry_on_locked
+from app.money import from_minor, to_minor
+from app.orders import CANCELLED, PENDING
+from app import jobs
+
+
+# Отчёты по продажам читаются из сводок daily_sales и daily_flower_sales:
+# запрос перебирает дни периода, а не заказы, и не дорожает с ростом истории.
+# Сводки пополняет воркер (задание analytics.sync после создания заказа и
+# смены статуса). Order.rollup_status помнит, с каким статусом заказ уже
+# учтён, поэтому повтор задания ничего не удваивает. Правка и удаление
+# заказа в админке сначала вычитают его из сводок (unroll_order).
+# `flask analytics-rebuild` пересчитывает сводки по всей истории пачками.
+
+REBUILD_BATCH = 2000
+PERIODS = (7, 30, 90, 365)
+COUNTERS = ('orders', 'units', 'revenue_minor')
+
+
+def _add(model, rows, keys):
+    """Прибавляет счётчики к строкам сводки (INSERT ... ON CONFLICT DO UPDATE x = x + excluded.x)."""
+    if not rows:
+        return
+    insert = insert_for_dialect()
+    statement = insert(model).values(rows)
+    new = statement.inserted if on_duplicate_key(statement) else statement.excluded
+    update = {counter: getattr(model, counter) + new[counter] for counter in COUNTERS}
+    if 'name' in rows[0]:
+        update['name'] = new.name
+    if on_duplicate_key(statement):
+        statement = statement.on_duplicate_key_update(**update)
+    else:
+        statement = statement.on_conflict_do_update(index_elements=keys, set_=update)
+    db.session.execute(statement)
+
+
+def _add_sales(rows):
+    _add(DailySales, rows, [DailySales.day, DailySales.status])
+
+
+def _add_flower_sales(rows):
+    _add(DailyFlowerSales, rows, [DailyFlowerSales.day, DailyFlowerSales.flower_id])
+
+
+def _sold(status):
+    # Отменённые заказы видны в разбивке по статусам, но не в продажах букетов
+    return status is not None and status != CANCELLED
+
+
+def _move(day, items, total_price, old, new):
+    """Переносит вклад заказа в сводках со статуса old на new; None — заказ не учтён. Без commit.
+
+    items — [(flower_id, название, цена, количество)].
+    """
+    units = sum(quantity for _, _, _, quantity in items)
+    revenue = to_minor(total_price)
+    sales = []
+    if new is not None:
+        sales.append({'day': day, 'status': new, 'orders': 1, 'units': units, 'revenue_minor': revenue})
+    if old is not None:
+        sales.append({'day': day, 'status': old, 'orders': -1, 'units': -units, 'revenue_minor': -revenue})
+    _add_sales(sales)
+
+    sign = _sold(new) - _sold(old)
+    if sign:
+        flowers = {}
+        for flower_id, name, price, quantity in items:
+            if flower_id is None:
+                continue
+            row = flowers.setdefault(flower_id, {'day': day, 'flower_id': flower_id, 'name': name,
+                                                 'orders': sign, 'units': 0, 'revenue_minor': 0})
+            row['units'] += sign * quantity
+            row['revenue_minor'] += sign * to_minor(price) * quantity
+        _add_flower_sales(list(flowers.values()))
+
+
+def _claim(order_id, old, new):
+    # Условный UPDATE: из двух заданий по одному заказу сводки поправит только одно
+    return db.session.execute(
+        db.update(Order)
+        .where(Order.id == order_id, Order.rollup_status.is_(None) if old is None else Order.rollup_status == old)
+        .values(rollup_status=new)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+@jobs.handler('analytics.sync')
+@retry_on_locked
+def sync_order(order_id):
+    """Переносит заказ в сводках со статуса, с которым он учтён, на текущий. Повтор безопасен."""
+    order = db.session.get(Order, order_id)
+    if order is None:
+        return
+    old, new = order.rollup_status, order.status or PENDING
+    if old == new:
+        return
+    if not _claim(order.id, old, new):
+        db.session.rollback()
+        return
+    _move(order.created_at.date(), [(item.flower_id, item.name, item.price, item.quantity) for item in order.items],
+          order.total_price, old, new)
+    db.session.commit()
+
+
+def unroll_order(order_id):
+    """Вычитает заказ из сводок в том виде, в каком он сохранён в БД, и помечает неучтённым. Без commit.
+
+    Для правки и удаления заказа в админке: вызывать до flush изменений, в той же
+    транзакции. После правки заказ вернёт в сводки задание analytics.sync.
+    """
+    with db.session.no_autoflush:
+        row = db.session.execute(
+            db.select(Order.created_at, Order.total_price, Order.rollup_status).where(Order.id == order_id)
+        ).one_or_none()
+        if row is None or row.rollup_status is None or not _claim(order_id, row.rollup_status, None):
+            return
+        items = db.session.execute(
+            db.select(OrderItem.flower_id, OrderItem.name, OrderItem.price, OrderItem.quantity)
+            .where(OrderItem.order_id == order_id)).all()
+        _move(row.created_at.date(), items, row.total_price, row.rollup_status, None)
+
+
+def _day(value):
+    # func.date() в SQLite возвращает строку, в PostgreSQL/MySQL — date
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+@retry_on_locked
+def _rebuild_batch(after_id, limit):
+    """Учитывает следующие limit заказов (по id) одним набором GROUP BY; возвращает последний id."""
+    ids = db.session.scalars(
+        db.select(Order.id).where(Order.id > after_id).order_by(Order.id).limit(limit)).all()
+    if not ids:
+        return None
+    # Заказы, которые воркер уже успел учесть после сброса, пропускаем
+    batch = (Order.id.between(ids[0], ids[-1]), Order.rollup_status.is_(None))
+    day = func.date(Order.created_at)
+    status = func.coalesce(Order.status, PENDING)
+
+    units = {(_day(d), s): u for d, s, u in db.session.execute(
+        db.select(day, status, func.sum(OrderItem.quantity))
+        .select_from(OrderItem).join(Order, OrderItem.order_id == Order.id)
+        .where(*batch).group_by(day, status))}
+    _add_sales([
+        {'day': _day(d), 'status': s, 'orders': count, 'units': units.get((_day(d), s), 0) or 0,
+         'revenue_minor': int(revenue or 0)}
+        for d, s, count, revenue in db.session.execute(
+            db.select(day, status, func.count(Order.id), func.sum(func.round(Order.total_price * 100)))
+            .where(*batch).group_by(day, status))
+    ])
+    _add_flower_sales([
+        {'day': _day(d), 'flower_id': flower_id, 'name': name, 'orders': orders, 'units': quantity,
+         'revenue_minor': int(revenue or 0)}
+        for d, flower_id, name, orders, quantity, revenue in db.session.execute(
+            db.select(day, OrderItem.flower_id, func.max(OrderItem.name), func.count(func.distinct(Order.id)),
+                      func.sum(OrderItem.quantity),
+                      func.sum(func.round(OrderItem.price * 100) * OrderItem.quantity))
+            .select_from(OrderItem).join(Order, OrderItem.order_id == Order.id)
+            .where(*batch, status != CANCELLED, OrderItem.flower_id.isnot(None))
+            .group_by(day, OrderItem.flower_id))
+    ])
+    db.session.execute(db.update(Order).where(*batch).values(rollup_status=status)
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+    return ids[-1]
+
+
+def rebuild(batch_size=REBUILD_BATCH, progress=None):
+    """Пересчитывает сводки по всей истории; в памяти — агрегаты одной пачки заказов."""
+    db.session.execute(db.delete(DailySales))
+    db.session.execute(db.delete(DailyFlowerSales))
+    db.session.execute(db.update(Order).values(rollup_status=None).execution_options(synchronize_session=False))
+    db.session.commit()
+    last_id = 0
+    while (last_id := _rebuild_batch(last_id, batch_size)) is not None:
+        if progress:
+            progress(last_id)
+
+
+# --- чтение ---
+
+def revenue_per_day(start=None, end=None):
+    """[(день, заказов, выручка в леях)] за период [start, end), без отменённых."""
+    query = (db.select(DailySales.day, func.sum(DailySales.orders), func.sum(DailySales.revenue_minor))
+             .where(DailySales.status != CANCELLED))
+    if start is not None:
+        query = query.where(DailySales.day >= start)
+    if end is not None:
+        query = query.where(DailySales.day < end)
+    rows = db.session.execute(query.group_by(DailySales.day).order_by(DailySales.day)).all()
+    return [(day, orders, from_minor(revenue)) for day, orders, revenue in rows]
+
+
+def status_counts(start=None):
+    """{статус: заказов} с даты start."""
+    orders = func.sum(DailySales.orders)
+    query = db.select(DailySales.status, orders)
+    if start is not None:
+        query = query.where(DailySales.day >= start)
+    # Строки сводки не удаляются: статус, из которого все заказы ушли, остаётся с нулём
+    return dict(db.session.execute(query.group_by(DailySales.status).having(orders != 0)).all())
+
+
+def top_sellers(limit=10, start=None):
+    """[(flower_id, название, штук, выручка в леях)] — самые продаваемые букеты."""
+    units = func.sum(DailyFlowerSales.units).label('units')
+    query = db.select(DailyFlowerSales.flower_id, func.max(DailyFlowerSales.name), units,
+                      func.sum(DailyFlowerSales.revenue_minor))
+    if start is not None:
+        query = query.where(DailyFlowerSales.day >= start)
+    rows = db.session.execute(
+        query.group_by(DailyFlowerSales.flower_id).order_by(units.desc()).limit(limit)).all()
+    return [(flower_id, name, quantity, from_minor(revenue)) for flower_id, name, quantity, revenue in rows]
+
+
+def flower_demand(flower_id):
+    """Сколько штук букета заказано всего (без отменённых)."""
+    return db.session.scalar(
+        db.select(func.coalesce(func.sum(DailyFlowerSales.units), 0)).where(DailyFlowerSales.flower_id == flower_id))
+
+
+@dataclass
+class Dashboard:
+    days: int
+    start: date
+    daily: list
+    statuses: dict
+    top: list
+
+    @property
+    def orders(self):
+        return sum(orders for _, orders, _ in self.daily)
+
+    @property
+    def revenue(self):
+        return sum(revenue for _, _, revenue in self.daily)
+
+    @property
+    def average_basket(self):
+        return self.revenue / self.orders if self.orders else 0
+
+
+def dashboard(days=30):
+    """Сводка за последние days дней, включая сегодняшний (UTC)."""
+    if days not in PERIODS:
+        days = 30
+    start = datetime.utcnow().date() - timedelta(days=days - 1)
+    return Dashboard(days=days, start=start, daily=revenue_per_day(start), statuses=status_counts(start),
+                     top=top_sellers(10, start))
+
+
+def init_app(app):
+    @app.cli.command('analytics-rebuild')
+    @click.option('--batch-size', type=int, default=REBUILD_BATCH, help='Заказов в одной транзакции.')
+    def analytics_rebuild(batch_size):
+        """Пересчитывает сводки аналитики по всей истории заказов."""
+        rebuild(batch_size, progress=lambda last_id: click.echo(f'\rзаказы до №{last_id}', nl=False, err=True))
+        click.echo(err=True)
+        click.echo('Сводки пересчитаны')
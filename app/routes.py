@@ -1,27 +1,41 @@
 import json
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, current_app, jsonify, render_template, request, redirect, url_for, flash, session
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from app.forms import RegistrationForm
+from app.catalog import SORTS, valid_id
+from app.cache import catalog_cache
+from app.page_cache import page_cache
+from app import cart as cart_service, inventory
+from app.money import format_minor
+from app.orders import (STATUSES, IdempotencyConflict, OrderRejected, accept_order, create_order_from_cart,
+                        order_history, order_json, parse_intake)
 
-from app.models import db, Flower, Order, User, Cart
+from app.identity import AnonymousIdentity, customer_required, identities, identity_for
+from app.models import db, User, Cart
+from app.passwords import login_guard, passwords
 
 
 main_bp = Blueprint('main', __name__)
 auth_bp = Blueprint("auth", __name__)
 
+@main_bp.app_template_filter('lei')
+def lei_filter(amount_minor):
+    return format_minor(amount_minor)
+
+
+@main_bp.app_context_processor
+def inject_cart_badge():
+    # Функция, а не число: запрос к корзине идёт, только если шаблон её вызвал
+    return {'cart_count': cart_service.badge_count}
+
+
 # Настраиваем авторизацию
 login_manager = LoginManager()
 login_manager.login_view = "auth.login"
-
-
-@login_manager.user_loader
-def load_user(user_id):
-    user = User.query.get(int(user_id))
-    if user:
-        return user
-    return AdminUser.query.get(int(user_id))
+login_manager.anonymous_user = AnonymousIdentity
+# Снимок пользователя из кэша вместо запроса к User на каждой странице
+login_manager.user_loader(identities.load)
 
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
@@ -31,7 +45,8 @@ def register():
     
     form = RegistrationForm()
     if form.validate_on_submit():
-        hashed_password = generate_password_hash(form.password.data, method='pbkdf2:sha256')
+        login_guard.check()
+        hashed_password = passwords.hash(form.password.data)
         new_user = User(
             name=form.name.data, 
             email=form.email.data, 
@@ -51,14 +66,23 @@ def login():
         return redirect (url_for('main.index'))
     
     if request.method == 'POST':
-        email = request.form.get("email")
+        email = request.form.get("email") or ''
         password = request.form.get("password")
+        login_guard.check(f'u:{email}')
         user = User.query.filter_by(email=email).first()
-        
-        if user and check_password_hash(user.password, password):
-            login_user(user)
+
+        if passwords.verify(user.password if user else None, password):
+            if passwords.needs_rehash(user.password):
+                # Сменили алгоритм или стоимость — пароль в открытом виде есть только сейчас
+                user.password = passwords.hash(password)
+                db.session.commit()
+            login_user(identity_for(user))
+            cart_service.merge_guest_cart(user.id)
+            if hasattr(session, 'regenerate'):
+                session.regenerate()
             return redirect(url_for('main.index'))
         else:
+            login_guard.failed(f'u:{email}')
             flash("Неверный email или пароль.", "danger")
     return render_template("auth/login.html")
 
@@ -71,10 +95,12 @@ def logout():
 
 
 @auth_bp.route('/delete_account', methods=['POST'])
-@login_required
+@customer_required
 def delete_account():
-    user = User.query.get(current_user.id)
+    user = db.session.get(User, current_user.id)
     if user:
+        # Cart.user_id NOT NULL — строки корзины удаляем сами, заказы остаются без владельца
+        db.session.execute(db.delete(Cart).where(Cart.user_id == user.id))
         db.session.delete(user)
         db.session.commit()
         logout_user()
@@ -86,181 +112,208 @@ def delete_account():
 
 
 @auth_bp.route('/profile')
-@login_required
+@customer_required
 def profile():
-    orders = Order.query.filter_by(user_id=current_user.id).all()
-    
-    
-    return render_template("auth/profile.html", user=current_user, orders=orders)
+    page = order_history(
+        current_user.id,
+        status=request.args.get('status') or None,
+        sort=request.args.get('sort', 'newest'),
+        cursor=request.args.get('cursor'),
+    )
+    return render_template("auth/profile.html", user=current_user, orders=page.orders, page=page,
+                           statuses=STATUSES)
 
 
 @main_bp.route('/cart')
 def cart():
-    if current_user.is_authenticated:
-        cart_items = db.session.query(Cart, Flower).join(Flower).filter(Cart.user_id == current_user.id).all()
-        cart_data = [{'flower': flower, 'quantity': cart.quantity} for cart, flower in cart_items]
-    else:
-        cart_data = []
-        if 'cart' in session:
-            flower_ids = [item['flower_id'] for item in session['cart']]
-            flowers = Flower.query.filter(Flower.id.in_(flower_ids)).all()
-            flower_dict = {flower.id: flower for flower in flowers}
-            
-            for item in session['cart']:
-                flower = flower_dict.get(item['flower_id'])
-                if flower:
-                    cart_data.append({'flower': flower, 'quantity': item['quantity']})
-    
-    return render_template('cart.html', cart=cart_data)
+    cart_data = cart_service.current_cart()
+    stock = inventory.available(line.flower.id for line in cart_data)
+    return render_template('cart.html', cart=cart_data, stock=stock)
 
 
 @main_bp.route('/add_to_cart/<int:flower_id>', methods=['POST'])
 def add_to_cart(flower_id):
-    if current_user.is_authenticated:
-        # Если пользователь авторизован, добавляем в БД
-        existing_item = Cart.query.filter_by(user_id=current_user.id, flower_id=flower_id).first()
-        if existing_item:
-            existing_item.quantity += 1  # Увеличиваем количество
-        else:
-            new_cart_item = Cart(user_id=current_user.id, flower_id=flower_id, quantity=1)
-            db.session.add(new_cart_item)
-        db.session.commit()
+    # Внешние ключи в SQLite выключены — букет без строки в каталоге в корзину не пускаем
+    if not valid_id(flower_id) or catalog_cache.flower(flower_id) is None:
+        flash("Такой букет не найден.", "danger")
+        return redirect(url_for('main.catalog'))
+    if inventory.available([flower_id]).get(flower_id) == 0:
+        flash("Этого букета сейчас нет в наличии.", "danger")
+        return redirect(url_for('main.cart'))
+    if current_user.is_customer:
+        # Если пользователь авторизован, добавляем в БД (upsert за один запрос)
+        cart_service.add_item(current_user.id, flower_id)
     else:
         # Если пользователь не авторизован, храним в session
-        if 'cart' not in session:
-            session['cart'] = []
-        cart = session['cart']
-        
-        for item in cart:
-            if item['flower_id'] == flower_id:
-                item['quantity'] += 1
-                break
-        else:
-            cart.append({'flower_id': flower_id, 'quantity': 1})
-        
-        session.modified = True  # Обновляем сессию
+        cart_service.add_guest_item(flower_id)
 
     return redirect(url_for('main.cart'))
 
 
 @main_bp.route('/remove_from_cart/<int:flower_id>', methods=['POST'])
 def remove_from_cart(flower_id):
-    if current_user.is_authenticated:
-        cart_item = Cart.query.filter_by(user_id=current_user.id, flower_id=flower_id).first()
-        if cart_item:
-            db.session.delete(cart_item)
-            db.session.commit()
+    if current_user.is_customer:
+        cart_service.remove_item(current_user.id, flower_id)
     else:
-        if 'cart' in session:
-            session['cart'] = [item for item in session['cart'] if item['flower_id'] != flower_id]
-            session.modified = True
+        cart_service.remove_guest_item(flower_id)
+
+    return redirect(url_for('main.cart'))
 
+
+@main_bp.route('/cart/update', methods=['POST'])
+def update_cart():
+    """Несколько количеств за раз: JSON [{flower_id, quantity}] или поля формы quantity-<flower_id>."""
+    items = request.get_json(silent=True)
+    if items is None:
+        items = []
+        for key, value in request.form.items():
+            if key.startswith('quantity-'):
+                try:
+                    items.append({'flower_id': int(key[len('quantity-'):]), 'quantity': int(value or 0)})
+                except ValueError:
+                    items = None
+                    break
+    try:
+        cart_service.update_quantities(cart_service.parse_changes(items))
+    except cart_service.CartRejected as error:
+        flash(str(error), "danger")
     return redirect(url_for('main.cart'))
 
 
 @main_bp.route('/checkout', methods=['GET', 'POST'])
 def checkout():
+    cart_data = cart_service.current_cart()
+    if not cart_data:
+        flash("Ваша корзина пуста!", "danger")
+        return redirect(url_for('main.cart'))
+
     if request.method == 'GET':
-        if current_user.is_authenticated:
-            user_name = current_user.name
-            user_phone = current_user.phone
-            return render_template("checkout.html", name=user_name, phone=user_phone)
-        
-    if request.method == 'POST':
-        name = request.form.get('name')
-        phone = request.form.get('phone')
-        address = request.form.get('address')
-
-        if not name or not phone or not address:
-            flash("Заполните все поля!", "danger")
-            return redirect(url_for('main.checkout'))
-
-        # Получаем корзину
-        cart_data = []
-        if current_user.is_authenticated:
-            cart_items = db.session.query(Cart, Flower).join(Flower).filter(Cart.user_id == current_user.id).all()
-            cart_data = [{'flower': flower, 'quantity': cart.quantity} for cart, flower in cart_items]
-        else:
-            if 'cart' in session:
-                flower_ids = [item['flower_id'] for item in session['cart']]
-                flowers = Flower.query.filter(Flower.id.in_(flower_ids)).all()
-                flower_dict = {flower.id: flower for flower in flowers}
-
-                for item in session['cart']:
-                    flower = flower_dict.get(item['flower_id'])
-                    if flower:
-                        cart_data.append({'flower': flower, 'quantity': item['quantity']})
-
-        if not cart_data:
-            flash("Ваша корзина пуста!", "danger")
-            return redirect(url_for('main.cart'))
-
-        # Создаём JSON с товарами
-        items_json = json.dumps([
-            {'name': item['flower'].name, 'quantity': item['quantity'], 'price': item['flower'].price}
-            for item in cart_data
-        ])
-
-        total_price = sum(item['flower'].price * item['quantity'] for item in cart_data)
-
-        new_order = Order(
-            user_id=current_user.id if current_user.is_authenticated else None,
-            customer_name=name,
-            customer_phone=phone,
-            customer_address=address,
-            items=items_json,
-            total_price=total_price
-        )
-        db.session.add(new_order)
-        db.session.commit()
+        # Сама страница ничего не пишет (её могут запросить префетч, краулер или чужой <img>):
+        # букеты откладывает POST /checkout/hold из скрипта страницы
+        name = current_user.name if current_user.is_customer else ''
+        phone = current_user.phone if current_user.is_customer else ''
+        return render_template("checkout.html", name=name, phone=phone,
+                               hold_minutes=current_app.config['INVENTORY_HOLD_TTL'] // 60)
 
-        # Очищаем корзину
-        if current_user.is_authenticated:
-            Cart.query.filter_by(user_id=current_user.id).delete()
-            db.session.commit()
-        else:
-            session.pop('cart', None)
+    name = request.form.get('name')
+    phone = request.form.get('phone')
+    address = request.form.get('address')
+
+    if not name or not phone or not address:
+        flash("Заполните все поля!", "danger")
+        return redirect(url_for('main.checkout'))
+
+    user_id = current_user.id if current_user.is_customer else None
+    try:
+        create_order_from_cart(cart_data, name, phone, address, user_id=user_id,
+                               holder=inventory.current_holder())
+    except (inventory.OutOfStock, OrderRejected) as error:
+        flash(str(error), "danger")
+        return redirect(url_for('main.cart'))
+    if user_id is None:
+        cart_service.clear_guest()
+
+    flash("Заказ успешно оформлен!", "success")
+    return redirect(url_for('main.index'))
 
-        flash("Заказ успешно оформлен!", "success")
-        return redirect(url_for('main.index'))
 
-    return render_template("checkout.html")
+@main_bp.route('/checkout/hold', methods=['POST'])
+def hold_checkout():
+    """Пока покупатель заполняет форму, букеты из корзины отложены и не уйдут другим."""
+    cart_data = cart_service.current_cart()
+    if not cart_data:
+        return jsonify(error='Корзина пуста'), 400
+    try:
+        expires_at = inventory.reserve(inventory.current_holder(),
+                                       [(line.flower.id, line.quantity) for line in cart_data])
+    except inventory.OutOfStock as error:
+        return jsonify(error=str(error), shortages=error.shortages), 409
+    except inventory.HoldRejected as error:
+        return jsonify(error=str(error)), 400
+    return jsonify(expires_at=expires_at.isoformat(timespec='seconds') + 'Z')
 
 
 @main_bp.route('/')
+@page_cache.cached
 def index():
-    flowers = Flower.query.all()
-    return render_template('index.html', flowers=flowers)
+    page = catalog_cache.catalog_page(limit=current_app.config.get('INDEX_PAGE_SIZE', 6))
+    return render_template('index.html', flowers=page.items, page=page)
 
 
 @main_bp.route('/catalog')
+@page_cache.cached
 def catalog():
-    flowers = Flower.query.all()
-    return render_template('catalog.html', flowers=flowers)
+    page = catalog_cache.page_from_args(request.args, limit=current_app.config.get('CATALOG_PAGE_SIZE', 24))
+    return render_template('catalog.html', flowers=page.items, page=page, sorts=SORTS)
 
 
-@main_bp.route('/flower/<string:flower_name>')
-def flower_detail(flower_name):
-    flower = Flower.query.filter_by(name=flower_name).first()
+@main_bp.route('/flower/<string:slug>')
+@page_cache.cached(generations=('catalog:gen', inventory.STOCK_GENERATION))
+def flower_detail(slug):
+    flower_id = catalog_cache.flower_id_by_slug(slug)
+    flower = catalog_cache.flower(flower_id) if flower_id is not None else None
     if not flower:
+        # Старые ссылки по названию букета ведут на его постоянный адрес
+        canonical_slug = catalog_cache.slug_by_name(slug)
+        if canonical_slug and canonical_slug != slug:
+            return redirect(url_for('main.flower_detail', slug=canonical_slug), code=301)
         flash("Такой букет не найден.", "danger")
         return redirect(url_for('main.catalog'))
-    
-    return render_template('flower_detail.html', flower=flower)
 
+    stock = inventory.available([flower.id]).get(flower.id)
+    return render_template('flower_detail.html', flower=flower, stock=stock)
 
-@main_bp.route('/order', methods=['POST'])
-def place_order():
-    name = request.form.get('name')
-    phone = request.form.get('phone')
-    address = request.form.get('address')
-    items = request.form.get('items')  # JSON-список товаров
-    total_price = request.form.get('total_price')
 
-    order = Order(customer_name=name, customer_phone=phone, customer_address=address, 
-                  items=items, total_price=total_price)
-    db.session.add(order)
-    db.session.commit()
+@main_bp.route('/search')
+@page_cache.cached
+def search():
+    query = request.args.get('q', '').strip()
+    flowers = catalog_cache.search(query) if query else []
+    return render_template('search.html', flowers=flowers, query=query)
 
-    return redirect(url_for('main.index'))
+
+@main_bp.route('/search/suggest')
+def search_suggest():
+    suggestions = catalog_cache.suggest(request.args.get('q', ''))
+    response = jsonify([
+        {'name': name, 'url': url_for('main.flower_detail', slug=slug)}
+        for name, slug in suggestions
+    ])
+    # Одинаковые подсказки нужны всем — пусть браузер и прокси держат их минуту
+    response.cache_control.public = True
+    response.cache_control.max_age = 60
+    return response
+
+
+@main_bp.route('/order', methods=['POST'])
+def place_order():
+    """Приём заказа: JSON {name, phone, address, items: [{flower_id, quantity}]}.
+
+    Цены и сумму считает сервер. Повтор с тем же заголовком Idempotency-Key
+    возвращает уже созданный заказ со статусом 200 вместо второй записи.
+    """
+    data = request.get_json(silent=True)
+    if data is None:  # форма: items — JSON-строка
+        data = request.form.to_dict()
+        try:
+            data['items'] = json.loads(data.get('items') or '[]')
+        except ValueError:
+            data['items'] = None
+    try:
+        intake = parse_intake(data)
+        order, created = accept_order(intake, user_id=current_user.id if current_user.is_customer else None,
+                                      idempotency_key=request.headers.get('Idempotency-Key') or None,
+                                      scope=inventory.current_holder())
+    except IdempotencyConflict as error:
+        return jsonify(error=str(error)), 422
+    except inventory.OutOfStock as error:
+        return jsonify(error=str(error), shortages=error.shortages), 409
+    except OrderRejected as error:
+        return jsonify(error=str(error)), 400
+
+    response = jsonify(order_json(order))
+    response.status_code = 201 if created else 200
+    if not created:
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response
 
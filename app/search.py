@@ -0,0 +1,129 @@
+import re
+
+import click
+from sqlalchemy import func, literal_column, or_, table, column, text
+
+from app.models import db, Flower
+from app.catalog import FlowerSummary, list_columns
+
+
+# Полнотекстовый поиск по каталогу: виртуальная таблица FTS5 flower_fts
+# (rowid = flower.id, синхронизируется триггерами из миграции).
+# unicode61 приводит кириллицу к нижнему регистру и убирает диакритику
+# латиницы (ș, ț, ă); «ё» он не трогает, поэтому в индекс и в запрос
+# она попадает уже как «е». Окончаний русский токенизатор не знает —
+# каждое слово ищется как префикс: «роз» найдёт «розы», «розами».
+
+FTS_TABLE = 'flower_fts'
+SEARCH_LIMIT = 48
+SUGGEST_LIMIT = 8
+MIN_SUGGEST_LENGTH = 2
+MAX_TOKENS = 6
+# Совпадение в названии важнее совпадения в описании
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+TOKEN_RE = re.compile(r'\w+')
+
+fts = table(FTS_TABLE, column('rowid'))
+
+
+def _yo(value):
+    return f"replace(replace({value}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+# DDL дублирует миграцию: batch-миграции SQLite пересоздают flower и теряют триггеры,
+# `flask search-rebuild` возвращает их на место
+DDL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON flower BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, {_yo('new.name')}, {_yo('new.description')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON flower BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description ON flower BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, {_yo('new.name')}, {_yo('new.description')});
+    END""",
+)
+REINDEX = (
+    f'DELETE FROM {FTS_TABLE}',
+    f"""INSERT INTO {FTS_TABLE}(rowid, name, description)
+        SELECT id, {_yo('name')}, {_yo('description')} FROM flower""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')",
+)
+
+
+def normalize(query):
+    """Слова запроса в нижнем регистре; кавычки и операторы FTS5 отбрасываются."""
+    return TOKEN_RE.findall((query or '').lower().replace('ё', 'е'))[:MAX_TOKENS]
+
+
+def match_expression(tokens, column_name=None):
+    # "слово"* — префиксный поиск; слова через пробел — неявный AND
+    terms = ' '.join(f'"{token}"*' for token in tokens)
+    return f'{column_name} : ({terms})' if column_name else terms
+
+
+def _uses_fts():
+    return db.session.get_bind(mapper=Flower).dialect.name == 'sqlite'
+
+
+def _like(tokens, *columns):
+    # Запасной вариант для серверных СУБД без FTS5
+    return [or_(*(col.ilike(f'%{token}%') for col in columns)) for token in tokens]
+
+
+def search_flowers(query, limit=SEARCH_LIMIT):
+    """Букеты по релевантности (bm25), название весит больше описания."""
+    tokens = normalize(query)
+    if not tokens:
+        return []
+    rows = db.session.query(*list_columns())
+    if _uses_fts():
+        rank = func.bm25(literal_column(FTS_TABLE), NAME_WEIGHT, DESCRIPTION_WEIGHT)
+        rows = (rows.join(fts, fts.c.rowid == Flower.id)
+                .filter(literal_column(FTS_TABLE).op('MATCH')(match_expression(tokens)))
+                .order_by(rank, Flower.id))
+    else:
+        rows = rows.filter(*_like(tokens, Flower.name, Flower.description)).order_by(Flower.name, Flower.id)
+    return [FlowerSummary(*row) for row in rows.limit(limit)]
+
+
+def suggest(query, limit=SUGGEST_LIMIT):
+    """Подсказки для строки поиска: только по названию, [(name, slug)].
+
+    Порядок — новые букеты первыми: FTS5 отдаёт совпадения по убыванию rowid
+    и останавливается после limit строк, а bm25 пришлось бы считать для всех
+    совпадений короткого префикса.
+    """
+    tokens = normalize(query)
+    if not tokens or len(''.join(tokens)) < MIN_SUGGEST_LENGTH:
+        return []
+    rows = db.session.query(Flower.name, Flower.slug)
+    if _uses_fts():
+        rows = (rows.join(fts, fts.c.rowid == Flower.id)
+                .filter(literal_column(FTS_TABLE).op('MATCH')(match_expression(tokens, 'name')))
+                .order_by(fts.c.rowid.desc()))
+    else:
+        rows = rows.filter(*_like(tokens, Flower.name)).order_by(Flower.id.desc())
+    return [tuple(row) for row in rows.limit(limit)]
+
+
+def rebuild():
+    """Создаёт таблицу и триггеры, если их нет, и заново индексирует весь каталог."""
+    for statement in DDL + REINDEX:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+
+def init_app(app):
+    @app.cli.command('search-rebuild')
+    def search_rebuild():
+        """Перестраивает полнотекстовый индекс каталога (SQLite FTS5)."""
+        if not _uses_fts():
+            raise click.ClickException('Полнотекстовый индекс нужен только для SQLite')
+        rebuild()
+        click.echo(f'Проиндексировано букетов: {Flower.query.count()}')
@@ -0,0 +1,184 @@
+import secrets
+import threading
+import time
+from datetime import datetime
+
+import click
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from app.models import db, SessionRecord
+
+
+# Серверные сессии: в cookie лежит только случайный sid, а данные
+# (корзина гостя, flash-сообщения, id пользователя) — в хранилище.
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.rotate = False
+
+    def regenerate(self):
+        # Новый sid после входа — защита от фиксации сессии
+        self.rotate = True
+        self.modified = True
+
+
+class MemoryStore:
+    """Хранилище в памяти процесса — для тестов и локального запуска."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._data.get(sid)
+        if entry is None or entry[1] <= datetime.utcnow():
+            return None
+        return entry[0]
+
+    def save(self, sid, data, expires_at):
+        with self._lock:
+            self._data[sid] = (data, expires_at)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def sweep(self):
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [sid for sid, (_, expires_at) in self._data.items() if expires_at <= now]
+            for sid in expired:
+                del self._data[sid]
+        return len(expired)
+
+
+class SqlStore:
+    """Таблица server_session в основной БД.
+
+    Работает через отдельное соединение движка, а не через db.session:
+    сохранение сессии не должно смешиваться с транзакцией запроса.
+    """
+
+    table = SessionRecord.__table__
+
+    def load(self, sid):
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                db.select(self.table.c.data).where(self.table.c.sid == sid,
+                                                   self.table.c.expires_at > datetime.utcnow())
+            ).first()
+        return row[0] if row else None
+
+    def save(self, sid, data, expires_at):
+        with db.engine.begin() as connection:
+            updated = connection.execute(
+                self.table.update().where(self.table.c.sid == sid).values(data=data, expires_at=expires_at)
+            ).rowcount
+            if not updated:
+                connection.execute(self.table.insert().values(sid=sid, data=data, expires_at=expires_at))
+
+    def delete(self, sid):
+        with db.engine.begin() as connection:
+            connection.execute(self.table.delete().where(self.table.c.sid == sid))
+
+    def sweep(self):
+        with db.engine.begin() as connection:
+            return connection.execute(
+                self.table.delete().where(self.table.c.expires_at <= datetime.utcnow())
+            ).rowcount
+
+
+class ServerSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, sweep_interval=3600):
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def _new_session(self):
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid:
+            return self._new_session()
+        data = self.store.load(sid)
+        if data is None:
+            return self._new_session()
+        try:
+            return ServerSession(self.serializer.loads(data), sid=sid)
+        except ValueError:
+            return self._new_session()
+
+    def _lifetime(self, app):
+        return app.permanent_session_lifetime
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            # Пустую сессию не храним: у гостя без корзины нет записи в БД
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.rotate:
+            self.store.delete(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+
+        expires_at = datetime.utcnow() + self._lifetime(app)
+        # Пишем только изменённые сессии: обычный просмотр каталога не трогает БД
+        if session.modified:
+            self.store.save(session.sid, self.serializer.dumps(dict(session)), expires_at)
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+        self._maybe_sweep()
+
+    def _maybe_sweep(self):
+        # Просроченные записи чистим не чаще раза в sweep_interval секунд на процесс
+        if time.monotonic() < self._next_sweep:
+            return
+        self._next_sweep = time.monotonic() + self.sweep_interval
+        self.store.sweep()
+
+
+STORES = {
+    'sql': SqlStore,
+    'memory': MemoryStore,
+}
+
+
+def init_app(app):
+    backend = app.config.get('SESSION_BACKEND', 'sql')
+    if backend == 'cookie':
+        return  # стандартная подписанная cookie-сессия Flask
+    store = STORES[backend]()
+    app.session_interface = ServerSessionInterface(store, app.config.get('SESSION_SWEEP_INTERVAL', 3600))
+
+    @app.cli.command('sweep-sessions')
+    def sweep_sessions():
+        """Удаляет просроченные серверные сессии."""
+        click.echo(f'Удалено сессий: {store.sweep()}')
@@ -0,0 +1,47 @@
+import re
+
+from app.models import db, Flower
+
+
+# Транслитерация кириллицы для человекочитаемых адресов букетов
+TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '',
+    'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    # румынские буквы
+    'ă': 'a', 'â': 'a', 'î': 'i', 'ș': 's', 'ş': 's', 'ț': 't', 'ţ': 't',
+}
+MAX_SLUG_LENGTH = 100
+
+
+def slugify(text):
+    text = ''.join(TRANSLIT.get(char, char) for char in (text or '').lower())
+    slug = re.sub(r'[^a-z0-9]+', '-', text).strip('-')
+    return slug[:MAX_SLUG_LENGTH].rstrip('-') or 'buket'
+
+
+def unique_slug(name, exclude_id=None):
+    """Slug из названия; при совпадении добавляет суффикс -2, -3, ..."""
+    base = slugify(name)
+    query = db.session.query(Flower.slug).filter(
+        (Flower.slug == base) | Flower.slug.like(f'{base}-%'))
+    if exclude_id is not None:
+        query = query.filter(Flower.id != exclude_id)
+    # Без autoflush: новый букет ещё без slug и не должен уйти в INSERT раньше времени
+    with db.session.no_autoflush:
+        taken = {slug for slug, in query}
+    if base not in taken:
+        return base
+    suffix = 2
+    while f'{base}-{suffix}' in taken:
+        suffix += 1
+    return f'{base}-{suffix}'
+
+
+def assign_slug(flower):
+    # Адрес букета не меняется при переименовании — старые ссылки остаются рабочими
+    if not flower.slug:
+        flower.slug = unique_slug(flower.name, exclude_id=flower.id)
+    return flower.slug
@@ -0,0 +1,43 @@
+// Подсказки в строке поиска: запрос к /search/suggest не чаще раза в 150 мс
+(function () {
+    var input = document.querySelector('input[data-suggest-url]');
+    if (!input) return;
+    var list = input.form.querySelector('.search-suggestions');
+    var timer = null;
+    var lastQuery = '';
+
+    function render(items) {
+        list.innerHTML = '';
+        items.forEach(function (item) {
+            var li = document.createElement('li');
+            var link = document.createElement('a');
+            link.href = item.url;
+            link.textContent = item.name;
+            li.appendChild(link);
+            list.appendChild(li);
+        });
+        list.hidden = items.length === 0;
+    }
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        var query = input.value.trim();
+        if (query.length < 2) {
+            render([]);
+            return;
+        }
+        timer = setTimeout(function () {
+            lastQuery = query;
+            fetch(input.dataset.suggestUrl + '?q=' + encodeURIComponent(query))
+                .then(function (response) { return response.json(); })
+                .then(function (items) {
+                    if (query === lastQuery) render(items);  // ответ на устаревший запрос не показываем
+                })
+                .catch(function () { render([]); });
+        }, 150);
+    });
+
+    input.addEventListener('blur', function () {
+        setTimeout(function () { list.hidden = true; }, 200);
+    });
+})();
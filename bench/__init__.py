@@ -0,0 +1 @@
+"""Нагрузочные сценарии и бенчмарки магазина: `python -m bench run` / `compare` / `startup`."""
@@ -0,0 +1,238 @@
+import argparse
+import asyncio
+import os
+import platform
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from bench import report
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _config(args, database_path):
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}',
+        'METRICS_ENABLED': True,
+        'METRICS_LOG_REQUESTS': False,
+        'MAIL_BACKEND': 'console',
+        # Все сценарии входят с одного IP — лимит попыток входа исказил бы замер
+        'LOGIN_RATE_LIMIT_ENABLED': False,
+    }
+    if args.no_cache:
+        config.update(CATALOG_CACHE_ENABLED=False, PAGE_CACHE_ENABLED=False)
+    return config
+
+
+def _query_counts(registry):
+    # {endpoint: (SQL-запросов, HTTP-запросов)} из счётчиков app.metrics
+    sql, http = defaultdict(int), defaultdict(int)
+    for labels, value in registry.values('floweelyy_db_queries_total').items():
+        sql[dict(labels)['endpoint']] += value
+    for labels, value in registry.values('floweelyy_http_requests_total').items():
+        http[dict(labels)['endpoint']] += value
+    return {endpoint: (sql[endpoint], http[endpoint]) for endpoint in http}
+
+
+def _diff(after, before):
+    return {endpoint: (sql - before.get(endpoint, (0, 0))[0], count - before.get(endpoint, (0, 0))[1])
+            for endpoint, (sql, count) in after.items()}
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='floweelyy-bench-')
+    try:
+        _run(args, _config(args, os.path.join(workdir, 'bench.db')))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run(args, config):
+
+    from flask_migrate import stamp
+    from app.factory import create_app
+    from app.models import db
+    from app.metrics import metrics
+    from app import search
+    from bench.seed import seed
+    from bench.journeys import JOURNEYS, Journey, Plan, pick_journeys
+    from bench.drivers import HttpDriver, TestClientDriver, WsgiServer, replay
+
+    app = create_app(config, migrations=True)
+    with app.app_context():
+        # Первая миграция ждёт уже созданных таблиц — пустую БД строим по моделям
+        db.create_all()
+        stamp(directory=os.path.join(ROOT, 'migrations'))
+        search.rebuild()
+        started = time.perf_counter()
+        seeded = seed(flowers=args.flowers, users=args.users, carts=args.carts, orders=args.orders, seed=args.seed)
+        print(f'Данные: {seeded} за {time.perf_counter() - started:.1f} с', file=sys.stderr)
+
+    flower_ids = list(range(1, args.flowers + 1))
+    mix = dict(item.split('=') for item in args.mix.split(','))
+    mix = {name: int(weight) for name, weight in mix.items()}
+    unknown = set(mix) - set(JOURNEYS)
+    if unknown:
+        raise SystemExit(f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+
+    def execute(make_driver, names, samples):
+        tasks = queue.Queue()
+        for index, name in enumerate(names):
+            tasks.put((index, name))
+        failures = []
+
+        def worker():
+            while True:
+                try:
+                    index, name = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                journey = Journey(make_driver(), samples, random.Random(args.seed + index))
+                try:
+                    JOURNEYS[name](journey, flower_ids, args.users, add_to_cart=args.add_to_cart)
+                except Exception as error:
+                    failures.append(f'{name}: {error!r}')
+
+        threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if failures:
+            raise SystemExit(f'Сценарии упали ({len(failures)}): {failures[0]}')
+
+    def execute_async(base_url, names, samples):
+        # Шаги записываются заранее, а запросы идут из одного потока asyncio
+        plans = []
+        for index, name in enumerate(names):
+            plan = Plan(name, random.Random(args.seed + index))
+            JOURNEYS[name](plan, flower_ids, args.users, add_to_cart=args.add_to_cart)
+            plans.append(plan)
+        failures = asyncio.run(replay(base_url, plans, samples, args.concurrency))
+        if failures:
+            raise SystemExit(f'Сценарии упали ({len(failures)}): {failures[0]}')
+
+    def measure(make_driver):
+        execute(make_driver, pick_journeys(mix, args.warmup, args.seed - 1), [])  # прогрев кэшей и пула
+        before = _query_counts(metrics.registry)
+        samples = []
+        started = time.perf_counter()
+        execute(make_driver, pick_journeys(mix, args.journeys, args.seed), samples)
+        wall = time.perf_counter() - started
+        return samples, wall, _diff(_query_counts(metrics.registry), before)
+
+    if args.client == 'asyncio':
+        if args.server != 'wsgi':
+            raise SystemExit('--client asyncio работает только с --server wsgi')
+        with WsgiServer(app) as server:
+            execute_async(server.url, pick_journeys(mix, args.warmup, args.seed - 1), [])
+            before = _query_counts(metrics.registry)
+            samples = []
+            started = time.perf_counter()
+            execute_async(server.url, pick_journeys(mix, args.journeys, args.seed), samples)
+            wall = time.perf_counter() - started
+            queries = _diff(_query_counts(metrics.registry), before)
+    elif args.server == 'wsgi':
+        with WsgiServer(app) as server:
+            samples, wall, queries = measure(lambda: HttpDriver(server.url))
+    else:
+        samples, wall, queries = measure(lambda: TestClientDriver(app))
+
+    meta = {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'server': args.server,
+        'client': args.client,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'dataset': seeded,
+        'journeys': args.journeys,
+        'mix': mix,
+        'concurrency': args.concurrency,
+        'cache': not args.no_cache,
+        'seed': args.seed,
+    }
+    result = report.summarize(samples, wall, queries, meta)
+    print(report.format_table(result))
+    if args.out:
+        report.save(result, args.out)
+        print(f'Результат: {args.out}', file=sys.stderr)
+
+
+def startup(args):
+    from bench.startup import best_of, by_package
+
+    total, entries = best_of(args.runs, env={'ADMIN_ENABLED': '0'} if args.no_admin else None)
+    heaviest = sorted(by_package(entries).items(), key=lambda item: item[1], reverse=True)[:args.top]
+    print(f'{"пакет":<24} {"мс":>8}')
+    for package, ms in heaviest:
+        print(f'{package:<24} {ms:>8.1f}')
+    print(f'import main (со сборкой приложения): {total:.1f} мс, лучший из {args.runs}')
+    if args.budget_ms and total > args.budget_ms:
+        raise SystemExit(f'Холодный старт {total:.1f} мс больше бюджета {args.budget_ms:.0f} мс')
+
+
+def compare(args):
+    problems = report.compare(report.load(args.baseline), report.load(args.current),
+                              max_latency_regression=args.max_regression,
+                              max_query_increase=args.max_query_increase,
+                              metric=args.metric, min_ms=args.min_ms)
+    for problem in problems:
+        print(problem)
+    if problems:
+        raise SystemExit(1)
+    print('Регрессий нет')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='Нагрузочные сценарии магазина.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Заполнить временную БД и прогнать сценарии.')
+    run_parser.add_argument('--flowers', type=int, default=2000)
+    run_parser.add_argument('--users', type=int, default=200)
+    run_parser.add_argument('--carts', type=int, default=100)
+    run_parser.add_argument('--orders', type=int, default=5000)
+    run_parser.add_argument('--journeys', type=int, default=200, help='Сколько сценариев прогнать.')
+    run_parser.add_argument('--warmup', type=int, default=10)
+    run_parser.add_argument('--mix', default='guest=3,customer=1,search=1', help='Веса сценариев.')
+    run_parser.add_argument('--add-to-cart', type=int, default=3)
+    run_parser.add_argument('--concurrency', type=int, default=4)
+    run_parser.add_argument('--server', choices=('test', 'wsgi'), default='test',
+                            help='test — тестовый клиент Flask, wsgi — werkzeug по HTTP.')
+    run_parser.add_argument('--client', choices=('threads', 'asyncio'), default='threads',
+                            help='asyncio — все посетители в одном потоке (--concurrency соединений), только с wsgi.')
+    run_parser.add_argument('--no-cache', action='store_true', help='Выключить кэш каталога и страниц.')
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--out', help='Куда сохранить JSON с результатом.')
+    run_parser.set_defaults(func=run)
+
+    startup_parser = commands.add_parser('startup', help='Время импорта main по -X importtime; код 1 сверх бюджета.')
+    startup_parser.add_argument('--runs', type=int, default=5)
+    startup_parser.add_argument('--top', type=int, default=15, help='Сколько самых тяжёлых пакетов показать.')
+    startup_parser.add_argument('--budget-ms', type=float, help='Допустимое время импорта, мс.')
+    startup_parser.add_argument('--no-admin', action='store_true', help='Замер с ADMIN_ENABLED=0.')
+    startup_parser.set_defaults(func=startup)
+
+    compare_parser = commands.add_parser('compare', help='Сравнить два JSON; код 1 при регрессии.')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--metric', default='p95_ms', choices=('p50_ms', 'p95_ms', 'p99_ms', 'mean_ms'))
+    compare_parser.add_argument('--max-regression', type=float, default=0.2, help='Допустимый рост задержки (0.2 = 20%%).')
+    compare_parser.add_argument('--max-query-increase', type=float, default=0, help='Допустимый рост SQL на запрос.')
+    compare_parser.add_argument('--min-ms', type=float, default=1.0, help='Маршруты быстрее не сравниваются по времени.')
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import asyncio
+import http.cookiejar
+import json as jsonlib
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from werkzeug.serving import make_server
+
+
+# Способы гонять сценарии: тестовый клиент Flask (без сети, видно чистое
+# время приложения) и настоящий WSGI-сервер werkzeug по HTTP — из потоков
+# (HttpDriver) или из одного потока asyncio с сотнями одновременных
+# посетителей (AsyncHttpDriver, без сторонних библиотек).
+# Редиректы не разворачиваем — каждый шаг меряется отдельно.
+
+
+class TestClientDriver:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, json=None, headers=None):
+        started = time.perf_counter()
+        response = self.client.open(path, method=method, data=data, json=json, headers=headers)
+        response.get_data()
+        return response.status_code, time.perf_counter() - started
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpDriver:
+    """Клиент со своей cookie-банкой: один экземпляр — один посетитель."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, data=None, json=None, headers=None):
+        headers = dict(headers or {})
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        if json is not None:
+            body = jsonlib.dumps(json).encode()
+            headers['Content-Type'] = 'application/json'
+        url = self.base_url + urllib.parse.quote(path, safe='/?=&')
+        request = urllib.request.Request(url, data=body, method=method, headers=headers)
+        started = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:  # 3xx/4xx/5xx без разворачивания
+            error.read()
+            status = error.code
+        return status, time.perf_counter() - started
+
+
+class AsyncHttpDriver:
+    """HTTP/1.1-клиент на asyncio.open_connection: одно соединение на запрос, cookie посетителя в памяти."""
+
+    def __init__(self, base_url):
+        url = urllib.parse.urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.cookies = {}
+
+    def _remember(self, header):
+        name, _, rest = header.partition('=')
+        value, *attributes = rest.split(';')
+        attributes = {attribute.strip().lower() for attribute in attributes}
+        if 'max-age=0' in attributes or any(item.startswith('expires=thu, 01 jan 1970') for item in attributes):
+            self.cookies.pop(name.strip(), None)  # так Flask удаляет cookie
+        else:
+            self.cookies[name.strip()] = value.strip()
+
+    async def request(self, method, path, data=None, json=None, headers=None):
+        headers = {'Host': f'{self.host}:{self.port}', 'Connection': 'close', **(headers or {})}
+        body = b''
+        if data is not None:
+            body = urllib.parse.urlencode(data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if json is not None:
+            body = jsonlib.dumps(json).encode()
+            headers['Content-Type'] = 'application/json'
+        if body or method != 'GET':
+            headers['Content-Length'] = str(len(body))
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        head = f'{method} {urllib.parse.quote(path, safe="/?=&")} HTTP/1.1\r\n'
+        head += ''.join(f'{name}: {value}\r\n' for name, value in headers.items()) + '\r\n'
+
+        started = time.perf_counter()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(head.encode('latin-1') + body)
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'set-cookie':
+                    self._remember(value.strip())
+            await reader.read()  # Connection: close — тело до конца потока
+        finally:
+            writer.close()
+            await writer.wait_closed()
+        return status, time.perf_counter() - started
+
+
+async def replay(base_url, plans, samples, concurrency):
+    """Проигрывает записанные сценарии (journeys.Plan): concurrency посетителей одновременно.
+
+    Возвращает ошибки вида 'сценарий: исключение'.
+    """
+    plans = iter(plans)
+    failures = []
+
+    async def visitor():
+        for plan in plans:  # общий итератор: следующий сценарий берёт освободившийся посетитель
+            driver = AsyncHttpDriver(base_url)
+            try:
+                for endpoint, method, path, data, json, headers in plan.steps:
+                    status, elapsed = await driver.request(method, path, data, json=json, headers=headers)
+                    samples.append({'endpoint': endpoint, 'status': status, 'seconds': elapsed})
+            except Exception as error:
+                failures.append(f'{plan.name}: {error!r}')
+
+    await asyncio.gather(*(visitor() for _ in range(concurrency)))
+    return failures
+
+
+class WsgiServer:
+    """Многопоточный werkzeug-сервер в фоне на свободном порту."""
+
+    def __init__(self, app, host='127.0.0.1', port=0):
+        self.server = make_server(host, port, app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://{self.server.host}:{self.server.port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.thread.join()
@@ -0,0 +1,98 @@
+import random
+
+from bench.seed import BENCH_PASSWORD, user_email
+
+
+# Сценарии покупателя. Каждый шаг помечен эндпоинтом Flask — по нему
+# сводятся задержки из драйвера и число SQL-запросов из app.metrics.
+
+
+class Journey:
+    def __init__(self, driver, samples, rnd):
+        self.driver = driver
+        self.samples = samples
+        self.rnd = rnd
+
+    def step(self, endpoint, method, path, data=None, json=None, headers=None):
+        status, elapsed = self.driver.request(method, path, data, json=json, headers=headers)
+        self.samples.append({'endpoint': endpoint, 'status': status, 'seconds': elapsed})
+        return status
+
+
+class Plan:
+    """Тот же интерфейс, что у Journey, но шаги только записываются.
+
+    Сценарии не ветвятся по ответам, поэтому их можно записать заранее
+    и проиграть из asyncio (drivers.replay).
+    """
+
+    def __init__(self, name, rnd):
+        self.name = name
+        self.rnd = rnd
+        self.steps = []
+
+    def step(self, endpoint, method, path, data=None, json=None, headers=None):
+        self.steps.append((endpoint, method, path, data, json, headers))
+
+
+def browse_and_buy(journey, flower_ids, add_to_cart=3, checkout=True):
+    """Каталог -> страница букета -> add_to_cart xN -> корзина -> оформление."""
+    rnd = journey.rnd
+    journey.step('main.index', 'GET', '/')
+    journey.step('main.catalog', 'GET', '/catalog')
+    journey.step('main.catalog', 'GET', f'/catalog?sort={rnd.choice(("price", "price_desc", "name"))}')
+    for flower_id in rnd.sample(flower_ids, min(add_to_cart, len(flower_ids))):
+        journey.step('main.flower_detail', 'GET', f'/flower/bench-{flower_id}')
+        journey.step('main.add_to_cart', 'POST', f'/add_to_cart/{flower_id}')
+    journey.step('main.cart', 'GET', '/cart')
+    if checkout:
+        journey.step('main.checkout', 'GET', '/checkout')
+        journey.step('main.hold_checkout', 'POST', '/checkout/hold')
+        journey.step('main.checkout', 'POST', '/checkout',
+                     {'name': 'Бенчмарк', 'phone': '060000000', 'address': 'Кишинёв, ул. Тестовая, 1'})
+
+
+def guest(journey, flower_ids, users, add_to_cart=3):
+    browse_and_buy(journey, flower_ids, add_to_cart)
+
+
+def customer(journey, flower_ids, users, add_to_cart=3):
+    index = journey.rnd.randrange(users)
+    journey.step('auth.login', 'POST', '/auth/login', {'email': user_email(index), 'password': BENCH_PASSWORD})
+    journey.step('auth.profile', 'GET', '/auth/profile')
+    browse_and_buy(journey, flower_ids, add_to_cart)
+    journey.step('auth.profile', 'GET', '/auth/profile')
+    journey.step('auth.logout', 'GET', '/auth/logout')
+
+
+def search(journey, flower_ids, users, add_to_cart=3):
+    for query in journey.rnd.sample(('роз', 'пион', 'тюльпан белый', 'свадебный', 'орхид'), 3):
+        journey.step('main.search_suggest', 'GET', f'/search/suggest?q={query[:3]}')
+        journey.step('main.search', 'GET', f'/search?q={query}')
+
+
+def api(journey, flower_ids, users, add_to_cart=3):
+    """Тот же путь гостя, что и browse_and_buy, но через JSON-API мобильного приложения."""
+    rnd = journey.rnd
+    gzip = {'Accept-Encoding': 'gzip'}
+    journey.step('api.flowers', 'GET', '/api/v1/flowers?limit=6', headers=gzip)
+    journey.step('api.flowers', 'GET', '/api/v1/flowers', headers=gzip)
+    journey.step('api.flowers', 'GET', f'/api/v1/flowers?sort={rnd.choice(("price", "price_desc", "name"))}',
+                 headers=gzip)
+    for flower_id in rnd.sample(flower_ids, min(add_to_cart, len(flower_ids))):
+        journey.step('api.flower_detail', 'GET', f'/api/v1/flowers/bench-{flower_id}', headers=gzip)
+        journey.step('api.add_to_cart', 'POST', '/api/v1/cart/items', json={'flower_id': flower_id})
+    journey.step('api.cart', 'GET', '/api/v1/cart', headers=gzip)
+    journey.step('api.hold_cart', 'POST', '/api/v1/cart/hold')
+    journey.step('api.checkout', 'POST', '/api/v1/checkout',
+                 json={'name': 'Бенчмарк', 'phone': '060000000', 'address': 'Кишинёв, ул. Тестовая, 1'})
+
+
+JOURNEYS = {'guest': guest, 'customer': customer, 'search': search, 'api': api}
+
+
+def pick_journeys(mix, count, seed):
+    """mix = {'guest': 3, 'customer': 1} -> список имён сценариев заданной длины."""
+    rnd = random.Random(seed)
+    names = [name for name, weight in mix.items() for _ in range(weight)]
+    return [rnd.choice(names) for _ in range(count)]
@@ -0,0 +1,95 @@
+import json
+import math
+from collections import defaultdict
+
+
+# Сводка прогона и сравнение двух прогонов (для CI).
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, p):
+    """Процентиль по методу ближайшего ранга."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples, wall_seconds, queries, meta):
+    """samples — [{'endpoint', 'status', 'seconds'}]; queries — {endpoint: (запросов SQL, HTTP-запросов)}."""
+    by_endpoint = defaultdict(list)
+    errors = defaultdict(int)
+    for sample in samples:
+        by_endpoint[sample['endpoint']].append(sample['seconds'])
+        if sample['status'] >= 500:
+            errors[sample['endpoint']] += 1
+
+    routes = {}
+    for endpoint, values in sorted(by_endpoint.items()):
+        sql, http = queries.get(endpoint, (0, 0))
+        routes[endpoint] = {
+            'requests': len(values),
+            'errors': errors[endpoint],
+            **{f'p{p}_ms': round(percentile(values, p) * 1000, 3) for p in PERCENTILES},
+            'mean_ms': round(sum(values) / len(values) * 1000, 3),
+            'queries_per_request': round(sql / http, 2) if http else None,
+        }
+    all_values = [sample['seconds'] for sample in samples]
+    return {
+        'meta': meta,
+        'total': {
+            'requests': len(samples),
+            'errors': sum(errors.values()),
+            'wall_seconds': round(wall_seconds, 3),
+            'throughput_rps': round(len(samples) / wall_seconds, 2) if wall_seconds else None,
+            **{f'p{p}_ms': round(percentile(all_values, p) * 1000, 3) for p in PERCENTILES},
+        },
+        'routes': routes,
+    }
+
+
+def save(result, path):
+    with open(path, 'w', encoding='utf-8') as out:
+        json.dump(result, out, indent=2, ensure_ascii=False)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def compare(baseline, current, max_latency_regression=0.2, max_query_increase=0, metric='p95_ms',
+            min_ms=1.0):
+    """Список регрессий: рост задержки больше допуска или больше SQL-запросов на маршрут.
+
+    Маршруты быстрее min_ms не сравниваются по времени — там шум больше разницы.
+    """
+    problems = []
+    for endpoint, before in baseline['routes'].items():
+        after = current['routes'].get(endpoint)
+        if after is None:
+            continue
+        old, new = before[metric], after[metric]
+        if max(old, new) >= min_ms and new > old * (1 + max_latency_regression):
+            problems.append(f'{endpoint}: {metric} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)'
+                            if old else f'{endpoint}: {metric} {old} -> {new}')
+        old_queries, new_queries = before.get('queries_per_request'), after.get('queries_per_request')
+        if old_queries is not None and new_queries is not None and new_queries > old_queries + max_query_increase:
+            problems.append(f'{endpoint}: SQL-запросов {old_queries} -> {new_queries}')
+        if after['errors'] > before['errors']:
+            problems.append(f'{endpoint}: ошибок 5xx {before["errors"]} -> {after["errors"]}')
+    return problems
+
+
+def format_table(result):
+    lines = [f'{"маршрут":<24}{"запр.":>7}{"p50":>9}{"p95":>9}{"p99":>9}{"SQL/запр.":>11}']
+    for endpoint, route in result['routes'].items():
+        queries = route['queries_per_request']
+        lines.append(f'{endpoint:<24}{route["requests"]:>7}{route["p50_ms"]:>9.2f}{route["p95_ms"]:>9.2f}'
+                     f'{route["p99_ms"]:>9.2f}{queries if queries is not None else "-":>11}')
+    total = result['total']
+    lines.append(f'всего {total["requests"]} запросов за {total["wall_seconds"]} с, '
+                 f'{total["throughput_rps"]} rps, p95 {total["p95_ms"]} мс, ошибок {total["errors"]}')
+    return '\n'.join(lines)
@@ -0,0 +1,88 @@
+import random
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app.models import db, Flower, User, Cart, Order, OrderItem
+
+
+# Синтетический каталог для бенчмарков: всё вставляется пачками через
+# insert(...).values(list) — без ORM-объектов, иначе сидирование
+# десятков тысяч строк занимает дольше самого прогона.
+
+BENCH_PASSWORD = 'bench-password'
+CHUNK = 2000
+
+WORDS = ('роза', 'тюльпан', 'пион', 'ромашка', 'лилия', 'орхидея', 'хризантема', 'гербера',
+         'ирис', 'гвоздика', 'эустома', 'альстромерия', 'нежный', 'яркий', 'свадебный',
+         'весенний', 'белый', 'красный', 'розовый', 'букет', 'композиция', 'корзина')
+
+
+def _insert(model, rows):
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(db.insert(model), rows[start:start + CHUNK])
+
+
+def user_email(index):
+    return f'bench{index}@example.com'
+
+
+def seed(flowers=1000, users=100, carts=50, orders=500, items_per_order=3, seed=42):
+    """Заполняет пустую БД; возвращает сводку {таблица: строк}."""
+    rnd = random.Random(seed)
+    first_flower = (db.session.query(db.func.max(Flower.id)).scalar() or 0) + 1
+    first_user = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+
+    _insert(Flower, [{
+        'id': first_flower + i,
+        'name': ' '.join(rnd.sample(WORDS, 3)).capitalize(),
+        'slug': f'bench-{first_flower + i}',
+        'description': ' '.join(rnd.choices(WORDS, k=60)),
+        'price': rnd.randint(150, 3000),
+        'image_url': None,
+    } for i in range(flowers)])
+    flower_ids = range(first_flower, first_flower + flowers)
+
+    # Хэш пароля один на всех: pbkdf2 на каждого пользователя — минуты сидирования
+    password = generate_password_hash(BENCH_PASSWORD, method='pbkdf2:sha256')
+    _insert(User, [{
+        'id': first_user + i,
+        'name': f'Покупатель {i}',
+        'email': user_email(i),
+        'phone': f'06{i:07d}',
+        'password': password,
+    } for i in range(users)])
+    user_ids = range(first_user, first_user + users)
+
+    cart_rows = []
+    for user_id in rnd.sample(user_ids, min(carts, users)):
+        for flower_id in rnd.sample(flower_ids, min(3, flowers)):
+            cart_rows.append({'user_id': user_id, 'flower_id': flower_id, 'quantity': rnd.randint(1, 3)})
+    _insert(Cart, cart_rows)
+
+    first_order = (db.session.query(db.func.max(Order.id)).scalar() or 0) + 1
+    started = datetime.utcnow() - timedelta(days=365)
+    order_rows, item_rows = [], []
+    for i in range(orders):
+        order_id = first_order + i
+        lines = rnd.sample(flower_ids, min(items_per_order, flowers))
+        quantities = [rnd.randint(1, 3) for _ in lines]
+        prices = [rnd.randint(150, 3000) for _ in lines]
+        order_rows.append({
+            'id': order_id,
+            'user_id': rnd.choice(user_ids) if users and rnd.random() < 0.7 else None,
+            'customer_name': f'Покупатель {i}',
+            'customer_phone': f'06{i:07d}',
+            'customer_address': f'Кишинёв, ул. Тестовая, {i % 200 + 1}',
+            'total_price': sum(p * q for p, q in zip(prices, quantities)),
+            'status': rnd.choice(('в ожидании', 'подтверждён', 'доставлен')),
+            'created_at': started + timedelta(minutes=rnd.randint(0, 365 * 24 * 60)),
+        })
+        item_rows += [{'order_id': order_id, 'flower_id': flower_id, 'name': f'Букет {flower_id}',
+                       'price': price, 'quantity': quantity}
+                      for flower_id, price, quantity in zip(lines, prices, quantities)]
+    _insert(Order, order_rows)
+    _insert(OrderItem, item_rows)
+    db.session.commit()
+
+    return {'flower': flowers, 'user': users, 'cart': len(cart_rows), 'order': orders, 'order_item': len(item_rows)}
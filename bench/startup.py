@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+
+# Холодный старт воркера: `python -X importtime -c "import main"` в отдельном
+# процессе. Время импорта main включает и сборку приложения (create_app),
+# то есть всё, что воркер делает до первого запроса.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(text):
+    """[(модуль, собственное мкс, с вложенными мкс)] из вывода -X importtime."""
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((name.strip(), int(own), int(cumulative)))
+    return entries
+
+
+def by_package(entries):
+    """{пакет верхнего уровня: собственное время его модулей, мс}."""
+    totals = defaultdict(int)
+    for name, own, _ in entries:
+        totals[name.split('.')[0]] += own
+    return {package: own / 1000 for package, own in totals.items()}
+
+
+def measure(module='main', env=None):
+    """(мс на импорт module, записи importtime) одного холодного процесса."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, env={**os.environ, **(env or {})}, capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f'import {module} упал:\n{result.stderr[-2000:]}')
+    entries = parse_importtime(result.stderr)
+    total = next(cumulative for name, _, cumulative in reversed(entries) if name == module)
+    return total / 1000, entries
+
+
+def best_of(runs, module='main', env=None):
+    """Лучший из runs запусков: первый ещё компилирует .pyc, остальные ближе к рестарту воркера."""
+    return min((measure(module, env) for _ in range(runs)), key=lambda result: result[0])
@@ -4,5 +4,123 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'supersecretkey'
-    SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(BASE_DIR, "database.db")}'
+    # DATABASE_URL позволяет перейти на серверную СУБД (postgresql://..., mysql://...)
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or f'sqlite:///{os.path.join(BASE_DIR, "database.db")}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Пул соединений (для SQLite в памяти не используется)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    # Отдельный read-only движок для GET-запросов: явный URL реплики
+    # или, для SQLite, тот же файл в режиме mode=ro
+    DATABASE_READONLY_URL = os.environ.get('DATABASE_READONLY_URL')
+    DB_READONLY_ENGINE = os.environ.get('DB_READONLY_ENGINE', '1') == '1'
+    # Повторы записи при "database is locked"
+    DB_WRITE_RETRIES = int(os.environ.get('DB_WRITE_RETRIES', 5))
+    # PRAGMA для SQLite (WAL и synchronous=NORMAL включаются всегда)
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 65536))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_FOREIGN_KEYS = os.environ.get('SQLITE_FOREIGN_KEYS', '0') == '1'
+
+    # Админка (Flask-Admin). 0 — процесс её не загружает: витрина и API стартуют быстрее
+    ADMIN_ENABLED = os.environ.get('ADMIN_ENABLED', '1') == '1'
+
+    # Размер страницы каталога (keyset-пагинация) и витрины на главной
+    CATALOG_PAGE_SIZE = int(os.environ.get('CATALOG_PAGE_SIZE', 24))
+    INDEX_PAGE_SIZE = int(os.environ.get('INDEX_PAGE_SIZE', 6))
+
+    # Кэш каталога: local — LRU в памяти процесса, redis — общий для воркеров
+    CATALOG_CACHE_ENABLED = os.environ.get('CATALOG_CACHE_ENABLED', '1') == '1'
+    CATALOG_CACHE_BACKEND = os.environ.get('CATALOG_CACHE_BACKEND', 'local')
+    CATALOG_CACHE_URL = os.environ.get('CATALOG_CACHE_URL', 'redis://localhost:6379/0')
+    CATALOG_CACHE_SIZE = int(os.environ.get('CATALOG_CACHE_SIZE', 1024))
+    CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 300))
+
+    # Снимок вошедшего пользователя (имя, телефон, роль) — вместо запроса к User на каждой странице
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 60))
+    IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 4096))
+
+    # Пароли: алгоритм werkzeug ('pbkdf2:sha256:600000', 'scrypt' ...) и пул процессов для хэшей.
+    # Пул свой у каждого воркера gunicorn: по умолчанию половина ядер делится на WEB_CONCURRENCY
+    # воркеров (но не меньше процесса на воркер), остальное каталогу; 0 — считать в потоке запроса
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+    PASSWORD_HASH_WORKERS = int(os.environ.get(
+        'PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2 // int(os.environ.get('WEB_CONCURRENCY', 1)))))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))  # сверх этого — сразу 503
+    PASSWORD_HASH_TIMEOUT = int(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+    # Лимиты входа (в памяти процесса): 'попыток/секунд' на IP и неудачных на аккаунт
+    LOGIN_RATE_LIMIT_ENABLED = os.environ.get('LOGIN_RATE_LIMIT_ENABLED', '1') == '1'
+    LOGIN_RATE_PER_IP = os.environ.get('LOGIN_RATE_PER_IP', '20/60')
+    LOGIN_RATE_PER_ACCOUNT = os.environ.get('LOGIN_RATE_PER_ACCOUNT', '5/300')
+
+    # Сколько обратных прокси (nginx, балансировщик) стоит перед приложением: их X-Forwarded-For/-Proto/-Host
+    # принимаются на веру (ProxyFix), и лимиты входа видят IP клиента, а не прокси. 0 — прокси нет
+    TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+
+    # Сессии: sql — таблица server_session, memory — в памяти (тесты), cookie — стандартная Flask
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'sql')
+    SESSION_SWEEP_INTERVAL = int(os.environ.get('SESSION_SWEEP_INTERVAL', 3600))
+
+    # Потоки для фоновой нарезки изображений из админки
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+
+    # Остатки: сколько держится резерв со страницы оформления, как часто воркер
+    # возвращает просроченные и сколько секунд витрина видит закэшированный остаток
+    INVENTORY_HOLD_TTL = int(os.environ.get('INVENTORY_HOLD_TTL', 900))
+    INVENTORY_SWEEP_INTERVAL = int(os.environ.get('INVENTORY_SWEEP_INTERVAL', 60))
+    INVENTORY_SWEEP_BATCH = int(os.environ.get('INVENTORY_SWEEP_BATCH', 500))
+    INVENTORY_CACHE_TTL = int(os.environ.get('INVENTORY_CACHE_TTL', 5))
+
+    # Ключи идемпотентности заказов: сколько секунд помним и как часто воркер чистит старые
+    ORDER_REQUEST_TTL = int(os.environ.get('ORDER_REQUEST_TTL', 86400))
+    ORDER_REQUEST_PURGE_INTERVAL = int(os.environ.get('ORDER_REQUEST_PURGE_INTERVAL', 3600))
+    ORDER_REQUEST_PURGE_BATCH = int(os.environ.get('ORDER_REQUEST_PURGE_BATCH', 500))
+
+    # Импорт каталога: строк в одной транзакции и процессов для нарезки картинок
+    CATALOG_IMPORT_BATCH = int(os.environ.get('CATALOG_IMPORT_BATCH', 500))
+    CATALOG_IMPORT_IMAGE_WORKERS = int(os.environ.get('CATALOG_IMPORT_IMAGE_WORKERS', os.cpu_count() or 1))
+
+    # Статика с отпечатками (после `flask assets-build`) и склейка CSS в один файл
+    ASSETS_FINGERPRINT = os.environ.get('ASSETS_FINGERPRINT', '1') == '1'
+    ASSETS_BUNDLE_CSS = os.environ.get('ASSETS_BUNDLE_CSS', '0') == '1'
+
+    # Кэш страниц для анонимных посетителей и фрагментов шаблонов (навбар, подвал)
+    PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', '1') == '1'
+    PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', 256))
+    PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 60))
+
+    # JSON-API (/api/v1): сжатие ответов больше API_GZIP_MIN_SIZE байт (уровень 0 — без сжатия)
+    # и сколько секунд клиент и прокси держат страницу каталога без перепроверки
+    API_GZIP_LEVEL = int(os.environ.get('API_GZIP_LEVEL', 6))
+    API_GZIP_MIN_SIZE = int(os.environ.get('API_GZIP_MIN_SIZE', 1024))
+    API_CATALOG_MAX_AGE = int(os.environ.get('API_CATALOG_MAX_AGE', 60))
+
+    # Фоновые задания (outbox): `flask jobs-worker`
+    JOBS_WORKER_THREADS = int(os.environ.get('JOBS_WORKER_THREADS', 4))
+    JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', 2))
+    JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 5))
+    JOBS_RETRY_BASE = int(os.environ.get('JOBS_RETRY_BASE', 30))  # секунд до первого повтора
+    JOBS_LEASE = int(os.environ.get('JOBS_LEASE', 300))  # через сколько задание упавшего воркера вернётся в очередь
+
+    # Почта: smtp или console (письма в лог)
+    MAIL_BACKEND = os.environ.get('MAIL_BACKEND', 'smtp')
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'localhost')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 1025))
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', '0') == '1'
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_SENDER = os.environ.get('MAIL_SENDER', 'floweelyy@localhost')
+
+    # Метрики (/metrics в формате Prometheus) и JSON-логи запросов; выключены — ни одного хука
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # /metrics требует Authorization: Bearer; без токена — 403
+    METRICS_LOG_REQUESTS = os.environ.get('METRICS_LOG_REQUESTS', '1') == '1'
+    METRICS_SLOW_REQUEST_MS = int(os.environ.get('METRICS_SLOW_REQUEST_MS', 500))
+    METRICS_N_PLUS_ONE_THRESHOLD = int(os.environ.get('METRICS_N_PLUS_ONE_THRESHOLD', 10))
+    # Доля запросов под cProfile (0.01 = 1%), .prof-файлы в METRICS_PROFILE_DIR
+    METRICS_PROFILE_RATE = float(os.environ.get('METRICS_PROFILE_RATE', 0))
+    METRICS_PROFILE_DIR = os.environ.get('METRICS_PROFILE_DIR')
@@ -0,0 +1,24 @@
+import gc
+import os
+
+
+# gunicorn -c gunicorn.conf.py main:app
+# Приложение собирается один раз в мастере, воркеры получают его через fork:
+# запуск и перезапуск воркера не повторяют импорт и create_app.
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * (os.cpu_count() or 1) + 1))
+# Только потоковые воркеры: вход ждёт хэш из пула процессов (future.result()),
+# и sync-воркер на это время не отдавал бы ничего — остальные потоки отдают каталог
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = True
+
+# Config делит ядра под хэши паролей на все воркеры (PASSWORD_HASH_WORKERS) —
+# ему нужно их число; конфиг gunicorn читается до загрузки приложения
+os.environ.setdefault('WEB_CONCURRENCY', str(workers))
+
+
+def when_ready(server):
+    # Объекты, созданные при загрузке, сборщик мусора больше не обходит —
+    # их страницы памяти остаются общими у мастера и воркеров (copy-on-write)
+    gc.freeze()
@@ -0,0 +1,65 @@
+"""Slug для букетов
+
+Revision ID: 5b8e2c41d7a9
+Revises: 3309dd6540f5
+Create Date: 2026-10-18 14:05:12.381920
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e2c41d7a9'
+down_revision = '3309dd6540f5'
+branch_labels = None
+depends_on = None
+
+
+# Копия app.slugs.slugify на момент миграции — миграции не импортируют код приложения
+TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '',
+    'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'ă': 'a', 'â': 'a', 'î': 'i', 'ș': 's', 'ş': 's', 'ț': 't', 'ţ': 't',
+}
+
+
+def slugify(text):
+    text = ''.join(TRANSLIT.get(char, char) for char in (text or '').lower())
+    slug = re.sub(r'[^a-z0-9]+', '-', text).strip('-')
+    return slug[:100].rstrip('-') or 'buket'
+
+
+def upgrade():
+    with op.batch_alter_table('flower', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('slug', sa.String(length=120), nullable=True))
+
+    # Заполняем slug для существующих букетов, разводя совпадения суффиксом
+    connection = op.get_bind()
+    flower = sa.table('flower', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                      sa.column('slug', sa.String))
+    taken = set()
+    rows = connection.execute(sa.select(flower.c.id, flower.c.name).order_by(flower.c.id)).fetchall()
+    for flower_id, name in rows:
+        base = slug = slugify(name)
+        suffix = 2
+        while slug in taken:
+            slug = f'{base}-{suffix}'
+            suffix += 1
+        taken.add(slug)
+        connection.execute(flower.update().where(flower.c.id == flower_id).values(slug=slug))
+
+    with op.batch_alter_table('flower', schema=None) as batch_op:
+        batch_op.alter_column('slug', existing_type=sa.String(length=120), nullable=False)
+        batch_op.create_index(batch_op.f('ix_flower_slug'), ['slug'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('flower', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_flower_slug'))
+        batch_op.drop_column('slug')
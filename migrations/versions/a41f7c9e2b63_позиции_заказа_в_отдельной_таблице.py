@@ -0,0 +1,119 @@
+"""Позиции заказа в отдельной таблице
+
+Revision ID: a41f7c9e2b63
+Revises: 5b8e2c41d7a9
+Create Date: 2026-10-18 15:02:47.115603
+
+"""
+import json
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41f7c9e2b63'
+down_revision = '5b8e2c41d7a9'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+order = sa.table('order', sa.column('id', sa.Integer), sa.column('items', sa.Text),
+                 sa.column('created_at', sa.DateTime))
+order_item = sa.table('order_item', sa.column('order_id', sa.Integer), sa.column('flower_id', sa.Integer),
+                      sa.column('name', sa.String), sa.column('price', sa.Float),
+                      sa.column('quantity', sa.Integer))
+flower = sa.table('flower', sa.column('id', sa.Integer), sa.column('name', sa.String))
+
+
+def _batches(connection, query):
+    # Идём по заказам порциями по id, не загружая всю таблицу в память
+    last_id = 0
+    while True:
+        rows = connection.execute(query.where(order.c.id > last_id).order_by(order.c.id).limit(BATCH_SIZE)).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    op.create_table('order_item',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('flower_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['flower_id'], ['flower.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['order_id'], ['order.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.create_index('ix_order_item_flower_quantity', ['flower_id', 'quantity'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_item_order_id'), ['order_id'], unique=False)
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_order_created_at'), ['created_at'], unique=False)
+
+    connection = op.get_bind()
+    # Дата старых заказов неизвестна — считаем их оформленными в момент миграции
+    connection.execute(order.update().where(order.c.created_at.is_(None)).values(created_at=datetime.utcnow()))
+
+    # В JSON только название букета: сопоставляем с каталогом по имени (первый по id)
+    flower_ids = {}
+    for flower_id, name in connection.execute(sa.select(flower.c.id, flower.c.name).order_by(flower.c.id.desc())):
+        flower_ids[name] = flower_id
+
+    for rows in _batches(connection, sa.select(order.c.id, order.c['items'])):
+        items = []
+        for order_id, items_json in rows:
+            try:
+                parsed = json.loads(items_json or '[]')
+            except ValueError:
+                parsed = []
+            for item in parsed:
+                if not isinstance(item, dict):
+                    continue
+                items.append({
+                    'order_id': order_id,
+                    'flower_id': flower_ids.get(item.get('name')),
+                    'name': item.get('name') or '',
+                    'price': item.get('price') or 0,
+                    'quantity': item.get('quantity') or 1,
+                })
+        if items:
+            connection.execute(order_item.insert(), items)
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_column('items')
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('items', sa.TEXT(), nullable=True))
+
+    connection = op.get_bind()
+    for rows in _batches(connection, sa.select(order.c.id)):
+        order_ids = [row[0] for row in rows]
+        items = {order_id: [] for order_id in order_ids}
+        query = (sa.select(order_item.c.order_id, order_item.c.name, order_item.c.quantity, order_item.c.price)
+                 .where(order_item.c.order_id.in_(order_ids)))
+        for order_id, name, quantity, price in connection.execute(query):
+            items[order_id].append({'name': name, 'quantity': quantity, 'price': price})
+        for order_id, order_items in items.items():
+            connection.execute(order.update().where(order.c.id == order_id).values(items=json.dumps(order_items)))
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.alter_column('items', existing_type=sa.TEXT(), nullable=False)
+        batch_op.drop_index(batch_op.f('ix_order_created_at'))
+        batch_op.drop_column('created_at')
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_item_order_id'))
+        batch_op.drop_index('ix_order_item_flower_quantity')
+
+    op.drop_table('order_item')
@@ -0,0 +1,66 @@
+"""Полнотекстовый поиск по каталогу
+
+Revision ID: b92d4f6e1a07
+Revises: 8654433421c4
+Create Date: 2026-10-18 18:12:37.204511
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b92d4f6e1a07'
+down_revision = '8654433421c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 есть только в SQLite; на серверных СУБД поиск работает через LIKE
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    # rowid = flower.id; «ё» в индексе хранится как «е»
+    op.execute("""
+        CREATE VIRTUAL TABLE flower_fts USING fts5(
+            name, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')
+    """)
+    op.execute("""
+        CREATE TRIGGER flower_fts_ai AFTER INSERT ON flower BEGIN
+            INSERT INTO flower_fts(rowid, name, description) VALUES (
+                new.id,
+                replace(replace(new.name, 'ё', 'е'), 'Ё', 'Е'),
+                replace(replace(new.description, 'ё', 'е'), 'Ё', 'Е'));
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER flower_fts_ad AFTER DELETE ON flower BEGIN
+            DELETE FROM flower_fts WHERE rowid = old.id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER flower_fts_au AFTER UPDATE OF name, description ON flower BEGIN
+            DELETE FROM flower_fts WHERE rowid = old.id;
+            INSERT INTO flower_fts(rowid, name, description) VALUES (
+                new.id,
+                replace(replace(new.name, 'ё', 'е'), 'Ё', 'Е'),
+                replace(replace(new.description, 'ё', 'е'), 'Ё', 'Е'));
+        END
+    """)
+    # Индексируем уже существующие букеты
+    op.execute("""
+        INSERT INTO flower_fts(rowid, name, description)
+        SELECT id, replace(replace(name, 'ё', 'е'), 'Ё', 'Е'), replace(replace(description, 'ё', 'е'), 'Ё', 'Е')
+        FROM flower
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute('DROP TRIGGER IF EXISTS flower_fts_au')
+    op.execute('DROP TRIGGER IF EXISTS flower_fts_ad')
+    op.execute('DROP TRIGGER IF EXISTS flower_fts_ai')
+    op.execute('DROP TABLE IF EXISTS flower_fts')
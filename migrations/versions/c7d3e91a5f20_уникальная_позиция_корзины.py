@@ -0,0 +1,39 @@
+"""Уникальная позиция корзины
+
+Revision ID: c7d3e91a5f20
+Revises: a41f7c9e2b63
+Create Date: 2026-10-18 15:48:31.902217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d3e91a5f20'
+down_revision = 'a41f7c9e2b63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Схлопываем дубли (user_id, flower_id), накопившиеся без ограничения:
+    # оставляем строку с наименьшим id и суммой количеств
+    op.execute("""
+        UPDATE cart SET quantity = (
+            SELECT SUM(COALESCE(c2.quantity, 1)) FROM cart AS c2
+            WHERE c2.user_id = cart.user_id AND c2.flower_id = cart.flower_id
+        )
+        WHERE id IN (SELECT MIN(id) FROM cart GROUP BY user_id, flower_id HAVING COUNT(*) > 1)
+    """)
+    op.execute("""
+        DELETE FROM cart WHERE id NOT IN (SELECT MIN(id) FROM cart GROUP BY user_id, flower_id)
+    """)
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.create_index('uq_cart_user_flower', ['user_id', 'flower_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.drop_index('uq_cart_user_flower')
@@ -0,0 +1,48 @@
+import pytest
+
+from app.factory import create_app
+from app.models import db, Flower, User
+from app.passwords import passwords
+
+
+PASSWORD = 'secret-password'
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+        'TESTING': True,
+        'ADMIN_ENABLED': False,
+        'SESSION_BACKEND': 'memory',
+        'MAIL_BACKEND': 'console',
+        'PASSWORD_HASH_WORKERS': 0,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'LOGIN_RATE_LIMIT_ENABLED': False,
+        'CATALOG_CACHE_ENABLED': False,
+        'PAGE_CACHE_ENABLED': False,
+    })
+    with app.app_context():
+        db.create_all()
+        passwords.init_app(app)
+        db.session.add_all([
+            Flower(name=f'Букет {index}', slug=f'buket-{index}', description='', price=100 * index)
+            for index in range(1, 4)
+        ])
+        db.session.add(User(name='Анна', email='anna@example.com', phone='060000000',
+                            password=passwords.hash(PASSWORD)))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def customer(client):
+    client.post('/auth/login', data={'email': 'anna@example.com', 'password': PASSWORD})
+    return client
@@ -0,0 +1,78 @@
+from sqlalchemy import event
+
+from app.models import db, Cart
+from app.orders import MAX_LINE_QUANTITY
+
+
+def _rows(app):
+    with app.app_context():
+        return dict(db.session.execute(db.select(Cart.flower_id, Cart.quantity)).all())
+
+
+def test_batch_sets_quantities_in_one_transaction(app, customer):
+    customer.post('/api/v1/cart/items', json={'flower_id': 1, 'quantity': 2})
+    customer.post('/api/v1/cart/items', json={'flower_id': 2, 'quantity': 1})
+
+    commits = []
+
+    def on_commit(connection):
+        commits.append(connection)
+
+    with app.app_context():
+        event.listen(db.engine, 'commit', on_commit)
+        try:
+            response = customer.post('/api/v1/cart/batch', json=[
+                {'flower_id': 1, 'quantity': 5}, {'flower_id': 2, 'quantity': 0}, {'flower_id': 3, 'quantity': 1}])
+        finally:
+            event.remove(db.engine, 'commit', on_commit)
+
+    assert response.status_code == 200
+    assert len(commits) == 1
+    assert _rows(app) == {1: 5, 3: 1}
+    assert response.json['count'] == 6
+
+
+def test_batch_skips_unknown_flowers(app, customer):
+    customer.post('/api/v1/cart/batch', json=[{'flower_id': 1, 'quantity': 1}, {'flower_id': 999, 'quantity': 1}])
+    assert _rows(app) == {1: 1}
+
+
+def test_batch_rejects_bad_items(app, customer):
+    for items in ([], [{'flower_id': 1, 'quantity': 1.5}], [{'flower_id': '1', 'quantity': 1}],
+                  [{'flower_id': 2 ** 70, 'quantity': 1}], [{'flower_id': 1, 'quantity': 100}], {'flower_id': 1}):
+        assert customer.post('/api/v1/cart/batch', json=items).status_code == 400
+    assert _rows(app) == {}
+
+
+def test_guest_batch_via_form(client):
+    client.post('/add_to_cart/1')
+    client.post('/add_to_cart/2')
+    response = client.post('/cart/update', data={'quantity-1': '3', 'quantity-2': '0'})
+    assert response.status_code == 302
+    cart = client.get('/api/v1/cart').json
+    assert [(item['flower_id'], item['quantity']) for item in cart['items']] == [(1, 3)]
+
+
+def test_add_rejects_non_integer_ids(client):
+    for body in ({'flower_id': 2 ** 70}, {'flower_id': '1'}, {'flower_id': 1, 'quantity': 1.9}, {'flower_id': True}):
+        assert client.post('/api/v1/cart/items', json=body).status_code == 400
+
+
+def test_repeated_adds_stop_at_line_cap(app, customer):
+    for _ in range(3):
+        customer.post('/api/v1/cart/items', json={'flower_id': 1, 'quantity': 60})
+    assert _rows(app) == {1: MAX_LINE_QUANTITY}
+
+
+def test_guest_adds_stop_at_line_cap(app):
+    guest = app.test_client()
+    for _ in range(3):
+        guest.post('/api/v1/cart/items', json={'flower_id': 1, 'quantity': 60})
+    assert guest.get('/api/v1/cart').json['items'][0]['quantity'] == MAX_LINE_QUANTITY
+
+
+def test_add_to_cart_rejects_unknown_flower(app, customer):
+    response = customer.post('/add_to_cart/999')
+    assert response.status_code == 302
+    customer.post(f'/add_to_cart/{2 ** 70}')
+    assert _rows(app) == {}
@@ -0,0 +1,14 @@
+from app import database
+from app.models import db
+
+
+def test_fork_hook_resets_pools_of_every_app(app):
+    with app.app_context():
+        db.session.execute(db.text('SELECT 1'))
+        db.session.remove()
+        engine = db.engine
+        pool = engine.pool
+    assert engine in database._engines
+
+    database._forget_pools()  # то, что делает os.register_at_fork в дочернем процессе
+    assert engine.pool is not pool
@@ -0,0 +1,74 @@
+import pytest
+
+from app import inventory
+from app.cache import catalog_cache
+from app.models import db, Flower, StockReservation
+from app.page_cache import page_cache
+
+
+def test_adjust_is_relative_to_current_stock(app):
+    with app.app_context():
+        db.session.get(Flower, 1).stock = 10
+        db.session.commit()
+        inventory.take([(1, 4)])
+        db.session.commit()
+
+        assert inventory.adjust(1, 5)
+        db.session.commit()
+        assert db.session.get(Flower, 1).stock == 11
+
+
+def test_adjust_refuses_negative_stock(app):
+    with app.app_context():
+        assert not inventory.adjust(1, -1)  # остаток не вёлся — считаем от нуля
+        assert inventory.adjust(2, 3)
+        db.session.commit()
+        assert db.session.get(Flower, 2).stock == 3
+
+
+def test_cached_flower_page_shows_fresh_stock(app):
+    app.config.update(PAGE_CACHE_ENABLED=True, CATALOG_CACHE_ENABLED=True)
+    page_cache.init_app(app)
+    catalog_cache.init_app(app)
+    with app.app_context():
+        db.session.get(Flower, 1).stock = 3
+        db.session.commit()
+    visitor = app.test_client()
+    assert 'Осталось 3 шт.' in visitor.get('/flower/buket-1').get_data(as_text=True)
+
+    app.test_client().post('/order', json={'name': 'Анна', 'phone': '060000000', 'address': 'ул. Тестовая, 1',
+                                           'items': [{'flower_id': 1, 'quantity': 1}]})
+    assert 'Осталось 2 шт.' in visitor.get('/flower/buket-1').get_data(as_text=True)
+
+
+def _held(app):
+    with app.app_context():
+        return dict(db.session.execute(
+            db.select(StockReservation.flower_id, db.func.sum(StockReservation.quantity))
+            .group_by(StockReservation.flower_id)).all())
+
+
+def test_checkout_page_does_not_reserve(app):
+    guest = app.test_client()
+    guest.post('/add_to_cart/1')
+    assert guest.get('/checkout').status_code == 200
+    assert _held(app) == {}
+
+    assert guest.post('/checkout/hold').status_code == 200
+    assert _held(app) == {1: 1}
+
+
+def test_guest_cannot_reserve_more_than_line_cap(app):
+    with app.app_context():
+        db.session.get(Flower, 1).stock = 1000
+        db.session.commit()
+    guest = app.test_client()
+    for _ in range(5):
+        guest.post('/api/v1/cart/items', json={'flower_id': 1, 'quantity': 60})
+    assert guest.post('/checkout/hold').status_code == 200
+    assert guest.post('/api/v1/cart/hold').status_code == 200  # повтор заменяет резерв, а не копит
+    assert _held(app) == {1: inventory.MAX_LINE_QUANTITY}
+
+    with app.app_context(), pytest.raises(inventory.HoldRejected):
+        inventory.reserve('g:direct', [(1, inventory.MAX_LINE_QUANTITY + 1)])
+    assert _held(app) == {1: inventory.MAX_LINE_QUANTITY}
@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.factory import create_app
+from app.models import db
+
+
+def _app(tmp_path, **config):
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "metrics.db"}',
+        'TESTING': True,
+        'ADMIN_ENABLED': False,
+        'SESSION_BACKEND': 'memory',
+        'METRICS_ENABLED': True,
+        'METRICS_LOG_REQUESTS': False,
+        **config,
+    })
+
+
+def test_failed_query_leaves_no_start_mark(tmp_path):
+    app = _app(tmp_path)
+    with app.app_context():
+        with db.engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text('SELECT * FROM no_such_table'))
+            assert conn.info.get('query_started') == []
+            conn.execute(text('SELECT 1'))
+            assert conn.info['query_started'] == []
+        db.engine.dispose()
+
+
+def test_metrics_requires_token(tmp_path):
+    client = _app(tmp_path).test_client()
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer '}).status_code == 403
+
+    client = _app(tmp_path, METRICS_TOKEN='s3cret').test_client()
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    response = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert b'floweelyy_http_requests_total' in response.data
@@ -0,0 +1,22 @@
+import pytest
+
+from app.money import format_minor, to_minor
+
+
+@pytest.mark.parametrize('amount, expected', [
+    (0, '0'),
+    (5, '0.05'),
+    (150, '1.50'),
+    (10000, '100'),
+    (-5, '-0.05'),
+    (-150, '-1.50'),
+    (-10000, '-100'),
+])
+def test_format_minor(amount, expected):
+    assert format_minor(amount) == expected
+
+
+def test_to_minor_rounds_half_up():
+    assert to_minor(None) == 0
+    assert to_minor(19.995) == 2000
+    assert to_minor(-1.5) == -150
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.cache import catalog_cache
+from app.models import db, Flower, Order, OrderRequest
+from app.orders import OrderRejected, parse_intake, purge_requests
+
+
+CONTACTS = {'name': 'Анна', 'phone': '060000000', 'address': 'Кишинёв, ул. Тестовая, 1'}
+
+
+@pytest.mark.parametrize('item', [
+    {'flower_id': 1, 'quantity': 1.9},
+    {'flower_id': 1, 'quantity': '3'},
+    {'flower_id': '1', 'quantity': 1},
+    {'flower_id': True, 'quantity': 1},
+    {'flower_id': 2 ** 70, 'quantity': 1},
+    {'flower_id': 0, 'quantity': 1},
+    'flower',
+])
+def test_parse_intake_requires_real_integers(item):
+    with pytest.raises(OrderRejected):
+        parse_intake({**CONTACTS, 'items': [item]})
+
+
+def test_parse_intake_merges_lines():
+    intake = parse_intake({**CONTACTS, 'items': [{'flower_id': 2}, {'flower_id': 1, 'quantity': 2},
+                                                  {'flower_id': 2, 'quantity': 3}]})
+    assert intake.items == ((1, 2), (2, 4))
+
+
+def test_order_with_huge_flower_id_is_rejected(client):
+    response = client.post('/order', json={**CONTACTS, 'items': [{'flower_id': 2 ** 70, 'quantity': 1}]})
+    assert response.status_code == 400
+
+
+def test_idempotency_key_replays_only_for_same_client(app, customer):
+    body = {**CONTACTS, 'items': [{'flower_id': 1, 'quantity': 1}]}
+    headers = {'Idempotency-Key': 'order-1'}
+    first = customer.post('/order', json=body, headers=headers)
+    again = customer.post('/order', json=body, headers=headers)
+    assert first.status_code == 201
+    assert again.status_code == 200 and again.json['id'] == first.json['id']
+
+    # Другой клиент с тем же ключом и телом чужой заказ не получает
+    stranger = app.test_client().post('/order', json=body, headers=headers)
+    assert stranger.status_code == 201
+    assert stranger.json['id'] != first.json['id']
+
+
+def test_purge_removes_expired_keys(app, client):
+    body = {**CONTACTS, 'items': [{'flower_id': 1, 'quantity': 1}]}
+    client.post('/order', json=body, headers={'Idempotency-Key': 'old'})
+    with app.app_context():
+        db.session.execute(db.update(OrderRequest).values(created_at=datetime.utcnow() - timedelta(days=2)))
+        db.session.commit()
+        client.post('/order', json=body, headers={'Idempotency-Key': 'fresh'})
+        assert purge_requests() == 1
+        assert db.session.scalar(db.select(db.func.count()).select_from(OrderRequest)) == 1
+
+
+def test_checkout_prices_from_database_not_catalog_cache(app, client):
+    app.config['CATALOG_CACHE_ENABLED'] = True
+    catalog_cache.init_app(app)
+    client.post('/api/v1/cart/items', json={'flower_id': 1, 'quantity': 2})
+    assert client.get('/api/v1/cart').json['total'] == 200  # букет уже в кэше каталога
+
+    # Цену поменяли в другом воркере: до этого процесса сброс кэша не дошёл
+    with app.app_context():
+        db.session.execute(db.update(Flower).where(Flower.id == 1).values(price=150))
+        db.session.commit()
+    response = client.post('/api/v1/checkout', json=CONTACTS)
+    assert response.status_code == 201
+    assert response.json['total_price'] == 300
+    assert response.json['items'][0]['price'] == 150
+
+
+def test_key_of_deleted_order_places_new_order(app, client):
+    body = {**CONTACTS, 'items': [{'flower_id': 1, 'quantity': 1}]}
+    headers = {'Idempotency-Key': 'order-1'}
+    first = client.post('/order', json=body, headers=headers)
+    with app.app_context():
+        db.session.execute(db.delete(Order).where(Order.id == first.json['id']))
+        db.session.commit()
+
+    again = client.post('/order', json=body, headers=headers)
+    assert again.status_code == 201
+    with app.app_context():
+        assert db.session.get(Order, again.json['id']) is not None
+    replay = client.post('/order', json=body, headers=headers)
+    assert replay.status_code == 200 and replay.json['id'] == again.json['id']
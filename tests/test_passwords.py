@@ -0,0 +1,35 @@
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from app.factory import create_app
+from app.passwords import PasswordHasher, login_guard
+
+
+def test_login_limit_uses_client_ip_behind_proxy(app):
+    app.config.update(LOGIN_RATE_LIMIT_ENABLED=True, LOGIN_RATE_PER_IP='2/60')
+    login_guard.init_app(app)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+    client = app.test_client()
+
+    def attempt(ip):
+        return client.post('/auth/login', data={'email': 'anna@example.com', 'password': 'wrong'},
+                           headers={'X-Forwarded-For': ip}).status_code
+
+    assert [attempt('203.0.113.1') for _ in range(3)][-1] == 429
+    assert attempt('203.0.113.2') != 429
+
+
+def test_proxy_fix_is_opt_in():
+    assert not hasattr(create_app({'TRUSTED_PROXY_COUNT': 0}).wsgi_app, 'x_for')
+    assert create_app({'TRUSTED_PROXY_COUNT': 1}).wsgi_app.x_for == 1
+
+
+def test_hash_pool_does_not_fork_threaded_worker(app):
+    hasher = PasswordHasher()
+    hasher.init_app(app)
+    hasher.workers = 1
+    try:
+        password_hash = hasher.hash('secret')
+        assert hasher.verify(password_hash, 'secret')
+        assert hasher._executor()._mp_context.get_start_method() in ('forkserver', 'spawn')
+    finally:
+        hasher._executor().shutdown()
@@ -0,0 +1,25 @@
+from app import reports
+from app.models import db, Order, DailySales, DailyFlowerSales
+
+
+def _totals():
+    return (db.session.scalar(db.select(db.func.sum(DailySales.orders))) or 0,
+            db.session.scalar(db.select(db.func.sum(DailyFlowerSales.units))) or 0)
+
+
+def test_unroll_removes_order_from_rollups(app, client):
+    response = client.post('/order', json={'name': 'Анна', 'phone': '060000000', 'address': 'ул. Тестовая, 1',
+                                           'items': [{'flower_id': 1, 'quantity': 2}]})
+    order_id = response.json['id']
+    with app.app_context():
+        reports.sync_order(order_id)
+        assert _totals() == (1, 2)
+
+        reports.unroll_order(order_id)
+        db.session.commit()
+        assert _totals() == (0, 0)
+        assert db.session.get(Order, order_id).rollup_status is None
+
+        # Задание analytics.sync после правки учитывает заказ заново
+        reports.sync_order(order_id)
+        assert _totals() == (1, 2)
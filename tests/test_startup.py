@@ -0,0 +1,26 @@
+import os
+
+from bench.startup import best_of
+
+
+# Бюджет холодного старта воркера (import main = импорт + create_app), мс.
+# На медленных CI-машинах задаётся STARTUP_BUDGET_MS
+BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', 2000))
+
+
+def test_cold_start_fits_budget():
+    total, _ = best_of(3)
+    assert total <= BUDGET_MS, f'import main: {total:.0f} мс при бюджете {BUDGET_MS:.0f} мс'
+
+
+# Чего не должно быть в воркере витрины: админка, миграции, Pillow, команды импорта, чужие диалекты
+STOREFRONT_SKIPS = ('flask_admin', 'flask_migrate', 'alembic', 'PIL', 'app.catalog_io', 'app.cli',
+                    'sqlalchemy.dialects.postgresql', 'sqlalchemy.dialects.mysql')
+
+
+def test_storefront_without_admin_skips_optional_modules():
+    _, entries = best_of(1, env={'ADMIN_ENABLED': '0'})
+    imported = {name for name, _, _ in entries}
+    assert 'main' in imported
+    assert not {name for name in imported
+                if any(name == skip or name.startswith(f'{skip}.') for skip in STOREFRONT_SKIPS)}